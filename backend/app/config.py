@@ -7,6 +7,26 @@ class Settings(BaseSettings):
     supabase_url: str
     supabase_anon_key: str
     supabase_service_key: str
+    # Access token verification: "local" checks signature and claims in
+    # process (JWT secret for HS256, cached JWKS for RS256/ES256); "remote"
+    # asks the auth server on every request (sees revocations immediately)
+    auth_verification: str = "local"
+    # Project JWT secret (Settings > API); needed for HS256-signed tokens
+    supabase_jwt_secret: str = ""
+    jwt_audience: str = "authenticated"
+    jwks_cache_seconds: int = 600
+    # Unknown key IDs refresh the JWKS at most this often
+    jwks_min_refresh_seconds: int = 30
+    # Validated tokens are cached until exp, capped at this TTL; invalid
+    # tokens for the negative TTL
+    token_cache_max_entries: int = 10000
+    token_cache_ttl_seconds: int = 300
+    token_cache_negative_seconds: int = 30
+    # Long-lived clients kept per key; each holds a keep-alive HTTP session
+    supabase_pool_size: int = 4
+    supabase_timeout_seconds: int = 10
+    # Threads for blocking Supabase calls; caps concurrent DB requests
+    db_max_workers: int = 16
 
     # Perplexity
     perplexity_api_key: str
@@ -14,10 +34,96 @@ class Settings(BaseSettings):
     # App
     secret_key: str
     frontend_url: str = "http://localhost:3000"
+    # Sent as X-Cron-Secret by callers of the /cron endpoints;
+    # while unset those endpoints refuse every call
+    cron_secret: str = ""
+    # Responses at least this many bytes are gzipped for clients that accept it
+    gzip_minimum_size: int = 1000
 
     # NotebookLM Browser Settings
     # Set to "true" in production (Railway/Render), "false" locally for visible browser
     browser_headless: str = "false"
+    # Logins share one browser process: at most this many run at once, and
+    # at most browser_max_queued wait; unwatched logins are closed after
+    # browser_idle_seconds, as is the browser once nothing uses it
+    browser_max_sessions: int = 2
+    browser_max_queued: int = 10
+    browser_idle_seconds: int = 300
+    browser_login_timeout_seconds: int = 300
+    # Per-user NotebookLM credential state is cached this long
+    notebooklm_status_cache_seconds: int = 60
+    # POST /cron/credential-probe checks sessions of users whose slot is
+    # this close, unless they were checked within the interval
+    # (requires migrations/add_credential_health.sql)
+    credential_probe_lead_minutes: int = 120
+    credential_probe_interval_minutes: int = 60
+    credential_probe_concurrency: int = 10
+
+    # Logging
+    log_level: str = "INFO"
+    # "json" for structured output, "text" for human-readable lines
+    log_format: str = "json"
+    # Per-module overrides, e.g. "app.services.scheduler=DEBUG,app.routers=WARNING"
+    log_levels: str = ""
+
+    # Tracing: "jsonl" appends spans to trace_file, "memory" keeps them
+    # in-process (tests), "none" disables export
+    trace_exporter: str = "none"
+    trace_file: str = "traces.jsonl"
+
+    # OPML import: max feeds per file, and feed checks run at once
+    opml_max_feeds: int = 1000
+    opml_validation_concurrency: int = 10
+
+    # Read-through cache for preferences, RSS sources and news topics:
+    # "memory" (per process), "shared" (store shared by replicas) or "none"
+    cache_backend: str = "memory"
+    cache_ttl_seconds: int = 60
+    cache_max_entries: int = 10000
+
+    # Generation
+    # An in-flight generation older than this is treated as abandoned and no
+    # longer absorbs duplicate requests
+    generation_lease_minutes: int = 45
+    # Intermediate status updates are coalesced and written this often;
+    # terminal states are written immediately
+    status_flush_interval_seconds: float = 1.0
+
+    # Admission control for POST /generate (scheduled runs are exempt).
+    # Token buckets per user and across all users: burst size and refill rate
+    generate_user_burst: int = 3
+    generate_user_per_hour: float = 6
+    generate_global_burst: int = 20
+    generate_global_per_minute: float = 10
+    # Generations per process; manual requests may use all but the reserved
+    # slots, which are kept for scheduled runs
+    generation_max_in_flight: int = 20
+    generation_reserved_for_scheduled: int = 5
+    generation_overload_retry_seconds: int = 30
+    # Limiter state: "memory" (per process) or "shared" (the cache's shared store)
+    rate_limit_backend: str = "memory"
+    # GET /generations/{id}/events: keep-alive comment interval, and how
+    # often the stream re-reads the generation in case its events are
+    # published on another replica
+    sse_heartbeat_seconds: int = 15
+    sse_resync_seconds: int = 30
+
+    # Generation log retention (requires migrations/add_generation_log_functions.sql)
+    # Logs older than this, or finished logs beyond the newest N per user,
+    # are compacted into generation_log_daily_stats by POST /cron/retention
+    retention_max_age_days: int = 180
+    retention_keep_per_user: int = 90
+
+    # Scheduler sharding (requires migrations/add_scheduler_sharding.sql)
+    # Turn on when running more than one backend replica
+    scheduler_sharding_enabled: bool = False
+    scheduler_heartbeat_seconds: int = 10
+    # A worker that hasn't heartbeated for this long is considered dead
+    scheduler_worker_ttl_seconds: int = 45
+    # Per-user lease lifetime; renewed by the heartbeat while generating
+    scheduler_lease_seconds: int = 120
+    # How far back workers look for scheduler runs to execute their shard of
+    scheduler_run_window_hours: int = 6
 
     class Config:
         env_file = ".env"
@@ -1,10 +1,26 @@
-from fastapi import FastAPI
+import asyncio
+import time
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse, Response
 
 from app.routers import auth, sources, generation, preferences
 from app.config import get_settings
+from app.services import async_db, sharding
+from app.services.browser_pool import browser_pool
+from app.services.conditional import etag_matches, weak_etag
+from app.services.events import event_broker
+from app.services.log import get_logger, setup_logging, stop_logging
+from app.services.tracing import setup_tracing, shutdown_tracing
+from app.services.metrics import REGISTRY, http_request_duration
+from app.services.status_buffer import status_buffer
 
 settings = get_settings()
+setup_logging(settings)
+setup_tracing(settings)
+logger = get_logger(__name__)
 
 app = FastAPI(
     title="DailyBrief API",
@@ -23,8 +39,65 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# Polled read endpoints that answer If-None-Match with 304 Not Modified
+CONDITIONAL_ROUTES = {
+    "/generations",
+    "/generations/{generation_id}",
+    "/user/preferences",
+    "/user/schedule",
+}
+
+
+@app.middleware("http")
+async def conditional_get(request: Request, call_next):
+    """Tag polled GET responses with a weak ETag and answer repeats with 304."""
+    response = await call_next(request)
+
+    route = request.scope.get("route")
+    if (
+        request.method != "GET"
+        or response.status_code != 200
+        or getattr(route, "path", None) not in CONDITIONAL_ROUTES
+    ):
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    etag = weak_etag(body)
+    headers = dict(response.headers)
+    headers["ETag"] = etag
+    headers["Cache-Control"] = "private, no-cache"
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        headers.pop("content-length", None)
+        headers.pop("content-type", None)
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, status_code=response.status_code, headers=headers)
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Observe request latency per route template (not per raw path)."""
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        http_request_duration.labels(request.method, path, str(status_code)).observe(
+            time.perf_counter() - started
+        )
+
+
+# Added last so it is outermost: compresses bodies after they are tagged
+app.add_middleware(GZipMiddleware, minimum_size=settings.gzip_minimum_size)
+
+
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(sources.router, tags=["sources"])
@@ -32,6 +105,31 @@ app.include_router(generation.router, tags=["generation"])
 app.include_router(preferences.router, prefix="/user", tags=["preferences"])
 
 
+@app.on_event("startup")
+async def start_scheduler_worker():
+    """Join the scheduler shard ring when sharding is enabled."""
+    if sharding.is_enabled():
+        app.state.scheduler_worker = asyncio.ensure_future(sharding.run_worker_loop())
+
+
+@app.on_event("shutdown")
+async def stop_scheduler_worker():
+    """Leave the shard ring so other workers take over our users promptly."""
+    worker = getattr(app.state, "scheduler_worker", None)
+    if worker is not None:
+        worker.cancel()
+        await sharding.deregister()
+    try:
+        await status_buffer.flush()
+    except Exception as e:
+        logger.error("Failed to flush buffered status updates: %s", e)
+    await browser_pool.shutdown()
+    await event_broker.shutdown()
+    async_db.shutdown()
+    shutdown_tracing()
+    stop_logging()
+
+
 @app.get("/")
 async def root():
     return {"message": "DailyBrief API", "status": "running"}
@@ -40,3 +138,9 @@ async def root():
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
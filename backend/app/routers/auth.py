@@ -1,21 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.responses import RedirectResponse
+from fastapi.security import HTTPAuthorizationCredentials
 import httpx
 
 from app.config import get_settings, Settings
-from app.schemas.auth import UserCreate, UserLogin, Token
-from app.services.supabase import get_supabase_client, get_current_user
+from app.schemas.auth import UserCreate, UserLogin, Token, PasswordChange
+from app.services.supabase import (
+    create_supabase_auth_client,
+    get_current_user,
+    get_supabase_client,
+    revoke_token,
+    revoke_user,
+    security,
+)
+from app.services.async_db import run_sync
+from app.services.log import get_logger
 
 router = APIRouter()
+logger = get_logger(__name__)
 
 
 @router.post("/signup", response_model=Token)
 async def signup(user: UserCreate, settings: Settings = Depends(get_settings)):
     """Create a new user account."""
-    supabase = get_supabase_client(settings)
+    supabase = create_supabase_auth_client(settings)
 
     try:
-        response = supabase.auth.sign_up({
+        response = await run_sync(supabase.auth.sign_up, {
             "email": user.email,
             "password": user.password,
         })
@@ -41,10 +52,10 @@ async def signup(user: UserCreate, settings: Settings = Depends(get_settings)):
 @router.post("/login", response_model=Token)
 async def login(user: UserLogin, settings: Settings = Depends(get_settings)):
     """Login with email and password."""
-    supabase = get_supabase_client(settings)
+    supabase = create_supabase_auth_client(settings)
 
     try:
-        response = supabase.auth.sign_in_with_password({
+        response = await run_sync(supabase.auth.sign_in_with_password, {
             "email": user.email,
             "password": user.password,
         })
@@ -61,6 +72,73 @@ async def login(user: UserLogin, settings: Settings = Depends(get_settings)):
         )
 
 
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user_id: str = Depends(get_current_user),
+    settings: Settings = Depends(get_settings),
+):
+    """End this session and stop accepting its access token."""
+    token = credentials.credentials
+    supabase = get_supabase_client(settings)
+
+    try:
+        await run_sync(supabase.auth.admin.sign_out, token, "local")
+    except Exception as e:
+        # The token is rejected here regardless; the session just lingers upstream
+        logger.warning("Supabase sign-out failed: %s", e)
+
+    revoke_token(token, settings)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.post("/password", status_code=status.HTTP_204_NO_CONTENT)
+async def change_password(
+    change: PasswordChange,
+    user_id: str = Depends(get_current_user),
+    settings: Settings = Depends(get_settings),
+):
+    """
+    Change the user's password.
+
+    The current password is checked first, so a leaked access token alone
+    can't be used to take over the account. Access tokens issued before
+    the change stop being accepted, so other sessions must sign in again
+    (the caller refreshes its own session).
+    """
+    supabase = get_supabase_client(settings)
+
+    try:
+        user = await run_sync(supabase.auth.admin.get_user_by_id, user_id)
+        auth_client = create_supabase_auth_client(settings)
+        reauth = await run_sync(auth_client.auth.sign_in_with_password, {
+            "email": user.user.email,
+            "password": change.current_password,
+        })
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Current password is incorrect",
+        )
+
+    try:
+        # The check above opened a session of its own; don't leave it behind
+        await run_sync(supabase.auth.admin.sign_out, reauth.session.access_token, "local")
+    except Exception as e:
+        logger.warning("Supabase sign-out of reauthentication session failed: %s", e)
+
+    try:
+        await run_sync(supabase.auth.admin.update_user_by_id, user_id, {"password": change.password})
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+    revoke_user(user_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
 @router.get("/me")
 async def get_current_user_info(user_id: str = Depends(get_current_user)):
     """Get current authenticated user information."""
@@ -79,33 +157,77 @@ async def get_notebooklm_status(
     """
     from app.services.notebooklm_auth import notebooklm_auth
 
-    is_auth = notebooklm_auth.is_authenticated(user_id)
-    credentials = notebooklm_auth.get_user_credentials(user_id) if is_auth else None
+    credentials = await notebooklm_auth.get_user_credentials(user_id)
 
     return {
-        "authenticated": is_auth,
+        "authenticated": credentials is not None,
         "credentials": credentials,
     }
 
 
-@router.post("/notebooklm/authenticate")
+@router.post("/notebooklm/authenticate", status_code=status.HTTP_202_ACCEPTED)
 async def authenticate_notebooklm(
     user_id: str = Depends(get_current_user),
 ):
     """
-    Initiate NotebookLM authentication via browser-based Google OAuth.
+    Start NotebookLM authentication via browser-based Google OAuth.
 
     This will:
-    1. Launch a browser window for Google login
+    1. Open a Google login page in the shared browser
     2. User completes OAuth flow in browser
     3. Credentials are stored securely
 
-    Note: This is a blocking operation that waits for user to complete OAuth.
+    Returns immediately; poll GET /auth/notebooklm/authenticate until the
+    status is no longer queued or running.
     """
+    from app.services.browser_pool import PoolFull
     from app.services.notebooklm_auth import notebooklm_auth
 
-    result = await notebooklm_auth.authenticate_user(user_id)
-    return result
+    try:
+        return await notebooklm_auth.authenticate_user(user_id)
+    except PoolFull as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "30"},
+        )
+
+
+@router.get("/notebooklm/authenticate")
+async def get_notebooklm_login(
+    user_id: str = Depends(get_current_user),
+):
+    """Poll the user's NotebookLM login (queued, running, succeeded, failed or cancelled)."""
+    from app.services.notebooklm_auth import notebooklm_auth
+
+    login = notebooklm_auth.get_login_status(user_id)
+    if login is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No login in progress")
+    return login
+
+
+@router.post("/notebooklm/authenticate/finish")
+async def finish_notebooklm_login(
+    user_id: str = Depends(get_current_user),
+):
+    """Store the session now, if the user signed in but it wasn't detected."""
+    from app.services.notebooklm_auth import notebooklm_auth
+
+    login = await notebooklm_auth.finish_login(user_id)
+    if login is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No login in progress")
+    return login
+
+
+@router.delete("/notebooklm/authenticate", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_notebooklm_login(
+    user_id: str = Depends(get_current_user),
+):
+    """Abandon the user's NotebookLM login and close its browser context."""
+    from app.services.notebooklm_auth import notebooklm_auth
+
+    await notebooklm_auth.cancel_login(user_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 @router.delete("/notebooklm/revoke")
@@ -148,12 +270,11 @@ async def upload_notebooklm_credentials(
     from pathlib import Path
 
     try:
-        print(f"[UPLOAD] Received credentials upload for user: {user_id}")
-        print(f"[UPLOAD] Payload user_id: {credentials_data.get('user_id')}")
+        logger.info("Received credentials upload (payload user_id: %s)", credentials_data.get('user_id'))
 
         # Verify user_id matches authenticated user
         if credentials_data.get('user_id') != user_id:
-            print(f"[UPLOAD] User ID mismatch! Authenticated: {user_id}, Payload: {credentials_data.get('user_id')}")
+            logger.warning("User ID mismatch! Payload: %s", credentials_data.get('user_id'))
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="User ID mismatch"
@@ -161,30 +282,21 @@ async def upload_notebooklm_credentials(
 
         credentials = credentials_data.get('credentials')
         if not credentials:
-            print(f"[UPLOAD] No credentials in payload!")
+            logger.warning("No credentials in payload")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="No credentials provided"
             )
 
-        print(f"[UPLOAD] Credentials payload has keys: {list(credentials.keys())}")
+        logger.debug("Credentials payload has keys: %s", list(credentials.keys()))
 
         # Save credentials to database
-        from app.services import db
-        db.save_notebooklm_credentials(user_id, credentials)
+        from app.services import async_db as db
+        await db.save_notebooklm_credentials(user_id, credentials)
 
-        print(f"[UPLOAD] Credentials saved to database for user: {user_id}")
-
-        # Update cache
-        from datetime import datetime
-        metadata = {
-            "user_id": user_id,
-            "authenticated": True,
-            "authenticated_at": datetime.utcnow().isoformat(),
-        }
-        notebooklm_auth._auth_cache[user_id] = metadata
+        logger.info("Credentials saved to database")
 
-        print(f"[UPLOAD] Successfully uploaded credentials for user: {user_id}")
+        notebooklm_auth.invalidate(user_id)
 
         return {
             "status": "success",
@@ -195,9 +307,7 @@ async def upload_notebooklm_credentials(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[UPLOAD] Error uploading credentials: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error uploading credentials: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to upload credentials: {str(e)}"
@@ -1,15 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Header
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from datetime import datetime
+import base64
+import hmac
+import json
+import time
+import uuid
 
 from app.config import get_settings, Settings
-from app.schemas.generation import GenerationLog, GenerationStatus
+from app.schemas.generation import GenerationLog, GenerationLogSummary, GenerationStatus
 from app.services.supabase import get_current_user
-from app.services import db
-from app.services.podcast_generator import generate_podcast_for_user
-from app.services.scheduler import check_and_generate_for_all_users
+from app.services.log import get_logger
+from app.services import async_db as db
+from app.services.podcast_generator import (
+    find_generation,
+    in_flight_count,
+    release_slot,
+    reserve_slot,
+    run_generation,
+    start_generation,
+)
+from app.services.rate_limit import AdmissionDenied, admit_generation, refund_generation
+from app.services.scheduler import start_scheduler_run, get_scheduler_run, probe_upcoming_credentials
+from app.services.events import event_broker
+from app.services.status_buffer import status_buffer, TERMINAL_STATUSES
 
 router = APIRouter()
+logger = get_logger(__name__)
+
+
+def _require_cron_secret(x_cron_secret: Optional[str], settings: Settings) -> None:
+    """Reject a cron call without the configured X-Cron-Secret (every call, if none is set)."""
+    if not (settings.cron_secret and x_cron_secret and hmac.compare_digest(x_cron_secret, settings.cron_secret)):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+
+async def _limiter(settings: Settings, fn, *args):
+    """Call the rate limiter, off the event loop when it talks to the shared store."""
+    if settings.rate_limit_backend == "shared":
+        return await db.run_sync(fn, *args)
+    return fn(*args)
 
 
 @router.post("/generate", response_model=GenerationLog)
@@ -17,35 +48,127 @@ async def trigger_generation(
     background_tasks: BackgroundTasks,
     user_id: str = Depends(get_current_user),
     settings: Settings = Depends(get_settings),
+    idempotency_key: Optional[str] = Header(None),
 ):
-    """Manually trigger podcast generation for the current user."""
-    print(f"[GENERATE] Starting generation for user: {user_id}")
+    """
+    Manually trigger podcast generation for the current user.
+
+    Clients may send an Idempotency-Key header so retries return the original
+    generation. Without one, a request made while another generation is in
+    flight joins that generation instead of starting a new one.
+
+    Requests are rate limited per user and globally (429), and refused while
+    the process has no generation slots to spare (503); both carry
+    Retry-After. Requests that join an existing generation aren't counted.
+    """
+    logger.info("Starting generation")
+
+    key = f"client:{idempotency_key}" if idempotency_key else None
+    existing = await find_generation(user_id, settings, idempotency_key=key)
+    if existing is not None:
+        logger.info("Joined existing generation %s with status %s", existing["id"], existing["status"])
+        return existing
+
+    # Reserve a slot before admission, so a burst of requests sees each other
+    # before any of their background runs has started
+    reservation = reserve_slot()
+    try:
+        await _limiter(settings, admit_generation, user_id, in_flight_count() - 1)
+    except AdmissionDenied as e:
+        release_slot(reservation)
+        logger.info("Generation request refused: %s", e)
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    # Claim a generation log entry; a concurrent request may have beaten us to it
+    try:
+        log, created = await start_generation(user_id, settings, idempotency_key=key)
+    except Exception:
+        release_slot(reservation)
+        await _limiter(settings, refund_generation, user_id)
+        raise
 
-    # Create generation log entry
-    log = db.create_generation_log(user_id)
-    print(f"[GENERATE] Created log: {log['id']} with status: {log['status']}")
+    if not created:
+        release_slot(reservation)
+        await _limiter(settings, refund_generation, user_id)
+        logger.info("Joined existing generation %s with status %s", log["id"], log["status"])
+        return log
+
+    logger.info("Created log %s with status %s", log["id"], log["status"])
 
     # Run generation in background
-    print(f"[GENERATE] Adding background task for generation: {log['id']}")
     background_tasks.add_task(
-        generate_podcast_for_user,
+        run_generation,
         user_id=user_id,
         generation_id=log["id"],
         settings=settings,
+        reservation=reservation,
     )
 
-    print(f"[GENERATE] Background task added, returning log")
     return log
 
 
-@router.get("/generations", response_model=List[GenerationLog])
+# Columns that can be requested with ?fields=; the keyset columns are always included
+GENERATION_LOG_FIELDS = set(GenerationLog.model_fields)
+CURSOR_FIELDS = ("id", "scheduled_at")
+
+
+def _encode_cursor(log: dict) -> str:
+    raw = json.dumps([log["scheduled_at"], log["id"]]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        scheduled_at, log_id = json.loads(raw)
+        # Validate both parts before they reach the query string
+        datetime.fromisoformat(scheduled_at.replace("Z", "+00:00"))
+        uuid.UUID(log_id)
+        return scheduled_at, log_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get(
+    "/generations",
+    response_model=List[GenerationLogSummary],
+    response_model_exclude_unset=True,
+)
 async def get_generations(
+    response: Response,
     user_id: str = Depends(get_current_user),
     settings: Settings = Depends(get_settings),
-    limit: int = 10,
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
 ):
-    """Get generation history for the current user."""
-    return db.get_generation_logs(user_id, limit)
+    """
+    Get generation history for the current user, newest first.
+
+    Pass the X-Next-Cursor response header back as ?cursor= to fetch the
+    next page; the header is absent on the last page. ?fields= takes a
+    comma-separated column list (e.g. "id,scheduled_at,status") to skip
+    large columns such as sources_used.
+    """
+    columns = None
+    if fields:
+        columns = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = set(columns) - GENERATION_LOG_FIELDS
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        columns = list(dict.fromkeys([*CURSOR_FIELDS, *columns]))
+
+    before = _decode_cursor(cursor) if cursor else None
+    logs = await db.get_generation_logs(user_id, limit, before=before, fields=columns)
+
+    if len(logs) == limit:
+        response.headers["X-Next-Cursor"] = _encode_cursor(logs[-1])
+
+    return logs
 
 
 @router.get("/generations/{generation_id}", response_model=GenerationLog)
@@ -55,7 +178,7 @@ async def get_generation(
     settings: Settings = Depends(get_settings),
 ):
     """Get status of a specific generation."""
-    log = db.get_generation_log(user_id, generation_id)
+    log = await _current_generation_log(user_id, generation_id)
 
     if not log:
         raise HTTPException(status_code=404, detail="Generation not found")
@@ -63,14 +186,94 @@ async def get_generation(
     return log
 
 
+async def _current_generation_log(user_id: str, generation_id: str) -> Optional[Dict]:
+    """Read a generation log, including progress buffered but not yet written."""
+    log = await db.get_generation_log(user_id, generation_id)
+    if log:
+        pending = status_buffer.pending(generation_id)
+        if pending:
+            log.update(pending)
+    return log
+
+
+def _sse(log: Dict) -> str:
+    return f"event: status\ndata: {json.dumps(log, default=str)}\n\n"
+
+
+@router.get("/generations/{generation_id}/events")
+async def stream_generation_events(
+    generation_id: str,
+    request: Request,
+    user_id: str = Depends(get_current_user),
+    settings: Settings = Depends(get_settings),
+):
+    """
+    Stream a generation's progress as server-sent events.
+
+    Each "status" event carries the whole generation log: first its current
+    state, then again after every stage transition. The stream ends after
+    complete or failed. Replaces polling GET /generations/{id}.
+    """
+    log = await _current_generation_log(user_id, generation_id)
+    if not log:
+        raise HTTPException(status_code=404, detail="Generation not found")
+
+    async def stream() -> AsyncIterator[str]:
+        nonlocal log
+        yield _sse(log)
+        if log["status"] in TERMINAL_STATUSES:
+            return
+
+        async with event_broker.subscribe(generation_id) as subscription:
+            # Re-read now that we are subscribed, so nothing published
+            # before the subscription started is missed
+            synced_at = time.monotonic()
+            current = await _current_generation_log(user_id, generation_id)
+            while True:
+                if current and current != log:
+                    log = current
+                    yield _sse(log)
+                if log["status"] in TERMINAL_STATUSES:
+                    return
+
+                current = None
+                event = await subscription.get(timeout=settings.sse_heartbeat_seconds)
+                if event is not None:
+                    current = {**log, **event}
+                    continue
+
+                if await request.is_disconnected():
+                    return
+                if time.monotonic() - synced_at >= settings.sse_resync_seconds:
+                    # Covers events published on a replica we don't hear from
+                    synced_at = time.monotonic()
+                    try:
+                        current = await _current_generation_log(user_id, generation_id)
+                    except Exception as e:
+                        logger.warning("Failed to resync generation %s: %s", generation_id, e)
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Don't let proxies (or the gzip middleware) buffer the stream
+            "X-Accel-Buffering": "no",
+            "Content-Encoding": "identity",
+        },
+    )
+
+
 @router.get("/debug/sources")
 async def debug_sources(
     user_id: str = Depends(get_current_user),
 ):
     """Debug endpoint to check what sources user has configured."""
-    substack = db.get_substack_sources(user_id)
-    rss = db.get_rss_sources(user_id)
-    topics = db.get_news_topics(user_id)
+    profile = await db.get_user_profile(user_id)
+    substack = profile["substack_sources"]
+    rss = profile["rss_sources"]
+    topics = profile["news_topics"]
 
     return {
         "user_id": user_id,
@@ -85,7 +288,7 @@ async def debug_sources(
     }
 
 
-@router.post("/cron/daily-generation")
+@router.post("/cron/daily-generation", status_code=202)
 async def cron_daily_generation(
     x_cron_secret: Optional[str] = Header(None),
     settings: Settings = Depends(get_settings),
@@ -94,18 +297,86 @@ async def cron_daily_generation(
     Cron endpoint for daily podcast generation.
 
     This endpoint should be called once daily at 7am PT by cron-job.org.
-    It generates podcasts for all users with daily generation enabled.
+    It enqueues a scheduler run that generates podcasts for all users with
+    daily generation enabled, and returns immediately with the run id.
+    Poll GET /cron/runs/{run_id} for progress. Requires X-Cron-Secret.
+    """
+    _require_cron_secret(x_cron_secret, settings)
+
+    run = await start_scheduler_run()
+
+    return {
+        "status": "accepted",
+        "run_id": run["run_id"],
+        "run_status": run["status"],
+        "timestamp": datetime.utcnow().isoformat(),
+    }
 
-    Optional: Protect with a secret header for security.
+
+@router.post("/cron/retention")
+async def cron_retention(
+    x_cron_secret: Optional[str] = Header(None),
+    settings: Settings = Depends(get_settings),
+):
+    """
+    Cron endpoint for generation log retention; call it once a day.
+
+    Compacts logs past the retention limits into daily per-user aggregates,
+    drops partitions for months past the age limit, and creates the
+    partitions for the coming months. Requires X-Cron-Secret.
     """
-    # Optional: Add security check
-    # if settings.cron_secret and x_cron_secret != settings.cron_secret:
-    #     raise HTTPException(status_code=401, detail="Unauthorized")
+    _require_cron_secret(x_cron_secret, settings)
 
-    result = await check_and_generate_for_all_users()
+    result = await db.compact_generation_logs(
+        settings.retention_max_age_days,
+        settings.retention_keep_per_user,
+    )
+    logger.info("Retention compacted %s logs, dropped %s partitions",
+                result.get("compacted"), result.get("partitions_dropped"))
 
     return {
         "status": "success",
+        **result,
         "timestamp": datetime.utcnow().isoformat(),
+    }
+
+
+@router.post("/cron/credential-probe")
+async def cron_credential_probe(
+    x_cron_secret: Optional[str] = Header(None),
+    settings: Settings = Depends(get_settings),
+):
+    """
+    Cron endpoint that checks NotebookLM sessions ahead of users' slots.
+
+    Call it every 30-60 minutes. Sessions found signed out are marked stale:
+    scheduled runs skip those users without fetching anything, and the
+    NotebookLM status endpoint tells them to reconnect. Requires
+    X-Cron-Secret.
+    """
+    _require_cron_secret(x_cron_secret, settings)
+
+    result = await probe_upcoming_credentials()
+
+    return {
+        "status": "success",
         **result,
+        "timestamp": datetime.utcnow().isoformat(),
     }
+
+
+@router.get("/cron/runs/{run_id}")
+async def cron_run_status(
+    run_id: str,
+    x_cron_secret: Optional[str] = Header(None),
+    settings: Settings = Depends(get_settings),
+):
+    """Get per-user progress and aggregate timings for a scheduler run. Requires X-Cron-Secret."""
+    _require_cron_secret(x_cron_secret, settings)
+
+    run = get_scheduler_run(run_id)
+
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    return run
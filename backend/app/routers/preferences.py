@@ -7,11 +7,14 @@ from app.schemas.preferences import (
     UserPreferencesUpdate,
     SchedulePreferences,
     SchedulePreferencesUpdate,
+    UserProfile,
 )
 from app.services.supabase import get_current_user
-from app.services import db
+from app.services.log import get_logger, sample
+from app.services import async_db as db
 
 router = APIRouter()
+logger = get_logger(__name__)
 
 
 @router.get("/preferences", response_model=UserPreferences)
@@ -20,7 +23,7 @@ async def get_preferences(
     settings: Settings = Depends(get_settings),
 ):
     """Get user preferences including schedule settings."""
-    prefs = db.get_user_preferences(user_id)
+    prefs = await db.get_user_preferences(user_id)
 
     if not prefs:
         # Return defaults if not found
@@ -38,6 +41,21 @@ async def get_preferences(
     return prefs
 
 
+@router.get("/profile", response_model=UserProfile)
+async def get_profile(
+    user_id: str = Depends(get_current_user),
+    settings: Settings = Depends(get_settings),
+):
+    """Get preferences, sources, topics and NotebookLM status in one round trip."""
+    profile = await db.get_user_profile(user_id)
+
+    if not profile["preferences"]:
+        # First visit: create the default preferences row
+        profile["preferences"] = await db.get_user_preferences(user_id)
+
+    return profile
+
+
 @router.put("/preferences", response_model=UserPreferences)
 async def update_preferences(
     preferences: UserPreferencesUpdate,
@@ -45,7 +63,7 @@ async def update_preferences(
     settings: Settings = Depends(get_settings),
 ):
     """Update user preferences."""
-    updated_prefs = db.update_user_preferences(user_id, preferences.dict(exclude_unset=True))
+    updated_prefs = await db.update_user_preferences(user_id, preferences.dict(exclude_unset=True))
 
     if not updated_prefs:
         raise HTTPException(status_code=404, detail="Preferences not found")
@@ -59,9 +77,7 @@ async def get_schedule(
     settings: Settings = Depends(get_settings),
 ):
     """Get daily generation schedule preferences."""
-    prefs = db.get_user_preferences(user_id)
-
-    print(f"[SCHEDULE GET] User {user_id} - Retrieved preferences: daily_enabled={prefs.get('daily_generation_enabled')}, time={prefs.get('generation_time')}")
+    prefs = await db.get_user_preferences(user_id)
 
     if not prefs:
         # Return defaults
@@ -84,7 +100,10 @@ async def get_schedule(
         timezone=prefs.get("timezone", "America/Los_Angeles"),
     )
 
-    print(f"[SCHEDULE GET] Returning: enabled={result.daily_generation_enabled}, time={result.generation_time}")
+    logger.debug(
+        "Schedule: enabled=%s, time=%s", result.daily_generation_enabled, result.generation_time,
+        extra=sample(0.1),
+    )
 
     return result
 
@@ -96,8 +115,6 @@ async def update_schedule(
     settings: Settings = Depends(get_settings),
 ):
     """Update daily generation schedule."""
-    print(f"[SCHEDULE PUT] User {user_id} - Received update: enabled={schedule.daily_generation_enabled}, time={schedule.generation_time}, tz={schedule.timezone}")
-
     update_data = {}
 
     if schedule.daily_generation_enabled is not None:
@@ -117,9 +134,8 @@ async def update_schedule(
     if schedule.timezone is not None:
         update_data["timezone"] = schedule.timezone
 
-    print(f"[SCHEDULE PUT] Updating with data: {update_data}")
-    updated_prefs = db.update_user_preferences(user_id, update_data)
-    print(f"[SCHEDULE PUT] After update - daily_enabled={updated_prefs.get('daily_generation_enabled')}")
+    logger.info("Updating schedule with data: %s", update_data)
+    updated_prefs = await db.update_user_preferences(user_id, update_data)
 
     if not updated_prefs:
         raise HTTPException(status_code=404, detail="Preferences not found")
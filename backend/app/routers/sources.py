@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from typing import List
 
 from app.config import get_settings, Settings
@@ -7,9 +9,17 @@ from app.schemas.sources import (
     RSSSourceCreate,
     NewsTopic,
     NewsTopicCreate,
+    OPMLImportResult,
 )
 from app.services.supabase import get_current_user
-from app.services import db
+from app.services import async_db as db
+from app.services.opml import (
+    OPMLError,
+    normalize_feed_url,
+    parse_opml,
+    render_opml,
+    validate_feeds,
+)
 
 router = APIRouter()
 
@@ -22,7 +32,7 @@ async def get_rss_sources(
     settings: Settings = Depends(get_settings),
 ):
     """Get all RSS sources for the current user."""
-    return db.get_rss_sources(user_id)
+    return await db.get_rss_sources(user_id)
 
 
 @router.post("/rss", response_model=RSSSource)
@@ -32,7 +42,7 @@ async def create_rss_source(
     settings: Settings = Depends(get_settings),
 ):
     """Add a new RSS feed source."""
-    return db.add_rss_source(user_id, source.url, source.name)
+    return await db.add_rss_source(user_id, source.url, source.name)
 
 
 @router.delete("/rss/{source_id}")
@@ -42,10 +52,64 @@ async def delete_rss_source(
     settings: Settings = Depends(get_settings),
 ):
     """Delete an RSS source."""
-    db.delete_rss_source(user_id, source_id)
+    await db.delete_rss_source(user_id, source_id)
     return {"message": "Source deleted"}
 
 
+@router.post("/rss/opml", response_model=OPMLImportResult)
+async def import_opml(
+    file: UploadFile = File(...),
+    validate: bool = True,
+    user_id: str = Depends(get_current_user),
+    settings: Settings = Depends(get_settings),
+):
+    """
+    Import RSS sources from an OPML file exported by another reader.
+
+    Feeds the user already has are skipped. With validate (the default),
+    each new feed is fetched once and only URLs serving a parseable feed
+    are added; the rest are returned in `invalid`.
+    """
+    try:
+        feeds = await run_in_threadpool(parse_opml, file.file, settings.opml_max_feeds)
+    except OPMLError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    existing = {normalize_feed_url(s["url"]) for s in await db.get_rss_sources(user_id)}
+    new_feeds = [(url, name) for url, name in feeds if normalize_feed_url(url) not in existing]
+
+    invalid: List[str] = []
+    if validate and new_feeds:
+        valid = await validate_feeds(
+            [url for url, _ in new_feeds],
+            concurrency=settings.opml_validation_concurrency,
+        )
+        invalid = [url for url, _ in new_feeds if not valid[url]]
+        new_feeds = [(url, name) for url, name in new_feeds if valid[url]]
+
+    imported = await db.add_rss_sources(user_id, new_feeds) if new_feeds else []
+
+    return {
+        "imported": imported,
+        "duplicates": len(feeds) - len(new_feeds) - len(invalid),
+        "invalid": invalid,
+    }
+
+
+@router.get("/rss/opml")
+async def export_opml(
+    user_id: str = Depends(get_current_user),
+    settings: Settings = Depends(get_settings),
+):
+    """Download the user's RSS sources as an OPML file."""
+    sources = await db.get_rss_sources(user_id)
+    return StreamingResponse(
+        render_opml(sources),
+        media_type="text/x-opml",
+        headers={"Content-Disposition": 'attachment; filename="dailybrief-feeds.opml"'},
+    )
+
+
 # ============ News Topics (Perplexity) ============
 
 @router.get("/topics", response_model=List[NewsTopic])
@@ -54,7 +118,7 @@ async def get_news_topics(
     settings: Settings = Depends(get_settings),
 ):
     """Get all news topics for the current user."""
-    return db.get_news_topics(user_id)
+    return await db.get_news_topics(user_id)
 
 
 @router.post("/topics", response_model=NewsTopic)
@@ -64,7 +128,7 @@ async def create_news_topic(
     settings: Settings = Depends(get_settings),
 ):
     """Add a new news topic to track."""
-    return db.add_news_topic(user_id, topic.topic)
+    return await db.add_news_topic(user_id, topic.topic)
 
 
 @router.delete("/topics/{topic_id}")
@@ -74,5 +138,5 @@ async def delete_news_topic(
     settings: Settings = Depends(get_settings),
 ):
     """Delete a news topic."""
-    db.delete_news_topic(user_id, topic_id)
+    await db.delete_news_topic(user_id, topic_id)
     return {"message": "Topic deleted"}
@@ -11,6 +11,11 @@ class UserLogin(BaseModel):
     password: str
 
 
+class PasswordChange(BaseModel):
+    current_password: str
+    password: str
+
+
 class Token(BaseModel):
     access_token: str
     refresh_token: str
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Any
+from typing import Optional, Any, Dict
 from datetime import datetime
 from enum import Enum
 
@@ -22,3 +22,19 @@ class GenerationLog(BaseModel):
     notebook_id: Optional[str] = None
     sources_used: Optional[Any] = None
     error_message: Optional[str] = None
+    # {"stages": {name: seconds}, "counts": {name: n}, "total_seconds": s}
+    stage_timings: Optional[Dict[str, Any]] = None
+
+
+class GenerationLogSummary(BaseModel):
+    """Generation log with any subset of columns (see GET /generations?fields=)."""
+    id: str
+    user_id: Optional[str] = None
+    scheduled_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    status: Optional[GenerationStatus] = None
+    notebook_id: Optional[str] = None
+    sources_used: Optional[Any] = None
+    error_message: Optional[str] = None
+    stage_timings: Optional[Dict[str, Any]] = None
@@ -1,7 +1,9 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import time
 
+from app.schemas.sources import RSSSource, NewsTopic
+
 
 class UserPreferences(BaseModel):
     """User preferences including podcast settings and scheduling."""
@@ -37,3 +39,12 @@ class SchedulePreferencesUpdate(BaseModel):
     daily_generation_enabled: Optional[bool] = None
     generation_time: Optional[str] = None  # HH:MM format
     timezone: Optional[str] = None
+
+
+class UserProfile(BaseModel):
+    """Preferences, sources and connection state loaded in one query."""
+    user_id: str
+    preferences: UserPreferences
+    rss_sources: List[RSSSource]
+    news_topics: List[NewsTopic]
+    notebooklm_connected: bool
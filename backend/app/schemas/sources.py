@@ -1,5 +1,5 @@
 from pydantic import BaseModel, HttpUrl
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 
 
 class RSSSource(BaseModel):
@@ -24,3 +24,9 @@ class NewsTopic(BaseModel):
 
 class NewsTopicCreate(BaseModel):
     topic: str
+
+
+class OPMLImportResult(BaseModel):
+    imported: List[RSSSource]
+    duplicates: int
+    invalid: List[str]
@@ -0,0 +1,123 @@
+"""
+Async data-access layer.
+
+Mirrors the function surface of app.services.db, but each call runs on a
+bounded thread pool so a Supabase round trip no longer stalls the event
+loop. Callers swap `db.x(...)` for `await async_db.x(...)`:
+
+    from app.services import async_db as db
+    sources = await db.get_rss_sources(user_id)
+
+The pool size (DB_MAX_WORKERS) caps concurrent DB calls; extra calls queue
+in the executor. The caller's contextvars (logging context, current trace
+span) are carried into the worker thread.
+
+When adding a function to db.py, add its wrapper here as well.
+"""
+
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from app.config import get_settings
+from app.services import db
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+# Constants re-exported so callers only need one import
+ACTIVE_GENERATION_STATUSES = db.ACTIVE_GENERATION_STATUSES
+UNIQUE_VIOLATION = db.UNIQUE_VIOLATION
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=get_settings().db_max_workers,
+            thread_name_prefix="db",
+        )
+    return _executor
+
+
+async def run_sync(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking function on the DB thread pool and await its result."""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, fn, *args, **kwargs)
+    return await loop.run_in_executor(_get_executor(), call)
+
+
+def _wrap(fn: Callable[..., T]) -> Callable[..., Awaitable[T]]:
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> T:
+        return await run_sync(fn, *args, **kwargs)
+    return wrapper
+
+
+def shutdown() -> None:
+    """Stop the thread pool (on app shutdown)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+# RSS Sources
+get_rss_sources = _wrap(db.get_rss_sources)
+add_rss_source = _wrap(db.add_rss_source)
+add_rss_sources = _wrap(db.add_rss_sources)
+delete_rss_source = _wrap(db.delete_rss_source)
+
+# News Topics
+get_news_topics = _wrap(db.get_news_topics)
+add_news_topic = _wrap(db.add_news_topic)
+delete_news_topic = _wrap(db.delete_news_topic)
+
+# User Preferences
+get_user_preferences = _wrap(db.get_user_preferences)
+create_user_preferences = _wrap(db.create_user_preferences)
+update_user_preferences = _wrap(db.update_user_preferences)
+
+# User Profile
+get_user_profile = _wrap(db.get_user_profile)
+
+# Generation Logs
+create_generation_log = _wrap(db.create_generation_log)
+claim_generation_log = _wrap(db.claim_generation_log)
+get_generation_log_by_key = _wrap(db.get_generation_log_by_key)
+get_latest_generation_log = _wrap(db.get_latest_generation_log)
+get_generation_logs = _wrap(db.get_generation_logs)
+get_generation_log = _wrap(db.get_generation_log)
+update_generation_log = _wrap(db.update_generation_log)
+apply_generation_log_updates = _wrap(db.apply_generation_log_updates)
+compact_generation_logs = _wrap(db.compact_generation_logs)
+
+# Scheduler functions
+get_users_with_daily_generation_enabled = _wrap(db.get_users_with_daily_generation_enabled)
+
+# Bulk loaders for scheduled runs
+get_enabled_rss_sources_for_users = _wrap(db.get_enabled_rss_sources_for_users)
+get_enabled_news_topics_for_users = _wrap(db.get_enabled_news_topics_for_users)
+get_users_with_notebooklm_credentials = _wrap(db.get_users_with_notebooklm_credentials)
+claim_generation_logs = _wrap(db.claim_generation_logs)
+
+# NotebookLM Credentials
+get_notebooklm_credentials = _wrap(db.get_notebooklm_credentials)
+get_notebooklm_credential_status = _wrap(db.get_notebooklm_credential_status)
+save_notebooklm_credentials = _wrap(db.save_notebooklm_credentials)
+delete_notebooklm_credentials = _wrap(db.delete_notebooklm_credentials)
+set_notebooklm_session_status = _wrap(db.set_notebooklm_session_status)
+
+# Scheduler sharding
+heartbeat_scheduler_worker = _wrap(db.heartbeat_scheduler_worker)
+get_live_scheduler_workers = _wrap(db.get_live_scheduler_workers)
+remove_scheduler_worker = _wrap(db.remove_scheduler_worker)
+create_scheduler_run = _wrap(db.create_scheduler_run)
+get_scheduler_runs_since = _wrap(db.get_scheduler_runs_since)
+acquire_generation_leases = _wrap(db.acquire_generation_leases)
+renew_generation_leases = _wrap(db.renew_generation_leases)
+release_generation_lease = _wrap(db.release_generation_lease)
@@ -0,0 +1,267 @@
+"""
+Shared Playwright browser for NotebookLM logins.
+
+Every login used to launch its own persistent Chromium and hold the request
+open for up to five minutes, so a few concurrent logins exhausted container
+memory. Instead one browser process is kept per backend process and each
+login gets its own isolated context (separate cookies and storage), which
+costs a fraction of a browser.
+
+Logins are asynchronous:
+
+    session = await browser_pool.start_login(user_id, on_complete)
+    browser_pool.get(user_id)            # poll: queued/running/...
+    await browser_pool.finish(user_id)   # capture the session now
+
+At most BROWSER_MAX_SESSIONS contexts are open at once; further logins wait
+in a FIFO queue of at most BROWSER_MAX_QUEUED, beyond which start_login
+raises PoolFull. A login nobody has polled for BROWSER_IDLE_SECONDS is
+closed by the reaper, which also shuts the browser down once it has had no
+sessions for that long.
+"""
+
+import asyncio
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.config import get_settings
+from app.services.log import get_logger
+from app.services.metrics import browser_login_sessions
+
+logger = get_logger(__name__)
+
+NOTEBOOKLM_URL = "https://notebooklm.google.com/"
+# Present once the user is signed in to NotebookLM
+LOGGED_IN_SELECTOR = '[data-testid="notebook-card"], [aria-label="Get started"]'
+
+BROWSER_ARGS = [
+    "--disable-blink-features=AutomationControlled",  # Hide automation
+    "--password-store=basic",  # Avoid keychain issues
+    "--no-sandbox",  # Required for Docker/Railway
+    "--disable-setuid-sandbox",  # Required for Docker/Railway
+    "--disable-dev-shm-usage",  # Overcome limited resource problems
+    "--disable-gpu",  # Not needed in headless
+]
+
+ACTIVE_STATES = ("queued", "running")
+
+# Finished sessions stay pollable this long
+FINISHED_RETENTION_SECONDS = 300
+
+
+class PoolFull(Exception):
+    """Too many logins are already queued."""
+
+
+class LoginSession:
+    """One user's login, from queued to a terminal state."""
+
+    def __init__(self, user_id: str):
+        self.id = str(uuid.uuid4())
+        self.user_id = user_id
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.last_seen = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.finish_requested = asyncio.Event()
+
+    def touch(self) -> None:
+        self.last_seen = time.monotonic()
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE_STATES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "login_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+        }
+
+
+class BrowserPool:
+    """One long-lived Chromium shared by per-user login contexts."""
+
+    def __init__(self):
+        self._sessions: Dict[str, LoginSession] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._playwright = None
+        self._browser = None
+        self._browser_lock = asyncio.Lock()
+        self._idle_since = time.monotonic()
+        self._reaper: Optional[asyncio.Task] = None
+
+        for state in ACTIVE_STATES:
+            browser_login_sessions.labels(state).set_function(
+                lambda state=state: sum(1 for s in self._sessions.values() if s.status == state)
+            )
+
+    def get(self, user_id: str) -> Optional[LoginSession]:
+        """Get the user's current or most recent login, and mark it as watched."""
+        session = self._sessions.get(user_id)
+        if session is not None:
+            session.touch()
+        return session
+
+    async def start_login(
+        self,
+        user_id: str,
+        on_complete: Callable[[Dict], Awaitable[None]],
+    ) -> LoginSession:
+        """
+        Queue a login for a user; returns immediately.
+
+        A user with a login already queued or running gets that one back.
+        on_complete is awaited with the Playwright storage state once the
+        user has signed in.
+
+        Raises:
+            PoolFull: If BROWSER_MAX_QUEUED logins are already waiting
+        """
+        existing = self.get(user_id)
+        if existing is not None and existing.active:
+            return existing
+
+        settings = get_settings()
+        active = sum(1 for s in self._sessions.values() if s.active)
+        if active >= settings.browser_max_sessions + settings.browser_max_queued:
+            raise PoolFull(f"{active - settings.browser_max_sessions} NotebookLM logins are already waiting")
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(settings.browser_max_sessions)
+
+        session = LoginSession(user_id)
+        self._sessions[user_id] = session
+        session.task = asyncio.ensure_future(self._run(session, on_complete))
+        self._ensure_reaper()
+        return session
+
+    async def finish(self, user_id: str) -> Optional[LoginSession]:
+        """Capture the session now, for users who signed in but weren't detected."""
+        session = self.get(user_id)
+        if session is not None and session.status == "running":
+            session.finish_requested.set()
+            await asyncio.wait({session.task})
+        return session
+
+    async def cancel(self, user_id: str) -> None:
+        session = self._sessions.get(user_id)
+        if session is not None and session.active:
+            self._end(session, "cancelled")
+            session.task.cancel()
+
+    async def _run(self, session: LoginSession, on_complete: Callable[[Dict], Awaitable[None]]) -> None:
+        settings = get_settings()
+        async with self._semaphore:
+            if not session.active:
+                return
+            session.status = "running"
+            context = None
+            try:
+                browser = await self._get_browser()
+                context = await browser.new_context()
+                page = await context.new_page()
+                await page.goto(NOTEBOOKLM_URL)
+
+                # Done when NotebookLM loads, the user says so, or time runs out
+                logged_in = asyncio.ensure_future(
+                    page.wait_for_selector(LOGGED_IN_SELECTOR, timeout=settings.browser_login_timeout_seconds * 1000)
+                )
+                finish = asyncio.ensure_future(session.finish_requested.wait())
+                try:
+                    await asyncio.wait({logged_in, finish}, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    finish.cancel()
+                    logged_in.cancel()
+
+                if logged_in.done() and not logged_in.cancelled() and logged_in.exception() is not None:
+                    self._end(session, "failed", "NotebookLM sign-in was not detected in time")
+                    return
+
+                await on_complete(await context.storage_state())
+                self._end(session, "succeeded")
+            except asyncio.CancelledError:
+                self._end(session, "cancelled")
+                raise
+            except Exception as e:
+                logger.exception("NotebookLM login failed for %s", session.user_id)
+                self._end(session, "failed", str(e))
+            finally:
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception:
+                        pass
+                if not any(s.status == "running" for s in self._sessions.values()):
+                    self._idle_since = time.monotonic()
+
+    def _end(self, session: LoginSession, status: str, error: Optional[str] = None) -> None:
+        if session.active:
+            session.status = status
+            session.error = error
+            session.finished_at = time.monotonic()
+
+    async def _get_browser(self):
+        async with self._browser_lock:
+            if self._browser is None or not self._browser.is_connected():
+                from playwright.async_api import async_playwright
+
+                if self._playwright is None:
+                    self._playwright = await async_playwright().start()
+                # "true" in production (Railway/Render with Xvfb), "false" for a visible window
+                headless = get_settings().browser_headless.lower() in ("true", "1", "yes")
+                self._browser = await self._playwright.chromium.launch(
+                    headless=headless,
+                    args=BROWSER_ARGS,
+                    ignore_default_args=["--enable-automation"],  # Remove automation flag
+                )
+                logger.info("Launched shared Chromium for NotebookLM logins")
+            return self._browser
+
+    def _ensure_reaper(self) -> None:
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.ensure_future(self._reap_loop())
+
+    async def _reap_loop(self) -> None:
+        idle_seconds = get_settings().browser_idle_seconds
+        while self._sessions or self._browser is not None:
+            await asyncio.sleep(min(30, idle_seconds))
+            await self.reap(idle_seconds)
+
+    async def reap(self, idle_seconds: int) -> None:
+        """Close abandoned logins, forget old ones, and stop an idle browser."""
+        now = time.monotonic()
+        for user_id, session in list(self._sessions.items()):
+            if session.active and now - session.last_seen > idle_seconds:
+                logger.info("Reaping abandoned NotebookLM login for %s", user_id)
+                await self.cancel(user_id)
+            elif not session.active and now - (session.finished_at or now) > FINISHED_RETENTION_SECONDS:
+                del self._sessions[user_id]
+
+        busy = any(s.active for s in self._sessions.values())
+        if not busy and self._browser is not None and now - self._idle_since > idle_seconds:
+            await self.shutdown()
+
+    async def shutdown(self) -> None:
+        """Cancel running logins and stop the browser."""
+        for user_id in list(self._sessions):
+            await self.cancel(user_id)
+        async with self._browser_lock:
+            if self._browser is not None:
+                try:
+                    await self._browser.close()
+                except Exception:
+                    pass
+                self._browser = None
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+
+# Global instance
+browser_pool = BrowserPool()
@@ -0,0 +1,235 @@
+"""
+Read-through cache for rarely changing per-user rows.
+
+db functions opt in with the @cached decorator, keyed by the user ID they
+take as first argument, and the matching write paths call invalidate():
+
+    @cached("rss_sources")
+    @instrument_upstream("supabase")
+    def get_rss_sources(user_id): ...
+
+    def add_rss_source(user_id, ...):
+        ...
+        invalidate("rss_sources", user_id)
+
+Backends (CACHE_BACKEND):
+- "memory": per-process LRU with a TTL. Right for a single replica; with
+  several replicas another replica's write is only seen once the TTL expires.
+- "shared": a key-value store shared by all replicas, so invalidations are
+  seen everywhere. Values are stored as JSON. Install a client with
+  set_shared_store(); until then a LocalStore stand-in is used.
+- "none": no caching.
+"""
+
+import copy
+import functools
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Protocol, Tuple
+
+from app.config import get_settings
+from app.services.metrics import record_cache
+
+_MISSING = object()
+
+
+class CacheBackend(Protocol):
+    """Storage used by the read-through cache."""
+
+    def get(self, key: str) -> Any:
+        """Return the cached value, or _MISSING."""
+
+    def set(self, key: str, value: Any, ttl_seconds: int) -> None:
+        ...
+
+    def delete(self, key: str) -> None:
+        ...
+
+
+class MemoryBackend:
+    """Thread-safe LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+        # Copy so callers can't mutate the cached value
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value: Any, ttl_seconds: int) -> None:
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SharedStore(Protocol):
+    """
+    Minimal key-value client interface, modelled on Redis.
+
+    A redis.Redis instance satisfies it as-is.
+    """
+
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    def set(self, key: str, value: bytes, ex: Optional[int] = None) -> Any:
+        ...
+
+    def delete(self, *keys: str) -> Any:
+        ...
+
+
+class LocalStore:
+    """In-process stand-in for a shared store, for development and tests."""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Optional[float], bytes]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: str, value: bytes, ex: Optional[int] = None) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ex if ex else None, value)
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+
+class SharedBackend:
+    """Cache backend on top of a SharedStore; values are JSON-encoded."""
+
+    def __init__(self, store: SharedStore, prefix: str = "dailybrief:cache:"):
+        self.store = store
+        self.prefix = prefix
+
+    def get(self, key: str) -> Any:
+        raw = self.store.get(self.prefix + key)
+        if raw is None:
+            return _MISSING
+        return json.loads(raw)
+
+    def set(self, key: str, value: Any, ttl_seconds: int) -> None:
+        self.store.set(self.prefix + key, json.dumps(value, default=str).encode("utf-8"), ex=ttl_seconds)
+
+    def delete(self, key: str) -> None:
+        self.store.delete(self.prefix + key)
+
+
+_backend: Optional[CacheBackend] = None
+_shared_store: Optional[SharedStore] = None
+_backend_lock = threading.Lock()
+_store_lock = threading.Lock()
+
+# Bumped by invalidate(); a read that started before an invalidation of the
+# same key doesn't store its (possibly stale) result
+_versions: Dict[str, int] = {}
+
+
+def set_shared_store(store: SharedStore) -> None:
+    """Use a real shared store (e.g. a Redis client) for the "shared" backend."""
+    global _shared_store, _backend
+    _shared_store = store
+    _backend = None
+
+
+def get_shared_store() -> SharedStore:
+    """The store installed with set_shared_store(), or a LocalStore stand-in."""
+    global _shared_store
+    if _shared_store is None:
+        with _store_lock:
+            if _shared_store is None:
+                _shared_store = LocalStore()
+    return _shared_store
+
+
+def get_backend() -> Optional[CacheBackend]:
+    """Get the configured backend, or None when caching is disabled."""
+    global _backend
+    settings = get_settings()
+    if settings.cache_backend == "none":
+        return None
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if settings.cache_backend == "shared":
+                    _backend = SharedBackend(get_shared_store())
+                else:
+                    _backend = MemoryBackend(settings.cache_max_entries)
+    return _backend
+
+
+def _key(namespace: str, user_id: str) -> str:
+    return f"{namespace}:{user_id}"
+
+
+def cached(namespace: str) -> Callable:
+    """Read-through cache a function whose first argument is a user ID."""
+
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(user_id: str, *args: Any, **kwargs: Any) -> Any:
+            backend = get_backend()
+            if backend is None:
+                return fn(user_id, *args, **kwargs)
+
+            key = _key(namespace, user_id)
+            value = backend.get(key)
+            if value is not _MISSING:
+                record_cache(namespace, hit=True)
+                return value
+            record_cache(namespace, hit=False)
+
+            version = _versions.get(key, 0)
+            value = fn(user_id, *args, **kwargs)
+            if _versions.get(key, 0) == version:
+                backend.set(key, value, get_settings().cache_ttl_seconds)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+def invalidate(namespace: str, user_id: str) -> None:
+    """Drop a user's cached entry after a write."""
+    key = _key(namespace, user_id)
+    _versions[key] = _versions.get(key, 0) + 1
+    backend = get_backend()
+    if backend is not None:
+        backend.delete(key)
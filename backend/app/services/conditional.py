@@ -0,0 +1,36 @@
+"""
+Conditional GET support for polled read endpoints.
+
+Responses get a weak ETag derived from a hash of the serialized body, and a
+request whose If-None-Match carries that tag is answered with an empty 304.
+The body is still built server-side (the cached db reads keep that cheap);
+what is saved is shipping and parsing the same JSON on every poll.
+
+Responses are marked "private, no-cache", so browsers keep them and
+revalidate each time: the frontend's plain fetch() calls get conditional
+requests and 304s without any client changes.
+"""
+
+import hashlib
+from typing import Optional
+
+
+def weak_etag(body: bytes) -> str:
+    """Weak validator for a response body (weak, as gzip may re-encode it)."""
+    return 'W/"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches, using weak comparison."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
@@ -1,9 +1,24 @@
 """Database service for Supabase operations."""
-from typing import List, Dict, Optional
-from datetime import datetime, time
+from typing import Iterable, List, Dict, Optional, Set, Tuple
+from datetime import datetime
 from supabase import Client
+from postgrest.exceptions import APIError
 
 from app.config import get_settings
+from app.services.cache import cached, invalidate
+from app.services.metrics import instrument_upstream
+
+# Postgres error code raised when a unique constraint is violated
+UNIQUE_VIOLATION = "23505"
+
+# Generation statuses that mean a run is still in flight
+ACTIVE_GENERATION_STATUSES = ("scheduled", "fetching", "generating")
+
+# Max IDs per IN (...) filter; keeps PostgREST request URLs well under limits
+IN_FILTER_CHUNK_SIZE = 200
+
+# Max rows per bulk insert request
+INSERT_BATCH_SIZE = 500
 
 
 def get_db_client() -> Client:
@@ -14,6 +29,8 @@ def get_db_client() -> Client:
 
 
 # RSS Sources
+@cached("rss_sources")
+@instrument_upstream("supabase")
 def get_rss_sources(user_id: str) -> List[Dict]:
     """Get all RSS sources for a user."""
     client = get_db_client()
@@ -21,6 +38,7 @@ def get_rss_sources(user_id: str) -> List[Dict]:
     return response.data
 
 
+@instrument_upstream("supabase")
 def add_rss_source(user_id: str, url: str, name: str) -> Dict:
     """Add a new RSS source."""
     client = get_db_client()
@@ -31,17 +49,39 @@ def add_rss_source(user_id: str, url: str, name: str) -> Dict:
         "enabled": True,
     }
     response = client.table("rss_sources").insert(data).execute()
+    invalidate("rss_sources", user_id)
     return response.data[0]
 
 
+@instrument_upstream("supabase")
+def add_rss_sources(user_id: str, sources: List[Tuple[str, str]]) -> List[Dict]:
+    """Add many RSS sources from (url, name) pairs, in batched inserts."""
+    client = get_db_client()
+    created: List[Dict] = []
+    for start in range(0, len(sources), INSERT_BATCH_SIZE):
+        batch = sources[start:start + INSERT_BATCH_SIZE]
+        response = client.table("rss_sources").insert([
+            {"user_id": user_id, "url": url, "name": name, "enabled": True}
+            for url, name in batch
+        ]).execute()
+        created.extend(response.data)
+    if created:
+        invalidate("rss_sources", user_id)
+    return created
+
+
+@instrument_upstream("supabase")
 def delete_rss_source(user_id: str, source_id: str) -> bool:
     """Delete an RSS source."""
     client = get_db_client()
     client.table("rss_sources").delete().eq("id", source_id).eq("user_id", user_id).execute()
+    invalidate("rss_sources", user_id)
     return True
 
 
 # News Topics
+@cached("news_topics")
+@instrument_upstream("supabase")
 def get_news_topics(user_id: str) -> List[Dict]:
     """Get all news topics for a user."""
     client = get_db_client()
@@ -49,6 +89,7 @@ def get_news_topics(user_id: str) -> List[Dict]:
     return response.data
 
 
+@instrument_upstream("supabase")
 def add_news_topic(user_id: str, topic: str) -> Dict:
     """Add a new news topic."""
     client = get_db_client()
@@ -58,17 +99,22 @@ def add_news_topic(user_id: str, topic: str) -> Dict:
         "enabled": True,
     }
     response = client.table("news_topics").insert(data).execute()
+    invalidate("news_topics", user_id)
     return response.data[0]
 
 
+@instrument_upstream("supabase")
 def delete_news_topic(user_id: str, topic_id: str) -> bool:
     """Delete a news topic."""
     client = get_db_client()
     client.table("news_topics").delete().eq("id", topic_id).eq("user_id", user_id).execute()
+    invalidate("news_topics", user_id)
     return True
 
 
 # User Preferences
+@cached("user_preferences")
+@instrument_upstream("supabase")
 def get_user_preferences(user_id: str) -> Optional[Dict]:
     """Get user preferences."""
     client = get_db_client()
@@ -81,6 +127,7 @@ def get_user_preferences(user_id: str) -> Optional[Dict]:
     return create_user_preferences(user_id)
 
 
+@instrument_upstream("supabase")
 def create_user_preferences(user_id: str) -> Dict:
     """Create default user preferences."""
     client = get_db_client()
@@ -94,9 +141,11 @@ def create_user_preferences(user_id: str) -> Dict:
         "generation_time": "07:00:00",
     }
     response = client.table("user_preferences").insert(data).execute()
+    invalidate("user_preferences", user_id)
     return response.data[0]
 
 
+@instrument_upstream("supabase")
 def update_user_preferences(user_id: str, updates: Dict) -> Dict:
     """Update user preferences."""
     client = get_db_client()
@@ -111,11 +160,28 @@ def update_user_preferences(user_id: str, updates: Dict) -> Dict:
         **updates
     }).execute()
 
+    invalidate("user_preferences", user_id)
     return response.data[0]
 
 
+# User Profile
+@instrument_upstream("supabase")
+def get_user_profile(user_id: str) -> Dict:
+    """
+    Get a user's preferences, sources, topics and NotebookLM connection state.
+
+    One call to the get_user_profile RPC instead of a select per table.
+    Returns a dict with keys user_id, preferences (None if not created yet),
+    rss_sources, news_topics, substack_sources and notebooklm_connected.
+    """
+    client = get_db_client()
+    response = client.rpc("get_user_profile", {"p_user_id": user_id}).execute()
+    return response.data
+
+
 # Generation Logs
-def create_generation_log(user_id: str) -> Dict:
+@instrument_upstream("supabase")
+def create_generation_log(user_id: str, idempotency_key: Optional[str] = None) -> Dict:
     """Create a new generation log."""
     client = get_db_client()
     data = {
@@ -123,24 +189,105 @@ def create_generation_log(user_id: str) -> Dict:
         "scheduled_at": datetime.utcnow().isoformat() + 'Z',
         "status": "scheduled",
     }
+    if idempotency_key:
+        data["idempotency_key"] = idempotency_key
     response = client.table("generation_logs").insert(data).execute()
     return response.data[0]
 
 
-def get_generation_logs(user_id: str, limit: int = 10) -> List[Dict]:
-    """Get generation logs for a user."""
+@instrument_upstream("supabase")
+def claim_generation_log(user_id: str, idempotency_key: str) -> Tuple[Dict, bool]:
+    """
+    Create a generation log for an idempotency key, or return the existing one.
+
+    Uniqueness of (user_id, idempotency_key), enforced by the insert
+    trigger on generation_logs, makes the insert the arbiter, so
+    concurrent callers with the same key all end up with the same log.
+    Returns (log, created).
+    """
+    try:
+        return create_generation_log(user_id, idempotency_key), True
+    except APIError as e:
+        if e.code != UNIQUE_VIOLATION:
+            raise
+
+    existing = get_generation_log_by_key(user_id, idempotency_key)
+    if existing is None:
+        raise RuntimeError(f"Generation log for key {idempotency_key} vanished after conflict")
+    return existing, False
+
+
+@instrument_upstream("supabase")
+def get_generation_log_by_key(user_id: str, idempotency_key: str) -> Optional[Dict]:
+    """Get the generation log created for an idempotency key."""
+    client = get_db_client()
+    response = (
+        client.table("generation_logs")
+        .select("*")
+        .eq("user_id", user_id)
+        .eq("idempotency_key", idempotency_key)
+        .execute()
+    )
+    return response.data[0] if response.data else None
+
+
+@instrument_upstream("supabase")
+def get_latest_generation_log(user_id: str) -> Optional[Dict]:
+    """Get the user's most recent generation log, whatever its status."""
     client = get_db_client()
     response = (
         client.table("generation_logs")
         .select("*")
         .eq("user_id", user_id)
         .order("scheduled_at", desc=True)
+        .order("id", desc=True)
+        .limit(1)
+        .execute()
+    )
+    return response.data[0] if response.data else None
+
+
+@instrument_upstream("supabase")
+def get_generation_logs(
+    user_id: str,
+    limit: int = 10,
+    before: Optional[Tuple[str, str]] = None,
+    fields: Optional[List[str]] = None,
+) -> List[Dict]:
+    """
+    Get a page of generation logs for a user, newest first.
+
+    Pages by keyset on (scheduled_at, id) so deep pages cost the same as the
+    first one; served by idx_generation_logs_user_scheduled.
+
+    Args:
+        limit: Page size
+        before: (scheduled_at, id) of the last row of the previous page
+        fields: Columns to select (default all)
+    """
+    client = get_db_client()
+    query = (
+        client.table("generation_logs")
+        .select(",".join(fields) if fields else "*")
+        .eq("user_id", user_id)
+    )
+    if before:
+        scheduled_at, log_id = before
+        query = query.or_(
+            f'scheduled_at.lt."{scheduled_at}",'
+            f'and(scheduled_at.eq."{scheduled_at}",id.lt.{log_id})'
+        )
+    response = (
+        query
+        .order("scheduled_at", desc=True)
+        .order("id", desc=True)
         .limit(limit)
         .execute()
     )
     return response.data
 
 
+@instrument_upstream("supabase")
 def get_generation_log(user_id: str, generation_id: str) -> Optional[Dict]:
     """Get a specific generation log."""
     client = get_db_client()
@@ -154,6 +301,7 @@ def get_generation_log(user_id: str, generation_id: str) -> Optional[Dict]:
     return response.data[0] if response.data else None
 
 
+@instrument_upstream("supabase")
 def update_generation_log(generation_id: str, updates: Dict) -> Dict:
     """Update a generation log."""
     client = get_db_client()
@@ -168,7 +316,42 @@ def update_generation_log(generation_id: str, updates: Dict) -> Dict:
     return response.data[0]
 
 
+@instrument_upstream("supabase")
+def apply_generation_log_updates(updates: Dict[str, Dict]) -> int:
+    """
+    Apply updates to many generation logs in one statement.
+
+    Args:
+        updates: {generation_id: {column: value}}; only the given columns
+            are changed on each row
+
+    Returns:
+        Number of rows updated (the rows themselves are not returned)
+    """
+    client = get_db_client()
+    response = client.rpc("apply_generation_log_updates", {
+        "p_updates": [{"id": generation_id, **columns} for generation_id, columns in updates.items()],
+    }).execute()
+    return response.data or 0
+
+
+@instrument_upstream("supabase")
+def compact_generation_logs(max_age_days: int, keep_per_user: int) -> Dict:
+    """
+    Fold old generation logs into generation_log_daily_stats and remove them.
+
+    Returns counts of compacted rows and dropped/created partitions.
+    """
+    client = get_db_client()
+    response = client.rpc("compact_generation_logs", {
+        "p_max_age_days": max_age_days,
+        "p_keep_per_user": keep_per_user,
+    }).execute()
+    return response.data
+
+
 # Scheduler functions
+@instrument_upstream("supabase")
 def get_users_with_daily_generation_enabled() -> List[Dict]:
     """Get all users with daily generation enabled."""
     client = get_db_client()
@@ -181,22 +364,143 @@ def get_users_with_daily_generation_enabled() -> List[Dict]:
     return response.data
 
 
+# Bulk loaders for scheduled runs
+def _chunks(items: List[str], size: int = IN_FILTER_CHUNK_SIZE) -> Iterable[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _group_by_user(rows: List[Dict], user_ids: List[str]) -> Dict[str, List[Dict]]:
+    grouped: Dict[str, List[Dict]] = {user_id: [] for user_id in user_ids}
+    for row in rows:
+        grouped.setdefault(row["user_id"], []).append(row)
+    return grouped
+
+
+@instrument_upstream("supabase")
+def get_enabled_rss_sources_for_users(user_ids: List[str]) -> Dict[str, List[Dict]]:
+    """Get enabled RSS sources for many users, keyed by user_id."""
+    client = get_db_client()
+    rows: List[Dict] = []
+    for chunk in _chunks(user_ids):
+        response = (
+            client.table("rss_sources")
+            .select("id, user_id, url, name, enabled")
+            .in_("user_id", chunk)
+            .eq("enabled", True)
+            .execute()
+        )
+        rows.extend(response.data)
+    return _group_by_user(rows, user_ids)
+
+
+@instrument_upstream("supabase")
+def get_enabled_news_topics_for_users(user_ids: List[str]) -> Dict[str, List[Dict]]:
+    """Get enabled news topics for many users, keyed by user_id."""
+    client = get_db_client()
+    rows: List[Dict] = []
+    for chunk in _chunks(user_ids):
+        response = (
+            client.table("news_topics")
+            .select("id, user_id, topic, enabled")
+            .in_("user_id", chunk)
+            .eq("enabled", True)
+            .execute()
+        )
+        rows.extend(response.data)
+    return _group_by_user(rows, user_ids)
+
+
+@instrument_upstream("supabase")
+def get_users_with_notebooklm_credentials(user_ids: List[str]) -> Dict[str, Dict]:
+    """
+    Get which of the given users have NotebookLM credentials stored.
+
+    Returns {user_id: {"session_status", "session_checked_at"}} for users
+    with a session; see migrations/add_credential_health.sql.
+    """
+    client = get_db_client()
+    found: Dict[str, Dict] = {}
+    for chunk in _chunks(user_ids):
+        response = (
+            client.table("user_credentials")
+            .select("user_id, session_status, session_checked_at")
+            .in_("user_id", chunk)
+            .not_.is_("notebooklm_session", "null")
+            .execute()
+        )
+        for row in response.data:
+            found[row.pop("user_id")] = row
+    return found
+
+
+@instrument_upstream("supabase")
+def claim_generation_logs(claims: List[Tuple[str, str]]) -> Dict[str, Tuple[Dict, bool]]:
+    """
+    Batch form of claim_generation_log for (user_id, idempotency_key) pairs.
+
+    One call to the claim_generation_logs RPC, which registers every new key,
+    inserts their logs and returns each pair's log with whether it was
+    created. Returns {user_id: (log, created)}.
+    """
+    if not claims:
+        return {}
+    client = get_db_client()
+    response = client.rpc("claim_generation_logs", {
+        "p_user_ids": [user_id for user_id, _ in claims],
+        "p_keys": [key for _, key in claims],
+    }).execute()
+
+    claimed = {row["log"]["user_id"]: (row["log"], row["created"]) for row in response.data}
+    missing = {user_id for user_id, _ in claims} - set(claimed)
+    if missing:
+        raise RuntimeError(f"Generation logs vanished after conflict for {len(missing)} users")
+    return claimed
+
+
 # NotebookLM Credentials
+@instrument_upstream("supabase")
 def get_notebooklm_credentials(user_id: str) -> Optional[Dict]:
-    """Get NotebookLM credentials for a user."""
+    """
+    Get a user's NotebookLM session and its version.
+
+    Returns {"notebooklm_session": ..., "updated_at": ...}, or None if no
+    session is stored. updated_at changes on every save and revoke.
+    """
     client = get_db_client()
     response = (
         client.table("user_credentials")
-        .select("notebooklm_session")
+        .select("notebooklm_session, updated_at")
         .eq("user_id", user_id)
         .execute()
     )
 
     if response.data and response.data[0].get("notebooklm_session"):
-        return response.data[0]["notebooklm_session"]
+        return response.data[0]
     return None
 
 
+@instrument_upstream("supabase")
+def get_notebooklm_credential_status(user_id: str) -> Optional[Dict]:
+    """
+    Get when a user's NotebookLM session was stored, and its last probe
+    result, without the session.
+
+    Returns {"updated_at", "session_status", "session_checked_at"}, or None
+    if no session is stored.
+    """
+    client = get_db_client()
+    response = (
+        client.table("user_credentials")
+        .select("updated_at, session_status, session_checked_at")
+        .eq("user_id", user_id)
+        .not_.is_("notebooklm_session", "null")
+        .execute()
+    )
+    return response.data[0] if response.data else None
+
+
+@instrument_upstream("supabase")
 def save_notebooklm_credentials(user_id: str, credentials: Dict) -> Dict:
     """Save NotebookLM credentials for a user."""
     client = get_db_client()
@@ -204,6 +508,10 @@ def save_notebooklm_credentials(user_id: str, credentials: Dict) -> Dict:
     data = {
         "user_id": user_id,
         "notebooklm_session": credentials,
+        # A new session hasn't been probed yet
+        "session_status": None,
+        "session_checked_at": None,
+        "session_error": None,
         "updated_at": datetime.utcnow().isoformat(),
     }
 
@@ -212,11 +520,133 @@ def save_notebooklm_credentials(user_id: str, credentials: Dict) -> Dict:
     return response.data[0]
 
 
+@instrument_upstream("supabase")
+def set_notebooklm_session_status(user_ids: List[str], status: str, error: Optional[str] = None) -> None:
+    """
+    Record a credential probe result ("valid" or "stale") for users.
+
+    Leaves updated_at alone: it versions the session itself, which the
+    probe doesn't change.
+    """
+    client = get_db_client()
+    checked_at = datetime.utcnow().isoformat() + 'Z'
+    for chunk in _chunks(user_ids):
+        client.table("user_credentials").update({
+            "session_status": status,
+            "session_checked_at": checked_at,
+            "session_error": error,
+        }).in_("user_id", chunk).execute()
+
+
+@instrument_upstream("supabase")
 def delete_notebooklm_credentials(user_id: str) -> bool:
     """Delete NotebookLM credentials for a user."""
     client = get_db_client()
     client.table("user_credentials").update({
         "notebooklm_session": None,
+        # The probe result belonged to the deleted session
+        "session_status": None,
+        "session_checked_at": None,
+        "session_error": None,
         "updated_at": datetime.utcnow().isoformat(),
     }).eq("user_id", user_id).execute()
     return True
+
+
+# Scheduler sharding
+@instrument_upstream("supabase")
+def heartbeat_scheduler_worker(worker_id: str) -> None:
+    """Record a heartbeat for a scheduler worker."""
+    client = get_db_client()
+    client.table("scheduler_workers").upsert({
+        "worker_id": worker_id,
+        "heartbeat_at": datetime.utcnow().isoformat() + 'Z',
+    }).execute()
+
+
+@instrument_upstream("supabase")
+def get_live_scheduler_workers(since: datetime) -> List[str]:
+    """Get IDs of scheduler workers that have heartbeated since `since`."""
+    client = get_db_client()
+    response = (
+        client.table("scheduler_workers")
+        .select("worker_id")
+        .gte("heartbeat_at", since.isoformat() + 'Z')
+        .execute()
+    )
+    return [row["worker_id"] for row in response.data]
+
+
+@instrument_upstream("supabase")
+def remove_scheduler_worker(worker_id: str) -> None:
+    """Remove a scheduler worker from membership."""
+    client = get_db_client()
+    client.table("scheduler_workers").delete().eq("worker_id", worker_id).execute()
+
+
+@instrument_upstream("supabase")
+def create_scheduler_run(requested_by: str) -> Dict:
+    """Record a scheduler run so every worker executes its shard of it."""
+    client = get_db_client()
+    response = client.table("scheduler_runs").insert({
+        "requested_by": requested_by,
+    }).execute()
+    return response.data[0]
+
+
+@instrument_upstream("supabase")
+def get_scheduler_runs_since(since: datetime) -> List[Dict]:
+    """Get scheduler runs created since `since`."""
+    client = get_db_client()
+    response = (
+        client.table("scheduler_runs")
+        .select("id, created_at")
+        .gte("created_at", since.isoformat() + 'Z')
+        .execute()
+    )
+    return response.data
+
+
+@instrument_upstream("supabase")
+def renew_generation_leases(worker_id: str, ttl_seconds: int) -> Set[Tuple[str, str]]:
+    """Extend every lease a worker still holds. Returns the renewed (user_id, slot) pairs."""
+    client = get_db_client()
+    response = client.rpc("renew_generation_leases", {
+        "p_worker_id": worker_id,
+        "p_ttl_seconds": ttl_seconds,
+    }).execute()
+    return {(row["user_id"], row["slot"]) for row in response.data or []}
+
+
+@instrument_upstream("supabase")
+def release_generation_lease(user_id: str, slot: str, worker_id: str) -> None:
+    """Release a lease held by a worker."""
+    client = get_db_client()
+    (
+        client.table("generation_leases")
+        .delete()
+        .eq("user_id", user_id)
+        .eq("slot", slot)
+        .eq("worker_id", worker_id)
+        .execute()
+    )
+
+
+@instrument_upstream("supabase")
+def acquire_generation_leases(
+    claims: List[Tuple[str, str]], worker_id: str, ttl_seconds: int
+) -> Set[str]:
+    """
+    Take the leases for many (user_id, slot) pairs if they are free, expired
+    or already ours. Returns the users whose lease was taken.
+    """
+    if not claims:
+        return set()
+    client = get_db_client()
+    response = client.rpc("acquire_generation_leases", {
+        "p_user_ids": [user_id for user_id, _ in claims],
+        "p_slots": [slot for _, slot in claims],
+        "p_worker_id": worker_id,
+        "p_ttl_seconds": ttl_seconds,
+    }).execute()
+    return {row["user_id"] for row in response.data or []}
@@ -0,0 +1,158 @@
+"""
+Publish/subscribe for generation progress events.
+
+StatusBuffer.update publishes every status change for a generation, and
+GET /generations/{id}/events subscribes to stream them to the client as
+server-sent events:
+
+    async with event_broker.subscribe(generation_id) as subscription:
+        event = await subscription.get(timeout=15)
+
+Events go through a transport so they can reach subscribers on other
+replicas. The default LocalTransport delivers within this process only;
+install a shared one with set_transport(), e.g. on top of Redis pub/sub:
+
+    class RedisTransport:
+        async def publish(self, channel, message):
+            await redis.publish(channel, message)
+        async def start(self, deliver):
+            pubsub = redis.pubsub()
+            await pubsub.psubscribe("generation:*")
+            ... call deliver(channel, data) for each message ...
+        async def stop(self): ...
+
+Without a shared transport a client connected to another replica than the
+one running its generation sees no pushed events; the SSE endpoint also
+re-reads the generation every SSE_RESYNC_SECONDS to cover that case.
+"""
+
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Optional, Protocol, Set
+
+from app.services.log import get_logger
+from app.services.metrics import event_subscribers
+
+logger = get_logger(__name__)
+
+CHANNEL_PREFIX = "generation:"
+
+# Events buffered per subscriber; a slow client drops the oldest first
+SUBSCRIBER_QUEUE_SIZE = 32
+
+
+class EventTransport(Protocol):
+    """Carries published events to the brokers of every replica."""
+
+    async def publish(self, channel: str, message: str) -> None:
+        ...
+
+    async def start(self, deliver: Callable[[str, str], None]) -> None:
+        """Begin calling deliver(channel, message) for every published event."""
+
+    async def stop(self) -> None:
+        ...
+
+
+class LocalTransport:
+    """Delivers events to subscribers in this process only."""
+
+    def __init__(self):
+        self._deliver: Optional[Callable[[str, str], None]] = None
+
+    async def publish(self, channel: str, message: str) -> None:
+        if self._deliver is not None:
+            self._deliver(channel, message)
+
+    async def start(self, deliver: Callable[[str, str], None]) -> None:
+        self._deliver = deliver
+
+    async def stop(self) -> None:
+        self._deliver = None
+
+
+class Subscription:
+    """Queue of events for one generation, for one client."""
+
+    def __init__(self):
+        self._queue: "asyncio.Queue[Dict]" = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def put(self, event: Dict) -> None:
+        if self._queue.full():
+            self._queue.get_nowait()
+        self._queue.put_nowait(event)
+
+    async def get(self, timeout: float) -> Optional[Dict]:
+        """Wait for the next event; None if none arrives within timeout."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBroker:
+    """Fans events out to this process's subscribers, by generation."""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._transport: EventTransport = LocalTransport()
+        self._started = False
+        event_subscribers.set_function(lambda: sum(len(s) for s in self._subscribers.values()))
+
+    async def set_transport(self, transport: EventTransport) -> None:
+        """Use a shared transport (for multi-replica fan-out) instead of LocalTransport."""
+        if self._started:
+            await self._transport.stop()
+        self._transport = transport
+        self._started = False
+
+    async def _ensure_started(self) -> None:
+        if not self._started:
+            self._started = True
+            await self._transport.start(self._deliver)
+
+    async def publish(self, generation_id: str, event: Dict) -> None:
+        """Publish an event for a generation. Failures are logged, not raised."""
+        try:
+            await self._ensure_started()
+            await self._transport.publish(
+                CHANNEL_PREFIX + generation_id,
+                json.dumps(event, default=str),
+            )
+        except Exception as e:
+            logger.warning("Failed to publish event for generation %s: %s", generation_id, e)
+
+    def _deliver(self, channel: str, message: str) -> None:
+        if not channel.startswith(CHANNEL_PREFIX):
+            return
+        subscribers = self._subscribers.get(channel[len(CHANNEL_PREFIX):])
+        if not subscribers:
+            return
+        event = json.loads(message)
+        for subscription in subscribers:
+            subscription.put(event)
+
+    @asynccontextmanager
+    async def subscribe(self, generation_id: str) -> AsyncIterator[Subscription]:
+        """Receive events for a generation while the context is open."""
+        await self._ensure_started()
+        subscription = Subscription()
+        self._subscribers.setdefault(generation_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            subscribers = self._subscribers.get(generation_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[generation_id]
+
+    async def shutdown(self) -> None:
+        if self._started:
+            await self._transport.stop()
+            self._started = False
+
+
+# Global instance
+event_broker = EventBroker()
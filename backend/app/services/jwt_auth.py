@@ -0,0 +1,157 @@
+"""
+Local verification of Supabase access tokens.
+
+Supabase signs access tokens either with the project's shared JWT secret
+(HS256) or, with asymmetric signing keys, with a key published at
+<SUPABASE_URL>/auth/v1/.well-known/jwks.json (RS256/ES256). Verifying the
+signature, expiry, audience and issuer here avoids a round trip to the auth
+server on every request.
+
+The JWKS is cached for JWKS_CACHE_SECONDS. A token signed with a key ID not
+in the cache triggers a refresh (at most once per JWKS_MIN_REFRESH_SECONDS),
+so rotated keys are picked up without waiting for the cache to expire.
+
+Local verification can't see server-side revocation (sign-out, deleted
+users) before the token expires; AUTH_VERIFICATION=remote keeps the
+per-request check against the auth server for deployments that need it.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from jose import jwt, JWTError
+
+from app.config import Settings
+from app.services.log import get_logger
+from app.services.metrics import track_upstream
+
+logger = get_logger(__name__)
+
+ASYMMETRIC_ALGORITHMS = ("RS256", "ES256")
+
+# Seconds of clock skew tolerated on exp/iat/nbf
+CLOCK_SKEW_SECONDS = 10
+
+
+class InvalidTokenError(Exception):
+    """The token is malformed, expired, or fails signature/claim checks."""
+
+
+class LocalVerificationUnavailable(Exception):
+    """This deployment lacks the key material to verify the token locally."""
+
+
+class JWKSCache:
+    """Signing keys from a JWKS endpoint, keyed by kid."""
+
+    def __init__(self, url: str, ttl_seconds: int, min_refresh_seconds: int):
+        self.url = url
+        self.ttl_seconds = ttl_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self._keys: Dict[str, Dict[str, Any]] = {}
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get_key(self, kid: str) -> Optional[Dict[str, Any]]:
+        """Get the JWK for a key ID, refreshing the set if it is stale or lacks the kid."""
+        age = time.monotonic() - self._fetched_at
+        if kid in self._keys and age < self.ttl_seconds:
+            return self._keys[kid]
+
+        async with self._lock:
+            # Another request may have refreshed while we waited
+            age = time.monotonic() - self._fetched_at
+            fresh = age < self.ttl_seconds
+            if kid not in self._keys or not fresh:
+                # Unknown kids can't force refreshes faster than this
+                if not fresh or age >= self.min_refresh_seconds:
+                    try:
+                        await self._refresh()
+                    except (httpx.HTTPError, ValueError) as e:
+                        # Keep serving the keys we have if the endpoint is down
+                        if not self._keys:
+                            raise LocalVerificationUnavailable(f"Could not fetch signing keys: {e}")
+                        logger.warning("JWKS refresh failed, using cached keys: %s", e)
+        return self._keys.get(kid)
+
+    async def _refresh(self) -> None:
+        async with httpx.AsyncClient(timeout=5.0) as client:
+            with track_upstream("supabase_auth", "jwks"):
+                response = await client.get(self.url)
+            response.raise_for_status()
+        self._keys = {key["kid"]: key for key in response.json().get("keys", []) if "kid" in key}
+        self._fetched_at = time.monotonic()
+
+
+_jwks_caches: Dict[str, JWKSCache] = {}
+
+
+def _get_jwks(settings: Settings) -> JWKSCache:
+    url = f"{settings.supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json"
+    cache = _jwks_caches.get(url)
+    if cache is None:
+        cache = _jwks_caches[url] = JWKSCache(
+            url, settings.jwks_cache_seconds, settings.jwks_min_refresh_seconds
+        )
+    return cache
+
+
+def expected_issuer(settings: Settings) -> str:
+    return f"{settings.supabase_url.rstrip('/')}/auth/v1"
+
+
+def unverified_claims(token: str) -> Dict[str, Any]:
+    """Read claims without checking them, for tokens already verified elsewhere."""
+    try:
+        return jwt.get_unverified_claims(token)
+    except JWTError:
+        return {}
+
+
+async def verify_token(token: str, settings: Settings) -> Dict[str, Any]:
+    """
+    Verify a Supabase access token and return its claims.
+
+    Checks the signature, exp (required), aud and iss. The algorithm is
+    taken from the header but only accepted from a fixed list, and HS256
+    tokens are only checked against the shared secret, so a token can't
+    choose how it gets verified.
+
+    Raises:
+        InvalidTokenError: If the token doesn't verify
+        LocalVerificationUnavailable: If it is HS256 and no secret is set,
+            or the signing keys can't be fetched
+    """
+    try:
+        header = jwt.get_unverified_header(token)
+    except JWTError as e:
+        raise InvalidTokenError(f"Malformed token: {e}")
+
+    algorithm = header.get("alg")
+    if algorithm == "HS256":
+        if not settings.supabase_jwt_secret:
+            raise LocalVerificationUnavailable("HS256 token but SUPABASE_JWT_SECRET is not set")
+        key: Any = settings.supabase_jwt_secret
+    elif algorithm in ASYMMETRIC_ALGORITHMS:
+        kid = header.get("kid")
+        key = await _get_jwks(settings).get_key(kid) if kid else None
+        if key is None:
+            raise InvalidTokenError(f"Unknown signing key {kid}")
+    else:
+        raise InvalidTokenError(f"Unsupported algorithm {algorithm}")
+
+    try:
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=[algorithm],
+            audience=settings.jwt_audience,
+            issuer=expected_issuer(settings),
+            options={"require_exp": True, "require_sub": True, "leeway": CLOCK_SKEW_SECONDS},
+        )
+    except JWTError as e:
+        raise InvalidTokenError(str(e))
+
+    return claims
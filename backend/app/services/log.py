@@ -0,0 +1,177 @@
+"""
+Structured, non-blocking logging.
+
+Log calls on the event loop only build a record and put it on an in-memory
+queue; a background thread formats and writes it to stdout. On top of the
+standard library this adds:
+
+- Context fields (generation_id, user_id, ...) held in contextvars, so they
+  follow a request or generation into every asyncio task it spawns and are
+  attached to each record automatically.
+- Per-module levels from settings, e.g. LOG_LEVELS="app.services.scheduler=DEBUG".
+- Sampling for high-volume lines: logger.info("...", extra=sample(0.01)).
+
+Usage:
+    from app.services.log import get_logger, bind_context
+    logger = get_logger(__name__)
+
+    bind_context(generation_id=generation_id, user_id=user_id)
+    logger.info("Status updated to %s", status)
+"""
+
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+_context: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar("log_context", default={})
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+# Attributes present on every LogRecord; anything else was passed via extra
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Get a logger; use the module's __name__ so per-module levels apply."""
+    return logging.getLogger(name)
+
+
+def bind_context(**fields: Any) -> contextvars.Token:
+    """
+    Add fields to the logging context of the current task.
+
+    Tasks created afterwards inherit the fields. Returns a token for
+    reset_context if the binding should be undone.
+    """
+    return _context.set({**_context.get(), **fields})
+
+
+def reset_context(token: contextvars.Token) -> None:
+    """Undo a bind_context call."""
+    _context.reset(token)
+
+
+def get_context() -> Dict[str, Any]:
+    """Get the current logging context."""
+    return dict(_context.get())
+
+
+def sample(rate: float) -> Dict[str, float]:
+    """Extra dict that keeps only `rate` (0-1) of the records it is passed to."""
+    return {"sample_rate": rate}
+
+
+class ContextFilter(logging.Filter):
+    """Attach context fields and apply sampling on the calling thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, "sample_rate", None)
+        if rate is not None and random.random() >= rate:
+            return False
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines with context fields appended."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-5s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = " ".join(
+            f"{key}={value}" for key, value in vars(record).items()
+            if key not in _RESERVED and not key.startswith("_")
+        )
+        return f"{line} [{fields}]" if fields else line
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback text now (args may be mutated
+        # later), but skip the full format on the calling thread
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    """Parse "module=LEVEL,module=LEVEL"."""
+    levels = {}
+    for part in spec.split(","):
+        if "=" in part:
+            name, level = part.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(settings) -> None:
+    """
+    Route all logging through a queue drained by a background thread.
+
+    Safe to call more than once; later calls replace the earlier setup.
+    """
+    global _listener
+    stop_logging()
+
+    formatter = JsonFormatter() if settings.log_format == "json" else TextFormatter()
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(formatter)
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = _QueueHandler(log_queue)
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(settings.log_level.upper())
+
+    for name, level in _parse_levels(settings.log_levels).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -11,6 +11,9 @@ Reference: https://github.com/teng-lin/notebooklm-py
 
 from typing import List, Dict, Any, Optional
 import asyncio
+import time
+
+from app.services.metrics import track_upstream
 
 
 async def create_notebook_with_content(
@@ -27,8 +30,12 @@ async def create_notebook_with_content(
         user_id: User ID to get authenticated client
 
     Returns:
-        Dict with notebook_id and status
+        Dict with notebook_id and status, plus monotonic per-stage timings
+        (notebook_create, source_upload, wait_for_sources) and bytes_uploaded
     """
+    timings: Dict[str, float] = {}
+    bytes_uploaded = 0
+
     try:
         from app.services.notebooklm_auth import notebooklm_auth
 
@@ -45,38 +52,52 @@ async def create_notebook_with_content(
         # Open client connection (required for API calls)
         async with client:
             # Create notebook
-            notebook = await client.notebooks.create(title)
+            started = time.monotonic()
+            with track_upstream("notebooklm", "notebooks.create"):
+                notebook = await client.notebooks.create(title)
             notebook_id = notebook.id
+            timings["notebook_create"] = time.monotonic() - started
 
             # Add each content item as a source and collect source IDs
+            started = time.monotonic()
             source_ids = []
             for item in content_items:
                 if item["type"] == "text":
-                    source = await client.sources.add_text(
-                        notebook_id=notebook_id,
-                        title=item.get("title", "Source"),
-                        content=item["content"],
-                    )
+                    with track_upstream("notebooklm", "sources.add_text", title=item.get("title", "Source")):
+                        source = await client.sources.add_text(
+                            notebook_id=notebook_id,
+                            title=item.get("title", "Source"),
+                            content=item["content"],
+                        )
                     source_ids.append(source.id)
+                    bytes_uploaded += len(item["content"].encode("utf-8"))
                 elif item["type"] == "url":
-                    source = await client.sources.add_url(
-                        notebook_id=notebook_id,
-                        url=item["url"],
-                    )
+                    with track_upstream("notebooklm", "sources.add_url", url=item["url"]):
+                        source = await client.sources.add_url(
+                            notebook_id=notebook_id,
+                            url=item["url"],
+                        )
                     source_ids.append(source.id)
+                    bytes_uploaded += len(item["url"].encode("utf-8"))
+            timings["source_upload"] = time.monotonic() - started
 
             # Wait for all sources to be ready before generating audio
             if source_ids:
-                await client.sources.wait_for_sources(
-                    notebook_id=notebook_id,
-                    source_ids=source_ids,
-                    timeout=120
-                )
+                started = time.monotonic()
+                with track_upstream("notebooklm", "sources.wait_for_sources"):
+                    await client.sources.wait_for_sources(
+                        notebook_id=notebook_id,
+                        source_ids=source_ids,
+                        timeout=120
+                    )
+                timings["wait_for_sources"] = time.monotonic() - started
 
         return {
             "notebook_id": notebook_id,
             "status": "created",
             "sources_added": len(content_items),
+            "timings": timings,
+            "bytes_uploaded": bytes_uploaded,
         }
 
     except ImportError:
@@ -91,6 +112,8 @@ async def create_notebook_with_content(
             "notebook_id": None,
             "status": "error",
             "error": str(e),
+            "timings": timings,
+            "bytes_uploaded": bytes_uploaded,
         }
 
 
@@ -143,18 +166,20 @@ async def generate_audio_overview(
                 "suitable for a busy professional listening during their commute."
             )
 
-            generation_status = await client.artifacts.generate_audio(
-                notebook_id=notebook_id,
-                instructions=instructions or default_instructions,
-                audio_format=audio_format,
-            )
+            with track_upstream("notebooklm", "artifacts.generate_audio"):
+                generation_status = await client.artifacts.generate_audio(
+                    notebook_id=notebook_id,
+                    instructions=instructions or default_instructions,
+                    audio_format=audio_format,
+                )
 
             # Wait for completion (with timeout)
-            final_status = await client.artifacts.wait_for_completion(
-                notebook_id=notebook_id,
-                task_id=generation_status.task_id,
-                timeout=600,  # 10 min timeout
-            )
+            with track_upstream("notebooklm", "artifacts.wait_for_completion"):
+                final_status = await client.artifacts.wait_for_completion(
+                    notebook_id=notebook_id,
+                    task_id=generation_status.task_id,
+                    timeout=600,  # 10 min timeout
+                )
 
             if final_status.is_failed:
                 return {
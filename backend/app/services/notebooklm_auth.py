@@ -5,27 +5,36 @@ Handles browser-based Google OAuth authentication for NotebookLM.
 Uses the notebooklm-py library which launches a browser for Google login.
 
 Credentials are stored per-user in a secure location.
+
+Credential state is cached per user for NOTEBOOKLM_STATUS_CACHE_SECONDS as a
+small metadata record stamped with user_credentials.updated_at. Status checks
+are served from it. get_client reuses the cached session JSON while its
+stamp matches the cached state, so rereading the multi-KB blob only happens
+when the credentials changed. Upload, authenticate and revoke invalidate
+the user's entries; on other replicas a change is seen once the TTL expires.
 """
 
 import json
 import asyncio
 import subprocess
 import os
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Optional
-from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.services.metrics import record_cache, track_upstream
 
+_MISSING = object()
 
-def _is_headless_mode() -> bool:
-    """
-    Check if browser should run in headless mode.
+NOTEBOOKLM_URL = "https://notebooklm.google.com/"
+# Google sign-in cookies; a session with none of these unexpired is signed out
+SIGN_IN_COOKIES = ("SID", "__Secure-1PSID", "__Secure-3PSID")
 
-    Returns True for production environments (Railway, Render, etc.)
-    Returns False for local development to show visible browser.
-    """
-    from app.config import get_settings
-    settings = get_settings()
-    return settings.browser_headless.lower() in ("true", "1", "yes")
+# Session blobs kept in memory for get_client, least recently used dropped first
+MAX_CACHED_SESSIONS = 256
 
 
 class NotebookLMAuth:
@@ -41,8 +50,10 @@ class NotebookLMAuth:
         self.credentials_dir = Path(credentials_dir)
         self.credentials_dir.mkdir(exist_ok=True)
 
-        # In-memory cache of authentication status
-        self._auth_cache: Dict[str, Dict] = {}
+        # Credential state per user: (cached_at, metadata or None)
+        self._auth_cache: Dict[str, Tuple[float, Optional[Dict]]] = {}
+        # Session JSON per user, with the updated_at it was read at
+        self._sessions: "OrderedDict[str, Tuple[str, Dict]]" = OrderedDict()
 
     def _get_user_creds_path(self, user_id: str) -> Path:
         """Get the path to a user's credentials file."""
@@ -50,118 +61,79 @@ class NotebookLMAuth:
 
     async def authenticate_user(self, user_id: str) -> Dict[str, any]:
         """
-        Authenticate user with NotebookLM via browser-based Google OAuth.
+        Start a browser-based Google login to NotebookLM for a user.
 
-        This will:
-        1. Launch a Chromium browser window for Google login
-        2. User completes OAuth in the browser
-        3. Store credentials securely for this user
+        The login runs in the shared browser (see app.services.browser_pool)
+        and this returns straight away; poll get_login_status until it
+        leaves queued/running. Credentials are stored when it succeeds.
 
         Args:
             user_id: Unique user identifier
 
         Returns:
-            Dict with status, message, and credentials_stored flag
+            Dict with login_id, status and error
         """
-        try:
-            # Import Playwright for browser automation
-            try:
-                from playwright.async_api import async_playwright
-            except ImportError:
-                return {
-                    "status": "error",
-                    "message": "Playwright not installed. Run: pip install playwright && playwright install chromium",
-                    "credentials_stored": False,
-                }
-
-            # Create storage path for this user's credentials
-            storage_path = self._get_user_creds_path(user_id)
-            storage_path.parent.mkdir(parents=True, exist_ok=True)
-
-            # Create a temporary browser profile directory for this user
-            browser_profile_dir = self.credentials_dir / f"{user_id}_browser_profile"
-            browser_profile_dir.mkdir(parents=True, exist_ok=True)
-
-            # Launch browser with persistent context (appears more like a real browser to Google)
-            headless = _is_headless_mode()
-
-            async with async_playwright() as p:
-                # Use launch_persistent_context instead of launch + new_context
-                # This makes the browser appear as a normal user browser, not automation
-                context = await p.chromium.launch_persistent_context(
-                    user_data_dir=str(browser_profile_dir),
-                    headless=headless,
-                    args=[
-                        "--disable-blink-features=AutomationControlled",  # Hide automation
-                        "--password-store=basic",  # Avoid keychain issues
-                        "--no-sandbox",  # Required for Docker/Railway
-                        "--disable-setuid-sandbox",  # Required for Docker/Railway
-                        "--disable-dev-shm-usage",  # Overcome limited resource problems
-                        "--disable-gpu",  # Not needed in headless
-                    ],
-                    ignore_default_args=["--enable-automation"],  # Remove automation flag
-                )
-
-                # Get the first page (persistent context starts with one)
-                page = context.pages[0] if context.pages else await context.new_page()
-
-                # Navigate to NotebookLM
-                await page.goto("https://notebooklm.google.com/")
-
-                # Wait for user to complete login
-                # Check if they reach the NotebookLM homepage (which means logged in)
-                try:
-                    # Wait for either the notebook list or the "Get started" button
-                    await page.wait_for_selector('[data-testid="notebook-card"], [aria-label="Get started"]', timeout=300000)
-                except Exception:
-                    # If timeout or error, still try to save in case user manually navigated
-                    pass
-
-                # Save the storage state (cookies, local storage, etc.)
-                await context.storage_state(path=str(storage_path))
-                storage_path.chmod(0o600)  # Restrict to owner only
-
-                await context.close()
-
-            # Load credentials from storage file to save to database
-            with open(storage_path, "r") as f:
-                credentials = json.load(f)
-
-            # Save credentials to database
-            from app.services import db
-            db.save_notebooklm_credentials(user_id, credentials)
-
-            # Save authentication metadata
-            auth_metadata = {
-                "user_id": user_id,
-                "authenticated": True,
-                "authenticated_at": datetime.utcnow().isoformat(),
-                "credentials_path": str(storage_path),
-            }
+        from app.services.browser_pool import browser_pool
 
-            # Store in cache
-            self._auth_cache[user_id] = auth_metadata
+        async def store(credentials: Dict) -> None:
+            from app.services import async_db as db
+            await db.save_notebooklm_credentials(user_id, credentials)
+            self.invalidate(user_id)
 
-            # Clean up local storage file after saving to database
-            try:
-                storage_path.unlink()
-            except Exception:
-                pass
+        session = await browser_pool.start_login(user_id, store)
+        return session.to_dict()
 
-            return {
-                "status": "success",
-                "message": "Successfully authenticated with NotebookLM via Google",
-                "credentials_stored": True,
-            }
+    def get_login_status(self, user_id: str) -> Optional[Dict]:
+        """Get the user's current or most recent login, or None."""
+        from app.services.browser_pool import browser_pool
 
-        except Exception as e:
-            return {
-                "status": "error",
-                "message": f"Authentication failed: {str(e)}",
-                "credentials_stored": False,
+        session = browser_pool.get(user_id)
+        return session.to_dict() if session else None
+
+    async def finish_login(self, user_id: str) -> Optional[Dict]:
+        """Store the login's session now instead of waiting for NotebookLM to load."""
+        from app.services.browser_pool import browser_pool
+
+        session = await browser_pool.finish(user_id)
+        return session.to_dict() if session else None
+
+    async def cancel_login(self, user_id: str) -> None:
+        from app.services.browser_pool import browser_pool
+
+        await browser_pool.cancel(user_id)
+
+    def _cached_state(self, user_id: str) -> Any:
+        """Get the cached metadata (None if not authenticated), or _MISSING."""
+        from app.config import get_settings
+
+        entry = self._auth_cache.get(user_id)
+        if entry is not None and time.monotonic() - entry[0] < get_settings().notebooklm_status_cache_seconds:
+            record_cache("notebooklm_auth", hit=True)
+            return entry[1]
+        record_cache("notebooklm_auth", hit=False)
+        return _MISSING
+
+    def _remember_state(self, user_id: str, row: Optional[Dict]) -> Optional[Dict]:
+        """Cache the metadata for a user_credentials row (None if no session)."""
+        metadata = None
+        if row is not None:
+            metadata = {
+                "user_id": user_id,
+                "authenticated": True,
+                "authenticated_at": row["updated_at"],
+                # "stale" means the user has to reconnect NotebookLM
+                "session_status": row.get("session_status"),
+                "session_checked_at": row.get("session_checked_at"),
             }
+        self._auth_cache[user_id] = (time.monotonic(), metadata)
+        return metadata
+
+    def invalidate(self, user_id: str) -> None:
+        """Drop cached credential state after the user's credentials change."""
+        self._auth_cache.pop(user_id, None)
+        self._sessions.pop(user_id, None)
 
-    def get_user_credentials(self, user_id: str) -> Optional[Dict]:
+    async def get_user_credentials(self, user_id: str) -> Optional[Dict]:
         """
         Get stored credentials metadata for a user.
 
@@ -169,28 +141,18 @@ class NotebookLMAuth:
             user_id: Unique user identifier
 
         Returns:
-            Dict with authentication metadata or None
+            Dict with user_id, authenticated and authenticated_at, or None.
+            Never includes the session itself.
         """
-        # Check cache first
-        if user_id in self._auth_cache:
-            return self._auth_cache[user_id]
-
-        # Load from database
-        from app.services import db
-        credentials = db.get_notebooklm_credentials(user_id)
-
-        if credentials:
-            metadata = {
-                "user_id": user_id,
-                "authenticated": True,
-                "credentials": credentials,
-            }
-            self._auth_cache[user_id] = metadata
+        metadata = self._cached_state(user_id)
+        if metadata is not _MISSING:
             return metadata
 
-        return None
+        from app.services import async_db as db
+        row = await db.get_notebooklm_credential_status(user_id)
+        return self._remember_state(user_id, row)
 
-    def is_authenticated(self, user_id: str) -> bool:
+    async def is_authenticated(self, user_id: str) -> bool:
         """
         Check if user has valid NotebookLM credentials.
 
@@ -200,9 +162,82 @@ class NotebookLMAuth:
         Returns:
             True if authenticated, False otherwise
         """
-        from app.services import db
-        credentials = db.get_notebooklm_credentials(user_id)
-        return credentials is not None
+        return await self.get_user_credentials(user_id) is not None
+
+    async def _get_session(self, user_id: str) -> Optional[Dict]:
+        """Get the user's session JSON, reading the database at most once."""
+        metadata = self._cached_state(user_id)
+        if metadata is None:
+            return None
+        if metadata is not _MISSING:
+            cached = self._sessions.get(user_id)
+            if cached is not None and cached[0] == metadata["authenticated_at"]:
+                self._sessions.move_to_end(user_id)
+                return cached[1]
+
+        from app.services import async_db as db
+        row = await db.get_notebooklm_credentials(user_id)
+        self._remember_state(user_id, row)
+        if row is None:
+            self._sessions.pop(user_id, None)
+            return None
+
+        self._sessions[user_id] = (row["updated_at"], row["notebooklm_session"])
+        self._sessions.move_to_end(user_id)
+        while len(self._sessions) > MAX_CACHED_SESSIONS:
+            self._sessions.popitem(last=False)
+        return row["notebooklm_session"]
+
+    async def probe_session(self, user_id: str) -> Tuple[str, Optional[str]]:
+        """
+        Cheaply check whether a user's stored NotebookLM session still works.
+
+        Looks at the sign-in cookies' expiry, then makes a single request to
+        NotebookLM without following redirects: a signed-out session is sent
+        to Google sign-in. No browser and no NotebookLM API calls.
+
+        Returns:
+            (result, detail) where result is "valid", "stale", "missing" (no
+            session stored) or "unknown" (NotebookLM couldn't be reached;
+            callers should not treat the session as broken)
+        """
+        session = await self._get_session(user_id)
+        if not session:
+            return "missing", None
+
+        now = time.time()
+        cookies = httpx.Cookies()
+        signed_in = False
+        for cookie in session.get("cookies", []):
+            expires = cookie.get("expires", -1)
+            if expires not in (None, -1) and expires < now:
+                continue
+            cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain", ""), path=cookie.get("path", "/"))
+            if cookie["name"] in SIGN_IN_COOKIES and cookie.get("domain", "").endswith("google.com"):
+                signed_in = True
+        if not signed_in:
+            return "stale", "Google sign-in cookies have expired"
+
+        try:
+            async with httpx.AsyncClient(cookies=cookies, timeout=10.0, follow_redirects=False) as client:
+                with track_upstream("notebooklm", "probe"):
+                    response = await client.get(NOTEBOOKLM_URL)
+        except httpx.HTTPError as e:
+            return "unknown", str(e)
+
+        if response.is_redirect and "accounts.google.com" in response.headers.get("location", ""):
+            return "stale", "NotebookLM redirected to Google sign-in"
+        if response.status_code == 200:
+            return "valid", None
+        return "unknown", f"NotebookLM answered {response.status_code}"
+
+    async def record_probe(self, user_ids: List[str], result: str, detail: Optional[str] = None) -> None:
+        """Store a "valid" or "stale" probe result for users and drop their cached state."""
+        from app.services import async_db as db
+
+        await db.set_notebooklm_session_status(user_ids, result, detail)
+        for user_id in user_ids:
+            self._auth_cache.pop(user_id, None)
 
     async def get_client(self, user_id: str) -> Optional[any]:
         """
@@ -214,15 +249,10 @@ class NotebookLMAuth:
         Returns:
             NotebookLMClient instance or None if not authenticated
         """
-        if not self.is_authenticated(user_id):
-            return None
-
         try:
             from notebooklm import NotebookLMClient
-            from app.services import db
 
-            # Get credentials from database
-            credentials = db.get_notebooklm_credentials(user_id)
+            credentials = await self._get_session(user_id)
             if not credentials:
                 return None
 
@@ -253,19 +283,17 @@ class NotebookLMAuth:
             Dict with status and message
         """
         try:
-            from app.services import db
+            from app.services import async_db as db
 
             # Delete credentials from database
-            db.delete_notebooklm_credentials(user_id)
+            await db.delete_notebooklm_credentials(user_id)
 
             # Remove temporary credentials file if it exists
             creds_path = self._get_user_creds_path(user_id)
             if creds_path.exists():
                 creds_path.unlink()
 
-            # Clear cache
-            if user_id in self._auth_cache:
-                del self._auth_cache[user_id]
+            self.invalidate(user_id)
 
             return {
                 "status": "success",
@@ -3,6 +3,7 @@ import ssl
 from typing import List
 
 from app.config import Settings
+from app.services.metrics import track_upstream
 
 
 async def get_news_for_topic(topic: str, settings: Settings) -> str:
@@ -18,22 +19,23 @@ async def get_news_for_topic(topic: str, settings: Settings) -> str:
     ssl_context.verify_mode = ssl.CERT_NONE
 
     async with httpx.AsyncClient(verify=False, timeout=30.0) as client:
-        response = await client.post(
-            "https://api.perplexity.ai/search",
-            headers={
-                "Authorization": f"Bearer {settings.perplexity_api_key}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "query": f"latest news about {topic}",
-                "max_results": 10,
-                "search_recency_filter": "day",  # Last 24 hours
-            },
-        )
-
-        if response.status_code != 200:
-            error_detail = response.text
-            raise Exception(f"Perplexity API error: {response.status_code} - {error_detail}")
+        with track_upstream("perplexity", "search", topic=topic):
+            response = await client.post(
+                "https://api.perplexity.ai/search",
+                headers={
+                    "Authorization": f"Bearer {settings.perplexity_api_key}",
+                    "Content-Type": "application/json",
+                },
+                json={
+                    "query": f"latest news about {topic}",
+                    "max_results": 10,
+                    "search_recency_filter": "day",  # Last 24 hours
+                },
+            )
+
+            if response.status_code != 200:
+                error_detail = response.text
+                raise Exception(f"Perplexity API error: {response.status_code} - {error_detail}")
 
         data = response.json()
 
@@ -8,11 +8,18 @@ This service coordinates:
 4. Updating generation status
 """
 
-from datetime import datetime
-from typing import Optional
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
 
 from app.config import Settings
-from app.services.supabase import get_supabase_client
+from app.services.timing import StageTimer
+from app.services.metrics import generation_queue_depth
+from app.services.log import get_logger, bind_context
+from app.services.tracing import span
+from app.services.status_buffer import status_buffer
 from app.services.perplexity import get_news_for_topics
 from app.services.rss import fetch_multiple_feeds
 from app.services.notebooklm import (
@@ -21,11 +28,149 @@ from app.services.notebooklm import (
     format_content_for_notebook,
 )
 
+logger = get_logger(__name__)
+
+# Generation tasks running in this process, keyed by generation_id
+_in_flight: Dict[str, asyncio.Task] = {}
+generation_queue_depth.set_function(lambda: len(_in_flight))
+
+# Slots reserved by admitted requests whose generation hasn't registered in
+# _in_flight yet (it runs as a background task after the response), keyed
+# by reservation ID. A reservation that is never used expires.
+_reserved: Dict[str, float] = {}
+RESERVATION_SECONDS = 60
+
+
+def _is_active(log: Dict, settings: Settings) -> bool:
+    """Whether a log is in flight and younger than the generation lease."""
+    from app.services import async_db as db
+
+    if log["status"] not in db.ACTIVE_GENERATION_STATUSES:
+        return False
+    since = datetime.utcnow().replace(tzinfo=timezone.utc) - timedelta(minutes=settings.generation_lease_minutes)
+    scheduled_at = datetime.fromisoformat(log["scheduled_at"].replace("Z", "+00:00"))
+    if scheduled_at.tzinfo is None:
+        scheduled_at = scheduled_at.replace(tzinfo=timezone.utc)
+    return scheduled_at >= since
+
+
+async def find_generation(
+    user_id: str,
+    settings: Settings,
+    idempotency_key: Optional[str] = None,
+) -> Optional[Dict]:
+    """
+    Get the generation a start_generation call would join, without claiming one.
+
+    Lets callers skip admission control for requests that start no new work;
+    start_generation still arbitrates races.
+    """
+    from app.services import async_db as db
+
+    if idempotency_key:
+        return await db.get_generation_log_by_key(user_id, idempotency_key)
+
+    latest = await db.get_latest_generation_log(user_id)
+    return latest if latest is not None and _is_active(latest, settings) else None
+
+
+async def start_generation(
+    user_id: str,
+    settings: Settings,
+    idempotency_key: Optional[str] = None,
+) -> Tuple[Dict, bool]:
+    """
+    Claim a generation log for a user without starting a duplicate run.
+
+    With an idempotency key, the first caller creates the log and every later
+    caller gets that same log back. Without one, an in-flight generation for
+    the user (younger than the generation lease) is joined instead; failing
+    that, the request claims a key derived from the user's latest log, so
+    concurrent keyless requests, which all see the same latest log, race on
+    the same key and only one of them creates a generation.
+
+    Returns (log, created). Only the caller that created the log should run it.
+    """
+    from app.services import async_db as db
+
+    if idempotency_key:
+        return await db.claim_generation_log(user_id, idempotency_key)
+
+    latest = await db.get_latest_generation_log(user_id)
+    if latest is None:
+        return await db.claim_generation_log(user_id, "manual:first")
+    if _is_active(latest, settings):
+        return latest, False
+
+    return await db.claim_generation_log(user_id, f"manual:after:{latest['id']}")
+
+
+async def run_generation(
+    user_id: str,
+    generation_id: str,
+    settings: Settings,
+    sources: Optional[Dict] = None,
+    reservation: Optional[str] = None,
+) -> None:
+    """
+    Run a generation, or wait for it if it is already running in this process.
+
+    `sources` optionally preloads the user's enabled sources (see
+    generate_podcast_for_user). `reservation` is the slot reserved for the
+    run at admission (see reserve_slot); it is released once the run counts
+    in _in_flight itself.
+    """
+    task = _in_flight.get(generation_id)
+    if task is None:
+        task = asyncio.ensure_future(
+            generate_podcast_for_user(user_id, generation_id, settings, sources=sources)
+        )
+        _in_flight[generation_id] = task
+        task.add_done_callback(lambda _: _in_flight.pop(generation_id, None))
+    if reservation:
+        release_slot(reservation)
+
+    # Shield so a cancelled waiter doesn't cancel the run it joined
+    await asyncio.shield(task)
+
+
+def is_running_locally(generation_id: str) -> bool:
+    """Check whether a generation is running in this process."""
+    return generation_id in _in_flight
+
+
+def cancel_generation(generation_id: str) -> None:
+    """Stop a generation running in this process, if there is one."""
+    task = _in_flight.get(generation_id)
+    if task is not None:
+        task.cancel()
+
+
+def reserve_slot() -> str:
+    """Count a generation as in flight before its task starts. Returns the reservation ID."""
+    reservation = str(uuid.uuid4())
+    _reserved[reservation] = time.monotonic() + RESERVATION_SECONDS
+    return reservation
+
+
+def release_slot(reservation: str) -> None:
+    """Give back a reserved slot (its run registered, or it won't run at all)."""
+    _reserved.pop(reservation, None)
+
+
+def in_flight_count() -> int:
+    """Number of generations running in this process, or reserved to run."""
+    now = time.monotonic()
+    for reservation in [r for r, expires in _reserved.items() if expires <= now]:
+        del _reserved[reservation]
+    return len(_in_flight) + len(_reserved)
+
 
 async def generate_podcast_for_user(
     user_id: str,
     generation_id: str,
     settings: Settings,
+    sources: Optional[Dict] = None,
 ) -> None:
     """
     Generate a podcast for a specific user.
@@ -36,73 +181,115 @@ async def generate_podcast_for_user(
     3. Creates NotebookLM notebook
     4. Generates audio
     5. Updates status throughout
+
+    Stage durations, item counts and bytes uploaded are recorded with a
+    StageTimer and persisted to generation_logs.stage_timings on every
+    status update. The whole run is traced under a root span whose
+    trace_id is the generation_id.
+
+    Args:
+        sources: Optional {"rss_sources": [...], "news_topics": [...]}
+            already loaded by the caller (the scheduler bulk-loads them for
+            every due user); skips the per-user profile query
     """
-    print(f"[GENERATION {generation_id}] ===== STARTING BACKGROUND TASK =====")
-    print(f"[GENERATION {generation_id}] User ID: {user_id}")
+    with span("generation", trace_id=generation_id, generation_id=generation_id, user_id=user_id):
+        await _generate_podcast(user_id, generation_id, settings, sources)
+
+
+async def _generate_podcast(
+    user_id: str,
+    generation_id: str,
+    settings: Settings,
+    sources: Optional[Dict] = None,
+) -> None:
+    """Pipeline body of generate_podcast_for_user."""
+    bind_context(generation_id=generation_id, user_id=user_id)
+    logger.info("Starting generation")
 
     # Import db service
-    from app.services import db
+    from app.services import async_db as db
+    from app.services.notebooklm_auth import notebooklm_auth
 
-    def update_status(status: str, error: Optional[str] = None, **kwargs):
+    timer = StageTimer()
+
+    async def update_status(status: str, error: Optional[str] = None, **kwargs):
         try:
-            updates = {"status": status}
+            updates = {"status": status, "stage_timings": timer.as_dict()}
+            if status == "fetching":
+                updates["started_at"] = datetime.utcnow().isoformat() + 'Z'
+            elif status in ("complete", "failed"):
+                updates["completed_at"] = datetime.utcnow().isoformat() + 'Z'
             if error:
                 updates["error_message"] = error
             updates.update(kwargs)
-            print(f"[GENERATION {generation_id}] Updating status to: {status}")
             if error:
-                print(f"[GENERATION {generation_id}] Error message: {error}")
-            result = db.update_generation_log(generation_id=generation_id, updates=updates)
-            print(f"[GENERATION {generation_id}] Status updated successfully")
-            return result
-        except Exception as e:
-            print(f"[GENERATION {generation_id}] FAILED TO UPDATE STATUS: {str(e)}")
-            import traceback
-            traceback.print_exc()
+                logger.warning("Updating status to %s: %s", status, error)
+            else:
+                logger.info("Updating status to %s", status)
+            # Buffered and coalesced; terminal states are written before this returns
+            await status_buffer.update(generation_id, updates)
+        except Exception:
+            logger.exception("Failed to update status to %s", status)
             raise
 
     # Wrap everything in try-catch to catch any early failures
     try:
         # Update status to fetching
-        print(f"[GENERATION {generation_id}] About to update status to 'fetching'")
-        update_status("fetching")
-        print(f"[GENERATION {generation_id}] Status updated to 'fetching' successfully")
+        await update_status("fetching")
+
+        # Fail fast on a missing or signed-out NotebookLM session, before
+        # spending fetch time and Perplexity calls on content we can't upload
+        with timer.stage("preflight"):
+            probe, detail = await notebooklm_auth.probe_session(user_id)
+        if probe == "missing":
+            await update_status("failed", error="User not authenticated with NotebookLM")
+            return
+        if probe == "stale":
+            await notebooklm_auth.record_probe([user_id], "stale", detail)
+            await update_status("failed", error=f"NotebookLM session expired, reconnect NotebookLM ({detail})")
+            return
 
         # Fetch user's sources from database
-        rss_sources = [
-            s for s in db.get_rss_sources(user_id)
-            if s.get("enabled")
-        ]
-
-        news_topics = [
-            t for t in db.get_news_topics(user_id)
-            if t.get("enabled")
-        ]
+        with timer.stage("load_sources"):
+            if sources is not None:
+                all_rss_sources, all_news_topics = sources["rss_sources"], sources["news_topics"]
+            else:
+                profile = await db.get_user_profile(user_id)
+                all_rss_sources, all_news_topics = profile["rss_sources"], profile["news_topics"]
+            rss_sources = [s for s in all_rss_sources if s.get("enabled")]
+            news_topics = [t for t in all_news_topics if t.get("enabled")]
 
         # Fetch content from each source type
         rss_urls = [s["url"] for s in rss_sources]
-        rss_entries = await fetch_multiple_feeds(rss_urls) if rss_urls else {}
+        with timer.stage("rss"):
+            rss_entries = await fetch_multiple_feeds(rss_urls) if rss_urls else {}
+        timer.count("rss_feeds", len(rss_urls))
+        timer.count("rss_entries", sum(len(entries) for entries in rss_entries.values()))
 
         topic_names = [t["topic"] for t in news_topics]
-        news_summaries = await get_news_for_topics(topic_names, settings) if topic_names else {}
+        with timer.stage("perplexity"):
+            news_summaries = await get_news_for_topics(topic_names, settings) if topic_names else {}
+        timer.count("news_topics", len(news_summaries))
 
         # Format content for NotebookLM
-        print(f"[GENERATION {generation_id}] Fetched content - RSS: {len(rss_entries)}, Topics: {len(news_summaries)}")
-        content_items = format_content_for_notebook(
-            substack_posts=[],
-            rss_entries=rss_entries,
-            news_summaries=news_summaries,
-        )
+        logger.info("Fetched content - RSS: %d, Topics: %d", len(rss_entries), len(news_summaries))
+        with timer.stage("format"):
+            content_items = format_content_for_notebook(
+                substack_posts=[],
+                rss_entries=rss_entries,
+                news_summaries=news_summaries,
+            )
+        timer.count("content_items", len(content_items))
 
-        print(f"[GENERATION {generation_id}] Formatted {len(content_items)} content items")
+        logger.info("Formatted %d content items", len(content_items))
 
         if not content_items:
-            update_status("failed", error="No content found from any sources")
+            await update_status("failed", error="No content found from any sources")
             return
 
         # Update status to generating
-        update_status("generating")
-        print(f"[GENERATION {generation_id}] Creating NotebookLM notebook...")
+        await update_status("generating")
+        logger.info("Creating NotebookLM notebook")
 
         # Create NotebookLM notebook with custom title including topics
         today = datetime.utcnow().strftime("%Y-%m-%d")
@@ -125,24 +312,31 @@ async def generate_podcast_for_user(
             user_id=user_id,
         )
 
+        # Upload timings are measured inside the NotebookLM service
+        for stage, seconds in notebook_result.get("timings", {}).items():
+            timer.record(stage, seconds)
+        timer.count("sources_added", notebook_result.get("sources_added", 0))
+        timer.count("bytes_uploaded", notebook_result.get("bytes_uploaded", 0))
+
         if notebook_result["status"] == "error":
-            update_status("failed", error=notebook_result.get("error", "Failed to create notebook"))
+            await update_status("failed", error=notebook_result.get("error", "Failed to create notebook"))
             return
 
         notebook_id = notebook_result["notebook_id"]
-        print(f"[GENERATION {generation_id}] Notebook created: {notebook_id}")
+        logger.info("Notebook created: %s", notebook_id)
 
         # Generate audio
-        print(f"[GENERATION {generation_id}] Starting audio generation (may take up to 10 minutes)...")
-        audio_result = await generate_audio_overview(
-            notebook_id=notebook_id,
-            user_id=user_id,
-            format="deep-dive",
-        )
-        print(f"[GENERATION {generation_id}] Audio generation result: {audio_result.get('status')}")
+        logger.info("Starting audio generation (may take up to 10 minutes)")
+        with timer.stage("audio"):
+            audio_result = await generate_audio_overview(
+                notebook_id=notebook_id,
+                user_id=user_id,
+                format="deep-dive",
+            )
+        logger.info("Audio generation result: %s", audio_result.get("status"))
 
         if audio_result["status"] == "error":
-            update_status(
+            await update_status(
                 "failed",
                 error=audio_result.get("error", "Failed to generate audio"),
                 notebook_id=notebook_id,
@@ -150,7 +344,7 @@ async def generate_podcast_for_user(
             return
 
         # Success!
-        update_status(
+        await update_status(
             "complete",
             notebook_id=notebook_id,
             sources_used={
@@ -161,63 +355,9 @@ async def generate_podcast_for_user(
         )
 
     except Exception as e:
-        print(f"[GENERATION {generation_id}] ===== GENERATION FAILED =====")
-        print(f"[GENERATION {generation_id}] Error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Generation failed: %s", e)
         try:
-            update_status("failed", error=str(e))
-        except Exception as update_error:
-            print(f"[GENERATION {generation_id}] CRITICAL: Failed to update status to 'failed': {str(update_error)}")
-            traceback.print_exc()
+            await update_status("failed", error=str(e))
+        except Exception:
+            logger.critical("Failed to record 'failed' status", exc_info=True)
 
-
-async def run_scheduled_generation(settings: Settings) -> None:
-    """
-    Run generation for all users with enabled sources.
-
-    This is called by the cron job at 7am PT.
-    """
-    supabase = get_supabase_client(settings)
-
-    # Get all users with at least one enabled source
-    # This is a simplified query - in production you'd optimize this
-    users_with_sources = (
-        supabase.table("substack_sources")
-        .select("user_id")
-        .eq("enabled", True)
-        .execute()
-    ).data
-
-    rss_users = (
-        supabase.table("rss_sources")
-        .select("user_id")
-        .eq("enabled", True)
-        .execute()
-    ).data
-
-    topic_users = (
-        supabase.table("news_topics")
-        .select("user_id")
-        .eq("enabled", True)
-        .execute()
-    ).data
-
-    # Combine unique user IDs
-    user_ids = set()
-    for source in users_with_sources + rss_users + topic_users:
-        user_ids.add(source["user_id"])
-
-    # Generate podcast for each user
-    for user_id in user_ids:
-        # Create generation log
-        response = supabase.table("generation_logs").insert({
-            "user_id": user_id,
-            "scheduled_at": datetime.utcnow().isoformat(),
-            "status": "scheduled",
-        }).execute()
-
-        generation_id = response.data[0]["id"]
-
-        # Generate podcast (could parallelize this in production)
-        await generate_podcast_for_user(user_id, generation_id, settings)
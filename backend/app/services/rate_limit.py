@@ -0,0 +1,173 @@
+"""
+Admission control for manually triggered generations.
+
+A generation is a multi-minute pipeline, so POST /generate is guarded by
+three checks before a new generation is created:
+
+- a per-user token bucket (GENERATE_USER_BURST requests, refilled at
+  GENERATE_USER_PER_HOUR), answered with 429 when empty;
+- a global token bucket (GENERATE_GLOBAL_BURST, refilled at
+  GENERATE_GLOBAL_PER_MINUTE), answered with 429 when empty;
+- queue depth: manual generations may only fill GENERATION_MAX_IN_FLIGHT
+  minus GENERATION_RESERVED_FOR_SCHEDULED slots of this process, answered
+  with 503 when full.
+
+Scheduled generations bypass all three, so the reserved slots and the
+buckets keep users pressing the button from starving the daily runs.
+Requests that join an existing generation get their tokens back.
+
+Bucket state lives in process by default (RATE_LIMIT_BACKEND=memory). With
+"shared" it is kept in the shared store from app.services.cache, so limits
+hold across replicas; updates there are read-modify-write, so concurrent
+requests on different replicas can occasionally both take the last token.
+"""
+
+import json
+import math
+import threading
+import time
+from typing import Dict, Tuple
+
+from app.config import get_settings
+from app.services.metrics import admission_decisions
+
+
+class AdmissionDenied(Exception):
+    """A generation request was not admitted."""
+
+    status_code = 429
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class RateLimited(AdmissionDenied):
+    """A token bucket is empty."""
+
+    status_code = 429
+
+
+class Overloaded(AdmissionDenied):
+    """Too many generations are already running."""
+
+    status_code = 503
+
+
+class MemoryBuckets:
+    """Token bucket state in this process."""
+
+    def __init__(self):
+        self._state: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, rate: float, amount: float = 1.0) -> float:
+        """
+        Take `amount` tokens (negative to give them back).
+
+        Returns 0 if taken, else the seconds until enough tokens refill.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._state.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if amount > 0 and tokens < amount:
+                self._state[key] = (tokens, now)
+                return (amount - tokens) / rate
+            self._state[key] = (min(capacity, tokens - amount), now)
+            return 0.0
+
+
+class SharedBuckets:
+    """Token bucket state in the shared store, as JSON."""
+
+    def __init__(self, prefix: str = "dailybrief:ratelimit:"):
+        self.prefix = prefix
+
+    def take(self, key: str, capacity: float, rate: float, amount: float = 1.0) -> float:
+        from app.services.cache import get_shared_store
+
+        store = get_shared_store()
+        now = time.time()
+        raw = store.get(self.prefix + key)
+        tokens, updated = json.loads(raw) if raw else (capacity, now)
+        tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+
+        wait = 0.0
+        if amount > 0 and tokens < amount:
+            wait = (amount - tokens) / rate
+        else:
+            tokens = min(capacity, tokens - amount)
+        # Expire once the bucket would be full again anyway
+        ttl = max(1, math.ceil((capacity - tokens) / rate) + 1)
+        store.set(self.prefix + key, json.dumps([tokens, now]).encode("utf-8"), ex=ttl)
+        return wait
+
+
+_buckets = None
+_buckets_lock = threading.Lock()
+
+
+def _get_buckets():
+    global _buckets
+    if _buckets is None:
+        with _buckets_lock:
+            if _buckets is None:
+                _buckets = SharedBuckets() if get_settings().rate_limit_backend == "shared" else MemoryBuckets()
+    return _buckets
+
+
+def _limits(user_id: str):
+    settings = get_settings()
+    return (
+        (f"user:{user_id}", settings.generate_user_burst, settings.generate_user_per_hour / 3600),
+        ("global", settings.generate_global_burst, settings.generate_global_per_minute / 60),
+    )
+
+
+def admit_generation(user_id: str, in_flight: int) -> None:
+    """
+    Admit a manual generation request or raise.
+
+    in_flight counts the generations running or reserved in this process,
+    not counting the request being admitted.
+
+    Blocking when the shared backend is used; run it off the event loop.
+
+    Raises:
+        Overloaded: If the process has no unreserved generation slots
+        RateLimited: If the user's or the global bucket is empty
+    """
+    settings = get_settings()
+    manual_slots = settings.generation_max_in_flight - settings.generation_reserved_for_scheduled
+    if in_flight >= manual_slots:
+        admission_decisions.labels("overloaded").inc()
+        raise Overloaded(
+            f"{in_flight} generations are running; try again shortly",
+            settings.generation_overload_retry_seconds,
+        )
+
+    buckets = _get_buckets()
+    taken = []
+    for key, capacity, rate in _limits(user_id):
+        wait = buckets.take(key, capacity, rate)
+        if wait:
+            for taken_key, taken_capacity, taken_rate in taken:
+                buckets.take(taken_key, taken_capacity, taken_rate, amount=-1.0)
+            scope = "user" if key.startswith("user:") else "global"
+            admission_decisions.labels(f"limited_{scope}").inc()
+            raise RateLimited(
+                "Too many generations requested; try again later" if scope == "user"
+                else "Generation capacity is busy; try again later",
+                wait,
+            )
+        taken.append((key, capacity, rate))
+
+    admission_decisions.labels("admitted").inc()
+
+
+def refund_generation(user_id: str) -> None:
+    """Give back the tokens of an admitted request that joined an existing generation."""
+    buckets = _get_buckets()
+    for key, capacity, rate in _limits(user_id):
+        buckets.take(key, capacity, rate, amount=-1.0)
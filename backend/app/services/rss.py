@@ -1,8 +1,11 @@
 import feedparser
 from typing import List, Dict, Any
 from datetime import datetime, timedelta
+from urllib.parse import urlparse
 import httpx
 
+from app.services.metrics import track_upstream
+
 
 async def fetch_rss_feed(url: str) -> List[Dict[str, Any]]:
     """
@@ -11,7 +14,8 @@ async def fetch_rss_feed(url: str) -> List[Dict[str, Any]]:
     Returns list of entries from the last 24 hours.
     """
     async with httpx.AsyncClient() as client:
-        response = await client.get(url, timeout=15.0)
+        with track_upstream("rss", urlparse(url).netloc or url, url=url):
+            response = await client.get(url, timeout=15.0)
         content = response.text
 
     feed = feedparser.parse(content)
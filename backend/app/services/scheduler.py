@@ -1,12 +1,26 @@
 """Scheduler service for daily podcast generation."""
 import asyncio
+import time
+import uuid
+from collections import OrderedDict
 from datetime import datetime, time as Time
-from typing import List, Dict
+from typing import List, Dict, Optional
 import pytz
 
-from app.services import db
-from app.services.podcast_generator import generate_podcast_for_user
+from app.services import async_db as db
+from app.services import sharding
+from app.services.podcast_generator import (
+    run_generation,
+    is_running_locally,
+    cancel_generation,
+)
 from app.config import get_settings
+from app.services.log import get_logger, bind_context, sample
+
+logger = get_logger(__name__)
+
+# Progress reason for a generation whose lease another worker took over
+LEASE_LOST = "Lease taken over by another worker"
 
 
 def should_generate_now(user_prefs: Dict) -> bool:
@@ -51,70 +65,439 @@ def should_generate_now(user_prefs: Dict) -> bool:
     # Generate if we're between 0 and 5 minutes past the scheduled time
     should_run = 0 <= time_diff_minutes < 5
 
-    print(f"[SCHEDULER] Time check - Current: {now_user_tz.strftime('%H:%M')}, Scheduled: {scheduled_hour:02d}:{scheduled_minute:02d}, Diff: {time_diff_minutes:.1f} min, Should run: {should_run}")
+    logger.debug(
+        "Time check - Current: %s, Scheduled: %02d:%02d, Diff: %.1f min, Should run: %s",
+        now_user_tz.strftime('%H:%M'), scheduled_hour, scheduled_minute, time_diff_minutes, should_run,
+        extra=sample(0.1),
+    )
 
     return should_run
 
 
-async def check_and_generate_for_all_users():
+def schedule_slot_key(user_prefs: Dict, at: Optional[datetime] = None) -> str:
+    """
+    Get the idempotency key for a user's daily generation slot.
+
+    The slot is the date in the user's timezone at `at` (default now), so
+    every cron call on the same local day resolves to the same generation.
+    Scheduler runs pass their creation time, so sweeping a run again after
+    the user's local midnight still resolves to the run's original slot.
+
+    Args:
+        user_prefs: User preferences with the timezone
+        at: Timezone-aware moment to take the date of
+    """
+    user_tz = pytz.timezone(user_prefs.get("timezone", "America/Los_Angeles"))
+    at = at or datetime.utcnow().replace(tzinfo=pytz.UTC)
+    return f"scheduled:{at.astimezone(user_tz).strftime('%Y-%m-%d')}"
+
+
+def _parse_timestamp(value: str) -> datetime:
+    """Parse an ISO timestamp from the database or a run record as UTC."""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=pytz.UTC)
+
+
+async def check_and_generate_for_all_users(run: Optional[Dict] = None):
     """
     Generate podcasts for all users with daily generation enabled.
 
     This function is called by the cron job at 7am PT daily.
-    No time checks needed - the cron job handles the timing.
+    No time checks needed - the cron job handles the timing. Each user gets
+    at most one generation per local day: repeated or overlapping cron calls
+    join the generation already claimed for the slot.
+
+    With sharding enabled, only users this replica owns on the hash ring are
+    considered, and each one is guarded by a per-slot lease.
+
+    Leases, sources, topics, credential presence and the generation logs are
+    loaded or written in bulk for all users, so a run costs a fixed number
+    of round trips rather than several per user. Users without NotebookLM
+    credentials, with a session the credential probe found stale (see
+    probe_upcoming_credentials), or without enabled sources are skipped
+    without creating a log.
+
+    Args:
+        run: Optional run record (see start_scheduler_run) to report
+            per-user progress into
     """
     settings = get_settings()
+    run = run if run is not None else _new_run()
     users_to_generate = []
+    users_joined = []
 
     # Get all users with daily generation enabled
-    users_with_schedule = db.get_users_with_daily_generation_enabled()
+    users_with_schedule = await db.get_users_with_daily_generation_enabled()
+    total_users = len(users_with_schedule)
+    users_with_schedule = [u for u in users_with_schedule if sharding.owns(u["user_id"])]
+    run["checked"] = len(users_with_schedule)
+    run["worker_id"] = sharding.WORKER_ID
+
+    logger.info(
+        "Found %d users with daily generation enabled, %d in this worker's shard",
+        total_users, len(users_with_schedule),
+    )
 
-    print(f"[SCHEDULER] Found {len(users_with_schedule)} users with daily generation enabled")
+    # Slots come from when the run was created, not from now, so a run swept
+    # again later (restart, membership change) can't open a second slot
+    run_created = _parse_timestamp(run["created_at"])
+    slots = {u["user_id"]: schedule_slot_key(u, run_created) for u in users_with_schedule}
+    user_ids = list(slots)
+    if not user_ids:
+        logger.info("No users due for generation at this time")
+        return {"checked": 0, "generated": 0, "joined": 0, "users": []}
+
+    # Load everything the run needs for every user up front, so the number
+    # of round trips doesn't grow with the number of users
+    leased, rss_by_user, topics_by_user, with_credentials = await asyncio.gather(
+        sharding.acquire_leases(list(slots.items())),
+        db.get_enabled_rss_sources_for_users(user_ids),
+        db.get_enabled_news_topics_for_users(user_ids),
+        db.get_users_with_notebooklm_credentials(user_ids),
+    )
 
-    # Generate for all users with daily generation enabled
-    for user_prefs in users_with_schedule:
-        user_id = user_prefs["user_id"]
-        print(f"[SCHEDULER] User {user_id} has daily generation enabled - will generate")
-        users_to_generate.append(user_id)
+    eligible = []
+    unneeded_leases = []
+    for user_id in user_ids:
+        if user_id not in leased:
+            # Another live worker is already handling this user's slot
+            logger.info("User %s is leased by another worker - skipping", user_id)
+            continue
+
+        reason = None
+        if user_id not in with_credentials:
+            reason = "NotebookLM not connected"
+        elif with_credentials[user_id]["session_status"] == "stale":
+            reason = "NotebookLM session expired"
+        elif not rss_by_user[user_id] and not topics_by_user[user_id]:
+            reason = "No enabled sources"
+
+        if reason:
+            logger.info("User %s: %s - skipping", user_id, reason)
+            run["users"][user_id] = _new_progress(None, status="skipped", reason=reason)
+            unneeded_leases.append(user_id)
+        else:
+            eligible.append(user_id)
+
+    # Claim the run's slot for everyone at once; duplicates get the existing generation back
+    claims = await db.claim_generation_logs([(user_id, slots[user_id]) for user_id in eligible])
+
+    tasks = []
+    task_users = []
+    for user_id in eligible:
+        log, created = claims[user_id]
+        progress = _new_progress(log["id"])
+        run["users"][user_id] = progress
+
+        if created:
+            logger.info("User %s has daily generation enabled - will generate", user_id)
+            users_to_generate.append(user_id)
+        elif is_running_locally(log["id"]):
+            logger.info("User %s already generating (%s) - joining", user_id, log["id"])
+            users_joined.append(user_id)
+        elif sharding.is_enabled() and log["status"] in db.ACTIVE_GENERATION_STATUSES:
+            # We hold the lease, so the worker that started this run is gone
+            logger.warning("User %s has orphaned generation %s (%s) - resuming", user_id, log["id"], log["status"])
+            users_to_generate.append(user_id)
+        else:
+            logger.info("User %s already has generation %s (%s) for this slot - skipping", user_id, log["id"], log["status"])
+            users_joined.append(user_id)
+            progress["status"] = "skipped"
+            unneeded_leases.append(user_id)
+            continue
+
+        # Add to task list
+        tasks.append(_track_generation(progress, run_generation(
+            user_id=user_id,
+            generation_id=log["id"],
+            settings=settings,
+            sources={
+                "rss_sources": rss_by_user[user_id],
+                "news_topics": topics_by_user[user_id],
+            },
+        ), lease=(user_id, slots[user_id])))
+        task_users.append(user_id)
+
+    if unneeded_leases:
+        await asyncio.gather(*(
+            sharding.release_lease(user_id, slots[user_id]) for user_id in unneeded_leases
+        ))
 
     # Generate podcasts for all matched users
-    if users_to_generate:
-        print(f"[SCHEDULER] Generating podcasts for {len(users_to_generate)} users")
-
-        # Run generations in parallel
-        tasks = []
-        for user_id in users_to_generate:
-            # Create generation log
-            log = db.create_generation_log(user_id)
-
-            # Add to task list
-            task = generate_podcast_for_user(
-                user_id=user_id,
-                generation_id=log["id"],
-                settings=settings
-            )
-            tasks.append(task)
+    if tasks:
+        logger.info("Generating podcasts for %d users", len(tasks))
 
         # Execute all generations concurrently
         results = await asyncio.gather(*tasks, return_exceptions=True)
 
         # Log results
-        for i, result in enumerate(results):
-            user_id = users_to_generate[i]
+        for user_id, result in zip(task_users, results):
             if isinstance(result, Exception):
-                print(f"[SCHEDULER] Generation failed for user {user_id}: {result}")
+                logger.error("Generation failed for user %s: %s", user_id, result)
+            elif run["users"][user_id]["reason"] == LEASE_LOST:
+                logger.info("Generation for user %s was handed over to another worker", user_id)
             else:
-                print(f"[SCHEDULER] Generation completed for user {user_id}")
+                logger.info("Generation completed for user %s", user_id)
     else:
-        print("[SCHEDULER] No users due for generation at this time")
+        logger.info("No users due for generation at this time")
 
     return {
         "checked": len(users_with_schedule),
         "generated": len(users_to_generate),
+        "joined": len(users_joined),
         "users": users_to_generate,
     }
 
 
+# Scheduler runs started in this process, oldest first, keyed by run_id
+_runs: "OrderedDict[str, Dict]" = OrderedDict()
+_MAX_TRACKED_RUNS = 50
+
+
+def _new_run(run_id: Optional[str] = None, created_at: Optional[str] = None) -> Dict:
+    """Create an empty run record."""
+    return {
+        "run_id": run_id or str(uuid.uuid4()),
+        "status": "queued",
+        "created_at": created_at or datetime.utcnow().isoformat() + "Z",
+        "started_at": None,
+        "finished_at": None,
+        "duration_seconds": None,
+        "worker_id": sharding.WORKER_ID,
+        "checked": 0,
+        "users": {},
+        "error": None,
+        "_started": None,
+    }
+
+
+def _new_progress(generation_id: Optional[str], status: str = "pending", reason: Optional[str] = None) -> Dict:
+    """Create the progress entry for one user in a run."""
+    return {
+        "generation_id": generation_id,
+        "status": status,
+        "reason": reason,
+        "started_at": None,
+        "finished_at": None,
+        "duration_seconds": None,
+    }
+
+
+async def _track_generation(progress: Dict, generation, lease=None) -> None:
+    """
+    Await a generation while recording its status and timing.
+
+    The (user_id, slot) lease, if given, is released once it finishes. If
+    another worker takes the lease over first, the generation is stopped (or
+    never started) and left for that worker, and the user is marked skipped.
+    """
+    if lease:
+        if not sharding.holds_lease(*lease):
+            generation.close()
+            progress["status"] = "skipped"
+            progress["reason"] = LEASE_LOST
+            return
+        sharding.watch_lease(*lease, on_lost=lambda: cancel_generation(progress["generation_id"]))
+
+    started = time.monotonic()
+    progress["status"] = "running"
+    progress["started_at"] = datetime.utcnow().isoformat() + "Z"
+    try:
+        await generation
+        progress["status"] = "complete"
+    except asyncio.CancelledError:
+        if not lease or sharding.holds_lease(*lease):
+            raise
+        progress["status"] = "skipped"
+        progress["reason"] = LEASE_LOST
+    except Exception:
+        progress["status"] = "failed"
+        raise
+    finally:
+        progress["finished_at"] = datetime.utcnow().isoformat() + "Z"
+        progress["duration_seconds"] = round(time.monotonic() - started, 3)
+        if lease:
+            await sharding.release_lease(*lease)
+
+
+async def _execute_run(run: Dict) -> None:
+    """Run the scheduler for a tracked run record."""
+    bind_context(run_id=run["run_id"])
+    run["status"] = "running"
+    run["started_at"] = datetime.utcnow().isoformat() + "Z"
+    run["_started"] = time.monotonic()
+    try:
+        await check_and_generate_for_all_users(run)
+        run["status"] = "complete"
+    except Exception as e:
+        logger.exception("Run %s failed: %s", run["run_id"], e)
+        run["status"] = "failed"
+        run["error"] = str(e)
+    finally:
+        run["finished_at"] = datetime.utcnow().isoformat() + "Z"
+        run["duration_seconds"] = round(time.monotonic() - run["_started"], 3)
+
+
+async def start_scheduler_run(run_id: Optional[str] = None, created_at: Optional[str] = None) -> Dict:
+    """
+    Enqueue a scheduler run in the background and return its record.
+
+    If a run is already queued or running in this process it is returned
+    instead, so overlapping cron calls don't stack up scheduler passes.
+
+    With sharding enabled, a new run is recorded in scheduler_runs so every
+    replica runs its own shard of it. Passing the run_id of a known run that
+    has finished sweeps it again (used after membership changes).
+
+    Args:
+        run_id: Existing scheduler run to execute this worker's shard of
+        created_at: When that run was recorded; it decides the slot date
+    """
+    if run_id is None:
+        for run in reversed(_runs.values()):
+            if run["status"] in ("queued", "running"):
+                return run
+        if sharding.is_enabled():
+            recorded = await db.create_scheduler_run(requested_by=sharding.WORKER_ID)
+            run_id, created_at = recorded["id"], recorded["created_at"]
+
+    run = _runs.get(run_id) if run_id else None
+    if run is not None and run["status"] in ("queued", "running"):
+        return run
+
+    if run is None:
+        run = _new_run(run_id, created_at)
+        _runs[run["run_id"]] = run
+        while len(_runs) > _MAX_TRACKED_RUNS:
+            _runs.popitem(last=False)
+    else:
+        run["status"] = "queued"
+
+    run["_task"] = asyncio.ensure_future(_execute_run(run))
+    return run
+
+
+def has_scheduler_run(run_id: str) -> bool:
+    """Check if a scheduler run has been started in this process."""
+    return run_id in _runs
+
+
+def get_scheduler_run(run_id: str) -> Optional[Dict]:
+    """
+    Get the progress report for a scheduler run.
+
+    Includes per-user status plus aggregate counts and timings. With
+    sharding enabled this covers the users in this worker's shard.
+    """
+    run = _runs.get(run_id)
+    if run is None:
+        return None
+
+    users = run["users"]
+    counts: Dict[str, int] = {}
+    for progress in users.values():
+        counts[progress["status"]] = counts.get(progress["status"], 0) + 1
+
+    durations = [p["duration_seconds"] for p in users.values() if p["duration_seconds"] is not None]
+    elapsed = run["duration_seconds"]
+    if elapsed is None and run["_started"] is not None:
+        elapsed = round(time.monotonic() - run["_started"], 3)
+
+    report = {k: v for k, v in run.items() if not k.startswith("_")}
+    report["counts"] = counts
+    report["timings"] = {
+        "elapsed_seconds": elapsed,
+        "generation_seconds_avg": round(sum(durations) / len(durations), 3) if durations else None,
+        "generation_seconds_max": max(durations) if durations else None,
+        "generation_seconds_min": min(durations) if durations else None,
+    }
+    return report
+
+
+def minutes_until_next_slot(user_prefs: Dict) -> float:
+    """Minutes from now until the user's next scheduled generation."""
+    user_tz = pytz.timezone(user_prefs.get("timezone", "America/Los_Angeles"))
+    scheduled_time = user_prefs.get("generation_time", Time(7, 0))
+    if not isinstance(scheduled_time, Time):
+        parts = str(scheduled_time).split(":")
+        scheduled_time = Time(int(parts[0]), int(parts[1]))
+
+    now_user_tz = datetime.utcnow().replace(tzinfo=pytz.UTC).astimezone(user_tz)
+    scheduled = now_user_tz.replace(
+        hour=scheduled_time.hour,
+        minute=scheduled_time.minute,
+        second=0,
+        microsecond=0,
+    )
+    minutes = (scheduled - now_user_tz).total_seconds() / 60
+    return minutes if minutes >= 0 else minutes + 24 * 60
+
+
+async def probe_upcoming_credentials() -> Dict:
+    """
+    Probe the NotebookLM sessions of users whose slot is coming up.
+
+    Covers users with daily generation enabled (in this worker's shard) whose
+    next slot is within CREDENTIAL_PROBE_LEAD_MINUTES, skipping sessions
+    probed in the last CREDENTIAL_PROBE_INTERVAL_MINUTES. Results are stored
+    on user_credentials: stale sessions are skipped by scheduled runs without
+    any fetching, and users see the expiry on the NotebookLM status endpoint
+    before their slot comes round. Sessions that couldn't be checked are
+    left as they were.
+
+    Returns:
+        Counts of sessions probed per result, and the user IDs found stale
+    """
+    from app.services.notebooklm_auth import notebooklm_auth
+
+    settings = get_settings()
+    due = [
+        u["user_id"]
+        for u in await db.get_users_with_daily_generation_enabled()
+        if sharding.owns(u["user_id"])
+        and minutes_until_next_slot(u) <= settings.credential_probe_lead_minutes
+    ]
+    sessions = await db.get_users_with_notebooklm_credentials(due) if due else {}
+
+    recent = time.time() - settings.credential_probe_interval_minutes * 60
+    to_probe = [
+        user_id for user_id, state in sessions.items()
+        if not state["session_checked_at"]
+        or datetime.fromisoformat(state["session_checked_at"].replace("Z", "+00:00")).timestamp() < recent
+    ]
+
+    semaphore = asyncio.Semaphore(settings.credential_probe_concurrency)
+
+    async def probe(user_id: str):
+        async with semaphore:
+            return await notebooklm_auth.probe_session(user_id)
+
+    results = await asyncio.gather(*(probe(user_id) for user_id in to_probe))
+
+    by_result: Dict[str, List[str]] = {}
+    for user_id, (result, detail) in zip(to_probe, results):
+        by_result.setdefault(result, []).append(user_id)
+        if result == "stale":
+            logger.warning("User %s: NotebookLM session expired (%s) - user must reconnect", user_id, detail)
+            await notebooklm_auth.record_probe([user_id], "stale", detail)
+        elif result == "unknown":
+            logger.info("User %s: NotebookLM session probe inconclusive (%s)", user_id, detail)
+    if by_result.get("valid"):
+        await notebooklm_auth.record_probe(by_result["valid"], "valid")
+
+    logger.info(
+        "Probed %d NotebookLM sessions (%d due, %d recently checked): %s",
+        len(to_probe), len(due), len(sessions) - len(to_probe),
+        {result: len(users) for result, users in by_result.items()},
+    )
+    return {
+        "due": len(due),
+        "probed": len(to_probe),
+        "counts": {result: len(users) for result, users in by_result.items()},
+        "stale": by_result.get("stale", []),
+    }
+
+
 def format_next_generation_time(user_prefs: Dict) -> str:
     """
     Get a human-readable string for when the next generation will occur.
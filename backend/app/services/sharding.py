@@ -0,0 +1,231 @@
+"""
+Scheduler sharding across backend replicas.
+
+Each replica registers itself in the scheduler_workers table and heartbeats
+while it is alive. Users are partitioned across the live workers with a
+consistent hash ring, so adding a replica only moves about 1/N of the users
+and each user keeps landing on the same replica (which keeps that replica's
+in-process NotebookLM auth cache warm for them).
+
+Before a worker generates for a user it takes a per-(user, slot) lease in
+generation_leases. Leases are renewed by the heartbeat while the generation
+runs and released when it finishes. When a replica dies its heartbeats stop,
+it drops out of the ring, and its leases expire, so the new owners of its
+users pick them up on the next sweep. A replica that was only stalled finds
+out at its next heartbeat that its lease was taken over, and stops that
+generation.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.config import get_settings
+from app.services.log import get_logger
+
+logger = get_logger(__name__)
+
+# Identity of this replica in scheduler_workers
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def _hash(key: str) -> int:
+    """Map a key onto the ring."""
+    return int(hashlib.md5(key.encode("utf-8")).hexdigest()[:16], 16)
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes."""
+
+    def __init__(self, nodes: List[str], vnodes: int = 64):
+        """
+        Build a ring.
+
+        Args:
+            nodes: Worker IDs on the ring
+            vnodes: Virtual nodes per worker (smooths the distribution)
+        """
+        self.nodes = sorted(set(nodes))
+        self._points: List[int] = []
+        self._owners: Dict[int, str] = {}
+
+        for node in self.nodes:
+            for i in range(vnodes):
+                point = _hash(f"{node}#{i}")
+                self._owners[point] = node
+                self._points.append(point)
+        self._points.sort()
+
+    def owner(self, key: str) -> Optional[str]:
+        """Get the worker that owns a key."""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[self._points[index]]
+
+
+# Current view of the live workers
+_ring = HashRing([WORKER_ID])
+
+# Leases this worker holds for generations it is running: (user_id, slot)
+_held_leases: Set[Tuple[str, str]] = set()
+
+# Called when a held lease turns out to have been taken over (see watch_lease)
+_on_lost: Dict[Tuple[str, str], Callable[[], None]] = {}
+
+
+def is_enabled() -> bool:
+    """Check if scheduler sharding is turned on for this deployment."""
+    return get_settings().scheduler_sharding_enabled
+
+
+def owns(user_id: str) -> bool:
+    """Check if this worker is responsible for a user's scheduled generations."""
+    if not is_enabled():
+        return True
+    return _ring.owner(user_id) == WORKER_ID
+
+
+def live_workers() -> List[str]:
+    """Get the workers in the current ring."""
+    return list(_ring.nodes)
+
+
+async def acquire_leases(claims: List[Tuple[str, str]]) -> Set[str]:
+    """
+    Take the leases for many (user_id, slot) pairs in one round trip.
+
+    Returns the user IDs whose lease was acquired.
+    """
+    if not is_enabled():
+        return {user_id for user_id, _ in claims}
+
+    from app.services import async_db as db
+    settings = get_settings()
+    acquired = await db.acquire_generation_leases(
+        claims, WORKER_ID, settings.scheduler_lease_seconds
+    )
+    _held_leases.update(claim for claim in claims if claim[0] in acquired)
+    return acquired
+
+
+def holds_lease(user_id: str, slot: str) -> bool:
+    """Check if this worker still holds the lease for a user's slot."""
+    if not is_enabled():
+        return True
+    return (user_id, slot) in _held_leases
+
+
+def watch_lease(user_id: str, slot: str, on_lost: Callable[[], None]) -> None:
+    """Call on_lost if the heartbeat finds the lease was taken over before it is released."""
+    if is_enabled():
+        _on_lost[(user_id, slot)] = on_lost
+
+
+async def release_lease(user_id: str, slot: str) -> None:
+    """Give up the lease for a user's slot once its generation has finished."""
+    if not is_enabled():
+        return
+
+    from app.services import async_db as db
+    _on_lost.pop((user_id, slot), None)
+    if (user_id, slot) not in _held_leases:
+        # Already taken over by another worker; there's nothing of ours to delete
+        return
+    _held_leases.discard((user_id, slot))
+    try:
+        await db.release_generation_lease(user_id, slot, WORKER_ID)
+    except Exception as e:
+        # The lease simply expires if we can't release it
+        logger.warning("Failed to release lease %s/%s: %s", user_id, slot, e)
+
+
+def _drop_lost_leases(lost: Iterable[Tuple[str, str]]) -> None:
+    """Forget leases another worker has taken over and stop their generations."""
+    for user_id, slot in lost:
+        logger.warning("Lease %s/%s was taken over by another worker - stopping its generation", user_id, slot)
+        _held_leases.discard((user_id, slot))
+        on_lost = _on_lost.pop((user_id, slot), None)
+        if on_lost:
+            on_lost()
+
+
+async def heartbeat() -> bool:
+    """
+    Record this worker's heartbeat, renew its leases and refresh the ring.
+
+    Generations whose lease was taken over in the meantime are stopped.
+    Returns True if the set of live workers changed.
+    """
+    global _ring
+    from app.services import async_db as db
+    settings = get_settings()
+
+    await db.heartbeat_scheduler_worker(WORKER_ID)
+    if _held_leases:
+        held = set(_held_leases)
+        renewed = await db.renew_generation_leases(WORKER_ID, settings.scheduler_lease_seconds)
+        # Leases released while renewing weren't lost, just finished
+        _drop_lost_leases((held - renewed) & _held_leases)
+
+    since = datetime.utcnow() - timedelta(seconds=settings.scheduler_worker_ttl_seconds)
+    workers = await db.get_live_scheduler_workers(since)
+    if WORKER_ID not in workers:
+        workers.append(WORKER_ID)
+
+    if sorted(set(workers)) == _ring.nodes:
+        return False
+
+    logger.info("Membership changed: %d -> %d workers", len(_ring.nodes), len(set(workers)))
+    _ring = HashRing(workers)
+    return True
+
+
+async def run_worker_loop() -> None:
+    """
+    Heartbeat forever and run this worker's shard of every scheduler run.
+
+    New scheduler runs (created by whichever replica received the cron call)
+    are started locally, and the newest run is swept again whenever
+    membership changes so orphaned users are picked up.
+    """
+    from app.services import async_db as db
+    from app.services.scheduler import start_scheduler_run, has_scheduler_run
+
+    settings = get_settings()
+    logger.info("Worker %s starting", WORKER_ID)
+
+    while True:
+        try:
+            changed = await heartbeat()
+
+            since = datetime.utcnow() - timedelta(hours=settings.scheduler_run_window_hours)
+            runs = await db.get_scheduler_runs_since(since)
+
+            for run in runs:
+                if not has_scheduler_run(run["id"]):
+                    await start_scheduler_run(run_id=run["id"], created_at=run["created_at"])
+
+            if changed and runs:
+                newest = max(runs, key=lambda r: r["created_at"])
+                await start_scheduler_run(run_id=newest["id"], created_at=newest["created_at"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Heartbeat failed: %s", e)
+
+        await asyncio.sleep(settings.scheduler_heartbeat_seconds)
+
+
+async def deregister() -> None:
+    """Remove this worker from the membership table on shutdown."""
+    from app.services import async_db as db
+    try:
+        await db.remove_scheduler_worker(WORKER_ID)
+    except Exception as e:
+        logger.warning("Failed to deregister worker: %s", e)
@@ -0,0 +1,108 @@
+"""
+Write-behind buffer for generation status updates.
+
+Stage transitions are merged per generation in memory and written in one
+batch on a short interval (STATUS_FLUSH_INTERVAL_SECONDS) through the
+apply_generation_log_updates RPC, which returns only a row count rather
+than the updated rows. A generation that moves through several stages
+between flushes costs a single row update.
+
+Terminal states (complete, failed) flush immediately and the caller waits
+for the write, so a finished generation is durable before its task ends.
+
+Every update is also published to the event broker (app.services.events)
+for clients streaming progress; terminal states once they are written.
+Intermediate states may be lost if the process dies; the generation is then
+treated as orphaned and recovered like any other interrupted run.
+"""
+
+import asyncio
+import contextvars
+from typing import Dict, Optional
+
+from app.config import get_settings
+from app.services.events import event_broker
+from app.services.log import get_logger
+from app.services.metrics import status_updates
+
+logger = get_logger(__name__)
+
+TERMINAL_STATUSES = ("complete", "failed")
+
+
+class StatusBuffer:
+    """Coalesce generation_logs updates and flush them in batches."""
+
+    def __init__(self):
+        self._pending: Dict[str, Dict] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def update(self, generation_id: str, updates: Dict) -> None:
+        """
+        Queue updates for a generation.
+
+        Later values for the same column replace earlier ones. Returns once
+        the update is buffered, or once it is written for terminal states.
+        """
+        status_updates.labels("buffered").inc()
+        self._pending[generation_id] = {**self._pending.get(generation_id, {}), **updates}
+
+        if updates.get("status") in TERMINAL_STATUSES:
+            await self.flush()
+        else:
+            self._ensure_flusher()
+        await event_broker.publish(generation_id, updates)
+
+    def _ensure_flusher(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            # The loop serves every generation, so it must not inherit the
+            # log context and trace of the one whose update started it
+            self._flush_task = asyncio.get_running_loop().create_task(
+                self._flush_loop(), context=contextvars.Context()
+            )
+
+    async def _flush_loop(self) -> None:
+        interval = get_settings().status_flush_interval_seconds
+        while self._pending:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                # The batch was re-queued; try again next interval
+                logger.warning("Status flush failed, retrying: %s", e)
+
+    async def flush(self) -> None:
+        """
+        Write every buffered update in one batch.
+
+        Flushes are serialized so an older batch can never land after a
+        newer one. On failure the batch is put back (without overriding
+        anything buffered since), the flush loop is started to retry it,
+        and the error is raised.
+        """
+        from app.services import async_db as db
+
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            try:
+                await db.apply_generation_log_updates(batch)
+            except Exception:
+                for generation_id, updates in batch.items():
+                    self._pending[generation_id] = {**updates, **self._pending.get(generation_id, {})}
+                # Terminal updates flush inline rather than through the loop,
+                # so without this a failed final write would never be retried
+                self._ensure_flusher()
+                raise
+            status_updates.labels("written").inc(len(batch))
+
+    def pending(self, generation_id: str) -> Optional[Dict]:
+        """Get the updates buffered for a generation but not yet written."""
+        updates = self._pending.get(generation_id)
+        return dict(updates) if updates else None
+
+
+# Global instance
+status_buffer = StatusBuffer()
@@ -1,43 +1,181 @@
-from supabase import create_client, Client
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from supabase import create_client, AuthApiError, Client
+from supabase.lib.client_options import ClientOptions
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from app.config import Settings, get_settings
+from app.services.async_db import run_sync
+from app.services.jwt_auth import (
+    InvalidTokenError,
+    LocalVerificationUnavailable,
+    unverified_claims,
+    verify_token,
+)
+from app.services.log import get_logger, bind_context, sample
+from app.services.token_cache import MISSING, get_token_cache
+
+logger = get_logger(__name__)
 
 security = HTTPBearer()
 
 
+class ClientPool:
+    """
+    Small fixed pool of long-lived Supabase clients, handed out round-robin.
+
+    Each client keeps its own HTTP session, so reusing them keeps
+    connections alive instead of paying connection and TLS setup on every
+    query. Clients are created lazily on first use.
+    """
+
+    def __init__(self, factory: Callable[[], Client], size: int):
+        self._factory = factory
+        self._clients: List[Client] = []
+        self._size = max(1, size)
+        self._cycle = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Client:
+        with self._lock:
+            if self._cycle is None:
+                self._clients = [self._factory() for _ in range(self._size)]
+                self._cycle = itertools.cycle(self._clients)
+            return next(self._cycle)
+
+
+# Pools keyed by (url, key) so settings overrides get their own clients
+_pools: Dict[Tuple[str, str], ClientPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool(settings: Settings, key: str) -> ClientPool:
+    pool_key = (settings.supabase_url, key)
+    pool = _pools.get(pool_key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(pool_key)
+            if pool is None:
+                options = ClientOptions(postgrest_client_timeout=settings.supabase_timeout_seconds)
+                pool = ClientPool(
+                    lambda: create_client(settings.supabase_url, key, options=options),
+                    settings.supabase_pool_size,
+                )
+                _pools[pool_key] = pool
+    return pool
+
+
 def get_supabase_client(settings: Settings) -> Client:
-    """Get Supabase client with service key for admin operations."""
-    return create_client(settings.supabase_url, settings.supabase_service_key)
+    """
+    Get Supabase client with service key for admin operations.
+
+    Clients are pooled and shared across requests. Never sign a user in on
+    them (that would swap the service credentials for the user's session);
+    use create_supabase_auth_client for sign-up and sign-in.
+    """
+    return _get_pool(settings, settings.supabase_service_key).get()
 
 
 def get_supabase_anon_client(settings: Settings) -> Client:
-    """Get Supabase client with anon key for user operations."""
-    return create_client(settings.supabase_url, settings.supabase_anon_key)
+    """Get pooled Supabase client with anon key for user operations."""
+    return _get_pool(settings, settings.supabase_anon_key).get()
+
+
+def create_supabase_auth_client(settings: Settings) -> Client:
+    """Create a dedicated, unpooled client for flows that store a user session."""
+    return create_client(settings.supabase_url, settings.supabase_service_key)
+
+
+async def verify_remote(token: str, settings: Settings) -> Optional[str]:
+    """Validate a token with the Supabase auth server. Returns the user ID."""
+    supabase = get_supabase_anon_client(settings)
+    try:
+        user = await run_sync(supabase.auth.get_user, token)
+    except AuthApiError:
+        # Rejected by the server (as opposed to the server being unreachable)
+        return None
+    return user.user.id if user and user.user else None
+
+
+async def _verify(token: str, settings: Settings) -> Tuple[Optional[str], Dict[str, Any]]:
+    """Verify a token without the cache. Returns (user ID or None, claims)."""
+    if settings.auth_verification != "remote":
+        try:
+            claims = await verify_token(token, settings)
+            return claims["sub"], claims
+        except InvalidTokenError:
+            return None, {}
+        except LocalVerificationUnavailable as e:
+            logger.warning("%s - falling back to remote verification", e, extra=sample(0.01))
+
+    user_id = await verify_remote(token, settings)
+    return user_id, unverified_claims(token) if user_id else {}
+
+
+async def authenticate_token(token: str, settings: Settings) -> Optional[str]:
+    """
+    Return the user ID for a valid token, or None.
+
+    Results are cached (see app.services.token_cache). Errors reaching the
+    auth server propagate and are not cached.
+    """
+    cache = get_token_cache()
+    user_id = cache.get(token)
+    if user_id is not MISSING:
+        return user_id
+
+    user_id, claims = await _verify(token, settings)
+    if user_id and cache.is_revoked(user_id, claims.get("iat")):
+        user_id = None
+
+    now = time.time()
+    if user_id:
+        expires_at = min(claims.get("exp") or now, now + settings.token_cache_ttl_seconds)
+    else:
+        expires_at = now + settings.token_cache_negative_seconds
+    cache.put(token, user_id, expires_at)
+    return user_id
+
+
+def revoke_token(token: str, settings: Settings) -> None:
+    """Stop accepting a token on this process (logout)."""
+    exp = unverified_claims(token).get("exp")
+    get_token_cache().revoke_token(token, exp or time.time() + settings.token_cache_ttl_seconds)
+
+
+def revoke_user(user_id: str) -> None:
+    """Stop accepting every token issued to a user so far (password change)."""
+    get_token_cache().revoke_user(user_id)
 
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     settings: Settings = Depends(get_settings),
 ) -> str:
-    """Validate JWT token and return authenticated user ID."""
+    """
+    Validate JWT token and return authenticated user ID.
+
+    Verified locally by default (see app.services.jwt_auth); with
+    AUTH_VERIFICATION=remote tokens are checked with the auth server.
+    Either way the result is cached per token.
+    """
     try:
         token = credentials.credentials
+        user_id = await authenticate_token(token, settings)
 
-        # Verify JWT token with Supabase
-        supabase = get_supabase_anon_client(settings)
-        user = supabase.auth.get_user(token)
-
-        if not user or not user.user:
+        if not user_id:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid authentication credentials",
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
-        user_id = user.user.id
-        print(f"[AUTH] Authenticated user_id: {user_id}")
+        bind_context(user_id=user_id)
+        logger.debug("Authenticated user", extra=sample(0.01))
 
         return user_id
 
@@ -0,0 +1,51 @@
+"""Monotonic stage timing for the generation pipeline."""
+
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+from app.services.metrics import generation_stage_duration
+from app.services.tracing import span
+
+
+class StageTimer:
+    """
+    Collect per-stage durations and counters for one generation.
+
+    Durations use time.monotonic so they are immune to wall-clock jumps.
+    A stage entered more than once accumulates its time. Every recorded
+    duration is also observed in the generation_stage_duration histogram,
+    and stages timed with stage() are traced as "stage.<name>" spans.
+    """
+
+    def __init__(self):
+        self._started = time.monotonic()
+        self.stages: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as stage `name`."""
+        started = time.monotonic()
+        try:
+            with span(f"stage.{name}"):
+                yield
+        finally:
+            self.record(name, time.monotonic() - started)
+
+    def record(self, name: str, seconds: float) -> None:
+        """Add an externally measured duration to a stage."""
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+        generation_stage_duration.labels(name).observe(seconds)
+
+    def count(self, name: str, value: int) -> None:
+        """Add to a counter (items fetched, bytes uploaded, ...)."""
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Serialize for storage in generation_logs.stage_timings."""
+        return {
+            "stages": {name: round(seconds, 3) for name, seconds in self.stages.items()},
+            "counts": dict(self.counts),
+            "total_seconds": round(time.monotonic() - self._started, 3),
+        }
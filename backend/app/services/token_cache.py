@@ -0,0 +1,173 @@
+"""
+Cache of validated access tokens.
+
+The dashboard polls several endpoints with the same bearer token, and each
+request would otherwise repeat the signature check (or, with
+AUTH_VERIFICATION=remote, the round trip to the auth server). Results are
+kept in a bounded LRU keyed by a SHA-256 of the token, so raw tokens are
+never held in memory:
+
+- a valid token is remembered until its exp, capped at
+  TOKEN_CACHE_TTL_SECONDS so a remote revocation we weren't told about
+  is noticed within that window;
+- an invalid token is remembered for TOKEN_CACHE_NEGATIVE_SECONDS, so a
+  client retrying a bad token doesn't cost a verification each time.
+
+Revocation hooks evict entries: revoke_token() on logout, and
+revoke_user() on password change, which also rejects every token issued
+to the user before that moment. A logged-out token stays rejected until
+its exp, since a locally verified signature would otherwise still pass;
+revoked hashes are kept apart from the LRU so cache churn can't evict
+them, and are dropped once they expire.
+
+State is per process, like the "memory" read-through cache; with several
+replicas a revocation is only seen by the replica that handled it until
+the entry's TTL runs out elsewhere.
+"""
+
+import hashlib
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.config import get_settings
+from app.services.metrics import record_cache
+
+MISSING = object()
+
+# Supabase caps access token lifetime at a week; user revocation marks
+# older than that can't match any live token
+MAX_TOKEN_LIFETIME_SECONDS = 7 * 24 * 3600
+
+
+def token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class TokenCache:
+    """Thread-safe LRU of token hash -> user ID (None for invalid tokens)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, Tuple[float, Optional[str]]]" = OrderedDict()
+        self._by_user: Dict[str, Set[str]] = {}
+        # token hash -> exp of logged-out tokens, with a heap to prune them
+        self._revoked: Dict[str, float] = {}
+        self._revoked_expiry: List[Tuple[float, str]] = []
+        # user_id -> wall-clock time; tokens issued before it are rejected
+        self._revoked_before: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Any:
+        """Return the cached user ID, None for a known-bad token, or MISSING."""
+        key = token_hash(token)
+        with self._lock:
+            revoked = self._token_revoked(key)
+            entry = None if revoked else self._entries.get(key)
+            if entry is not None and entry[0] <= time.time():
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if revoked:
+            record_cache("auth_tokens", hit=True)
+            return None
+        record_cache("auth_tokens", hit=entry is not None)
+        return MISSING if entry is None else entry[1]
+
+    def put(self, token: str, user_id: Optional[str], expires_at: float) -> None:
+        """Remember a verification result until expires_at (epoch seconds)."""
+        if expires_at <= time.time():
+            return
+        key = token_hash(token)
+        with self._lock:
+            if key in self._revoked:
+                return
+            self._remove(key)
+            self._entries[key] = (expires_at, user_id)
+            if user_id is not None:
+                self._by_user.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def revoke_token(self, token: str, expires_at: float) -> None:
+        """Reject a token (e.g. after logout) until it would have expired anyway."""
+        now = time.time()
+        if expires_at <= now:
+            return
+        key = token_hash(token)
+        with self._lock:
+            self._remove(key)
+            self._revoked[key] = expires_at
+            heapq.heappush(self._revoked_expiry, (expires_at, key))
+            self._prune_revoked(now)
+
+    def revoke_user(self, user_id: str) -> None:
+        """Evict a user's tokens and reject any issued before now (e.g. password change)."""
+        # Whole seconds, to compare with iat; a token issued in the same
+        # second as the revocation is let through rather than locking out
+        # the session that just changed the password
+        now = int(time.time())
+        with self._lock:
+            for key in list(self._by_user.get(user_id, ())):
+                self._remove(key)
+            self._revoked_before[user_id] = now
+            cutoff = now - MAX_TOKEN_LIFETIME_SECONDS
+            for uid in [uid for uid, at in self._revoked_before.items() if at < cutoff]:
+                del self._revoked_before[uid]
+
+    def is_revoked(self, user_id: str, issued_at: Optional[float]) -> bool:
+        """Whether a token issued at issued_at predates a revoke_user() call."""
+        with self._lock:
+            revoked_at = self._revoked_before.get(user_id)
+        if revoked_at is None:
+            return False
+        return issued_at is None or issued_at < revoked_at
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+            self._revoked.clear()
+            self._revoked_expiry.clear()
+            self._revoked_before.clear()
+
+    def _token_revoked(self, key: str) -> bool:
+        expires_at = self._revoked.get(key)
+        if expires_at is None:
+            return False
+        if expires_at <= time.time():
+            del self._revoked[key]
+            return False
+        return True
+
+    def _prune_revoked(self, now: float) -> None:
+        while self._revoked_expiry and self._revoked_expiry[0][0] <= now:
+            expires_at, key = heapq.heappop(self._revoked_expiry)
+            # Skip heap entries superseded by a later revoke of the same token
+            if self._revoked.get(key) == expires_at:
+                del self._revoked[key]
+
+    def _remove(self, key: str) -> None:
+        _, user_id = self._entries.pop(key, (0.0, None))
+        if user_id is not None:
+            keys = self._by_user.get(user_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_user[user_id]
+
+
+_cache: Optional[TokenCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_token_cache() -> TokenCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TokenCache(get_settings().token_cache_max_entries)
+    return _cache
@@ -0,0 +1,260 @@
+"""
+Lightweight tracing for the generation pipeline.
+
+A span records a named, timed piece of work. The current span lives in a
+contextvar, so spans opened inside asyncio tasks nest under whichever span
+was active when the task was created. Each generate_podcast_for_user run
+opens a root span whose trace_id is the generation_id, and every outbound
+call (RSS, Perplexity, NotebookLM, Supabase) opens a child span through
+metrics.track_upstream.
+
+Finished spans go to the configured exporter:
+- "jsonl": appended to TRACE_FILE by a background thread
+- "memory": kept in a list (for tests)
+- "none": dropped
+
+Print the critical path of a generation from a JSON-lines trace file:
+    python -m app.services.tracing <generation_id> [--file traces.jsonl]
+"""
+
+import argparse
+import contextvars
+import json
+import queue
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+class Span:
+    """A timed unit of work within a trace."""
+
+    __slots__ = (
+        "trace_id", "span_id", "parent_id", "name", "attributes",
+        "start", "end", "_started", "status", "error", "_token",
+    )
+
+    def __init__(self, name: str, trace_id: Optional[str] = None, **attributes: Any):
+        parent = _current_span.get()
+        self.name = name
+        # getrandbits is much cheaper than uuid4 and unique enough for span IDs
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent and not trace_id else None
+        self.trace_id = trace_id or (parent.trace_id if parent else f"{random.getrandbits(128):032x}")
+        self.attributes = attributes
+        self.start = 0.0
+        self.end = 0.0
+        self._started = 0.0
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def __enter__(self) -> "Span":
+        # Wall clock for cross-process alignment, monotonic for the duration
+        self.start = time.time()
+        self._started = time.monotonic()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.end = self.start + (time.monotonic() - self._started)
+        if exc_type is not None:
+            self.status = "error"
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        _exporter.export(self)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "end": self.end,
+            "duration_ms": round((self.end - self.start) * 1000, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+def span(name: str, trace_id: Optional[str] = None, **attributes: Any) -> Span:
+    """
+    Open a span as a context manager.
+
+    Passing trace_id starts a new root span for that trace (used with the
+    generation_id so a generation's spans are easy to find).
+    """
+    return Span(name, trace_id=trace_id, **attributes)
+
+
+def current_span() -> Optional[Span]:
+    """Get the span active in this context, if any."""
+    return _current_span.get()
+
+
+class NullExporter:
+    """Discard spans."""
+
+    def export(self, span: Span) -> None:
+        pass
+
+    def shutdown(self) -> None:
+        pass
+
+
+class InMemoryExporter:
+    """Keep finished spans in memory, for tests."""
+
+    def __init__(self):
+        self.spans: List[Dict[str, Any]] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span.to_dict())
+
+    def clear(self) -> None:
+        self.spans.clear()
+
+    def shutdown(self) -> None:
+        pass
+
+
+class JsonLinesExporter:
+    """Append spans to a JSON-lines file from a background thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: "queue.SimpleQueue[Optional[Dict[str, Any]]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._write_loop, name="trace-writer", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        self._queue.put(span.to_dict())
+
+    def _write_loop(self) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    break
+                f.write(json.dumps(record, default=str) + "\n")
+                # Flush when caught up so the file is readable while running
+                if self._queue.empty():
+                    f.flush()
+
+    def shutdown(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+_exporter: Any = NullExporter()
+
+
+def set_exporter(exporter: Any) -> None:
+    """Install an exporter, shutting down the previous one."""
+    global _exporter
+    _exporter.shutdown()
+    _exporter = exporter
+
+
+def setup_tracing(settings) -> None:
+    """Install the exporter selected in settings."""
+    if settings.trace_exporter == "jsonl":
+        set_exporter(JsonLinesExporter(settings.trace_file))
+    elif settings.trace_exporter == "memory":
+        set_exporter(InMemoryExporter())
+    else:
+        set_exporter(NullExporter())
+
+
+def shutdown_tracing() -> None:
+    """Flush and stop the current exporter."""
+    set_exporter(NullExporter())
+
+
+# Critical path analysis
+
+def load_trace(path: str, trace_id: str) -> List[Dict[str, Any]]:
+    """Read the spans of one trace from a JSON-lines file."""
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if trace_id in line:
+                record = json.loads(line)
+                if record["trace_id"] == trace_id:
+                    spans.append(record)
+    return spans
+
+
+def critical_path(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Compute the critical path of a trace.
+
+    Starting from the end of each span, walk backwards through its children,
+    repeatedly taking the child that finished last before the cursor; those
+    children are what the parent was waiting on. Recurse into each of them.
+
+    Returns the spans on the path in start order, each with a "depth" key.
+    """
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for record in spans:
+        children.setdefault(record["parent_id"], []).append(record)
+
+    def walk(node: Dict[str, Any], depth: int) -> List[Dict[str, Any]]:
+        path = [{**node, "depth": depth}]
+        cursor = node["end"]
+        chain = []
+        for child in sorted(children.get(node["span_id"], []), key=lambda c: c["end"], reverse=True):
+            if child["end"] <= cursor + 1e-6:
+                chain.append(child)
+                cursor = child["start"]
+        for child in reversed(chain):
+            path.extend(walk(child, depth + 1))
+        return path
+
+    roots = children.get(None, [])
+    if not roots:
+        return []
+    root = max(roots, key=lambda r: r["end"] - r["start"])
+    return walk(root, 0)
+
+
+def _format_critical_path(path: List[Dict[str, Any]]) -> str:
+    total = path[0]["duration_ms"] or 1.0
+    lines = [f"{'span':<60}{'ms':>12}{'% of total':>12}"]
+    for record in path:
+        label = "  " * record["depth"] + record["name"]
+        target = record["attributes"].get("url") or record["attributes"].get("topic")
+        if target:
+            label += f" ({target})"
+        if record["status"] == "error":
+            label += " [error]"
+        lines.append(f"{label[:60]:<60}{record['duration_ms']:>12.1f}{record['duration_ms'] / total * 100:>11.1f}%")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Print the critical path of a generation")
+    parser.add_argument("generation_id", help="Generation ID (the trace_id of its root span)")
+    parser.add_argument("--file", default="traces.jsonl", help="JSON-lines trace file")
+    args = parser.parse_args()
+
+    spans = load_trace(args.file, args.generation_id)
+    if not spans:
+        raise SystemExit(f"No spans found for {args.generation_id} in {args.file}")
+
+    print(_format_critical_path(critical_path(spans)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
 """
 Cron job script that can be run directly or deployed to Render.
-Calls the /cron/daily-generation endpoint.
+Calls the /cron/daily-generation endpoint, authenticated with the
+CRON_SECRET environment variable (sent as X-Cron-Secret).
+
+The endpoint enqueues the run and answers 202 with a run id right away;
+progress can be followed at /cron/runs/{run_id} (send X-Cron-Secret).
 """
 import os
 import sys
@@ -9,6 +13,7 @@ import httpx
 import asyncio
 
 BACKEND_URL = os.getenv("BACKEND_URL", "https://hackathon-production-f662.up.railway.app")
+CRON_SECRET = os.getenv("CRON_SECRET", "")
 
 
 async def trigger_daily_generation():
@@ -20,17 +25,18 @@ async def trigger_daily_generation():
         async with httpx.AsyncClient(timeout=30.0) as client:
             response = await client.post(
                 url,
-                headers={"Content-Type": "application/json"}
+                headers={"Content-Type": "application/json", "X-Cron-Secret": CRON_SECRET}
             )
 
         print(f"[CRON] Status: {response.status_code}")
         print(f"[CRON] Response: {response.text}")
 
-        if response.status_code != 200:
+        if response.status_code not in (200, 202):
             print(f"[CRON] Error: Request failed with status {response.status_code}")
             sys.exit(1)
 
-        print("[CRON] Success!")
+        run_id = response.json().get("run_id")
+        print(f"[CRON] Success! Run {run_id} queued - status at {BACKEND_URL}/cron/runs/{run_id}")
         sys.exit(0)
 
     except Exception as e:
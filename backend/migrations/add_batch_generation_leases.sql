@@ -0,0 +1,25 @@
+-- Migration: Batch lease acquisition for scheduled runs
+-- Run this in Supabase SQL editor after add_scheduler_sharding.sql
+--
+-- Takes the leases for many (user, slot) pairs in one call and returns the
+-- users whose lease was taken. A lease is taken if it is free, expired, or
+-- already held by the caller. p_user_ids and p_slots are parallel arrays.
+
+CREATE OR REPLACE FUNCTION acquire_generation_leases(
+  p_user_ids uuid[],
+  p_slots text[],
+  p_worker_id text,
+  p_ttl_seconds integer
+) RETURNS TABLE (user_id uuid)
+LANGUAGE sql
+AS $$
+  INSERT INTO generation_leases AS l (user_id, slot, worker_id, expires_at)
+  SELECT c.user_id, c.slot, p_worker_id, now() + make_interval(secs => p_ttl_seconds)
+  FROM unnest(p_user_ids, p_slots) AS c(user_id, slot)
+  ON CONFLICT (user_id, slot) DO UPDATE
+    SET worker_id = excluded.worker_id,
+        expires_at = excluded.expires_at
+    WHERE l.worker_id = excluded.worker_id
+       OR l.expires_at < now()
+  RETURNING l.user_id;
+$$;
@@ -0,0 +1,15 @@
+-- Migration: Track NotebookLM session health on user_credentials
+-- Run this in Supabase SQL editor to update existing tables
+--
+-- session_status is set by the credential probe (POST /cron/credential-probe
+-- and the pre-flight check at the start of each generation):
+--   NULL     not checked since the session was stored
+--   'valid'  NotebookLM accepted the session at session_checked_at
+--   'stale'  NotebookLM sent the probe to Google sign-in; scheduled runs
+--            skip the user until they reconnect (saving a session resets it)
+
+ALTER TABLE user_credentials
+  ADD COLUMN IF NOT EXISTS session_status text
+    CHECK (session_status IN ('valid', 'stale')),
+  ADD COLUMN IF NOT EXISTS session_checked_at timestamp with time zone,
+  ADD COLUMN IF NOT EXISTS session_error text;
@@ -0,0 +1,18 @@
+-- Migration: Add idempotency keys to generation_logs
+-- Run this in Supabase SQL editor to update existing tables
+--
+-- A generation claimed with an idempotency key (a client-provided key, or
+-- "scheduled:<date>" for a user's daily slot) can only be inserted once per
+-- user. Duplicate requests hit the unique constraint and reuse the existing
+-- generation instead of starting another NotebookLM run.
+
+-- Add new columns to generation_logs
+ALTER TABLE generation_logs
+  ADD COLUMN IF NOT EXISTS idempotency_key text,
+  ADD COLUMN IF NOT EXISTS updated_at timestamp with time zone DEFAULT timezone('utc'::text, now());
+
+-- One generation per (user, key); rows without a key are unconstrained
+ALTER TABLE generation_logs
+  DROP CONSTRAINT IF EXISTS generation_logs_user_id_idempotency_key_key;
+ALTER TABLE generation_logs
+  ADD CONSTRAINT generation_logs_user_id_idempotency_key_key UNIQUE (user_id, idempotency_key);
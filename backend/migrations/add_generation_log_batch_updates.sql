@@ -0,0 +1,34 @@
+-- Migration: Batch generation status updates
+-- Run this in Supabase SQL editor to update existing databases
+--
+-- The backend buffers generation status transitions and writes them in
+-- batches. p_updates is a JSON array of objects, each with an "id" and the
+-- columns to change, e.g.
+--   [{"id": "...", "status": "generating", "stage_timings": {...}},
+--    {"id": "...", "status": "complete", "completed_at": "...", "notebook_id": "..."}]
+-- Columns missing from an object keep their current value. Returns the
+-- number of rows updated.
+
+CREATE OR REPLACE FUNCTION apply_generation_log_updates(p_updates jsonb)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  updated integer;
+BEGIN
+  UPDATE generation_logs g
+  SET status        = CASE WHEN u.item ? 'status' THEN u.item->>'status' ELSE g.status END,
+      started_at    = CASE WHEN u.item ? 'started_at' THEN (u.item->>'started_at')::timestamptz ELSE g.started_at END,
+      completed_at  = CASE WHEN u.item ? 'completed_at' THEN (u.item->>'completed_at')::timestamptz ELSE g.completed_at END,
+      notebook_id   = CASE WHEN u.item ? 'notebook_id' THEN u.item->>'notebook_id' ELSE g.notebook_id END,
+      sources_used  = CASE WHEN u.item ? 'sources_used' THEN u.item->'sources_used' ELSE g.sources_used END,
+      error_message = CASE WHEN u.item ? 'error_message' THEN u.item->>'error_message' ELSE g.error_message END,
+      stage_timings = CASE WHEN u.item ? 'stage_timings' THEN u.item->'stage_timings' ELSE g.stage_timings END,
+      updated_at    = timezone('utc'::text, now())
+  FROM jsonb_array_elements(p_updates) AS u(item)
+  WHERE g.id = (u.item->>'id')::uuid;
+
+  GET DIAGNOSTICS updated = ROW_COUNT;
+  RETURN updated;
+END;
+$$;
@@ -0,0 +1,226 @@
+-- Migration: Functions and trigger for partitioned generation_logs
+-- Run this in Supabase SQL editor after supabase_schema.sql on a fresh
+-- database, or before add_generation_log_retention.sql when upgrading.
+-- Safe to run again: functions are replaced, and the trigger and monthly
+-- partitions are only (re)created once generation_logs is partitioned.
+--
+-- - ensure_generation_log_partitions(from, months_ahead) creates monthly
+--   partitions; POST /cron/retention keeps the months ahead created.
+-- - register_generation_idempotency_key, the BEFORE INSERT trigger that
+--   enforces one generation per (user_id, idempotency_key) through
+--   generation_idempotency_keys (db.claim_generation_log).
+-- - claim_generation_logs(user_ids, keys), the batch claim used by
+--   scheduled runs (db.claim_generation_logs).
+-- - compact_generation_logs(max_age_days, keep_per_user), called by
+--   POST /cron/retention.
+
+BEGIN;
+
+-- Create monthly partitions from p_from's month through p_months_ahead
+-- months past the current one. Returns the number created.
+CREATE OR REPLACE FUNCTION ensure_generation_log_partitions(
+  p_from timestamp with time zone,
+  p_months_ahead integer
+) RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  month_start date := date_trunc('month', p_from AT TIME ZONE 'UTC')::date;
+  last_month date := (date_trunc('month', now() AT TIME ZONE 'UTC') + make_interval(months => p_months_ahead))::date;
+  partition_name text;
+  created integer := 0;
+BEGIN
+  WHILE month_start <= last_month LOOP
+    partition_name := 'generation_logs_' || to_char(month_start, 'YYYY_MM');
+    IF to_regclass(partition_name) IS NULL THEN
+      EXECUTE format(
+        'CREATE TABLE %I PARTITION OF generation_logs FOR VALUES FROM (%L) TO (%L)',
+        partition_name,
+        to_char(month_start, 'YYYY-MM-DD') || ' 00:00:00+00',
+        to_char(month_start + interval '1 month', 'YYYY-MM-DD') || ' 00:00:00+00'
+      );
+      -- Partitions are reachable through the API on their own and don't
+      -- inherit the parent's policies; with RLS on and no policies, only
+      -- the service role can read them directly
+      EXECUTE format('ALTER TABLE %I ENABLE ROW LEVEL SECURITY', partition_name);
+      created := created + 1;
+    END IF;
+    month_start := (month_start + interval '1 month')::date;
+  END LOOP;
+  RETURN created;
+END;
+$$;
+
+-- Register each keyed insert; a key already taken by another generation
+-- fails the insert with unique_violation
+CREATE OR REPLACE FUNCTION register_generation_idempotency_key()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF NEW.idempotency_key IS NULL THEN
+    RETURN NEW;
+  END IF;
+
+  INSERT INTO generation_idempotency_keys (user_id, idempotency_key, generation_id)
+  VALUES (NEW.user_id, NEW.idempotency_key, NEW.id)
+  ON CONFLICT (user_id, idempotency_key) DO NOTHING;
+
+  -- Not inserted: fine only if the key was pre-registered for this row
+  IF NOT FOUND AND NOT EXISTS (
+    SELECT 1 FROM generation_idempotency_keys
+    WHERE user_id = NEW.user_id
+      AND idempotency_key = NEW.idempotency_key
+      AND generation_id = NEW.id
+  ) THEN
+    RAISE unique_violation USING
+      MESSAGE = format('duplicate idempotency key %s for user %s', NEW.idempotency_key, NEW.user_id),
+      CONSTRAINT = 'generation_idempotency_keys_pkey';
+  END IF;
+
+  RETURN NEW;
+END;
+$$;
+
+-- Batch claim for scheduled runs: one generation per (user, key), returning
+-- each pair's log and whether this call created it. Replaces the bulk
+-- upsert on (user_id, idempotency_key), which needs a unique index on the
+-- partitioned table.
+CREATE OR REPLACE FUNCTION claim_generation_logs(
+  p_user_ids uuid[],
+  p_keys text[]
+) RETURNS TABLE (log jsonb, created boolean)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  new_ids uuid[];
+BEGIN
+  WITH claimed AS (
+    INSERT INTO generation_idempotency_keys (user_id, idempotency_key, generation_id)
+    SELECT c.user_id, c.idempotency_key, uuid_generate_v4()
+    FROM unnest(p_user_ids, p_keys) AS c(user_id, idempotency_key)
+    ON CONFLICT DO NOTHING
+    RETURNING generation_idempotency_keys.generation_id
+  )
+  SELECT coalesce(array_agg(claimed.generation_id), '{}') INTO new_ids FROM claimed;
+
+  INSERT INTO generation_logs (id, user_id, scheduled_at, status, idempotency_key)
+  SELECT k.generation_id, k.user_id, timezone('utc'::text, now()), 'scheduled', k.idempotency_key
+  FROM generation_idempotency_keys k
+  WHERE k.generation_id = ANY(new_ids);
+
+  RETURN QUERY
+  SELECT to_jsonb(g), g.id = ANY(new_ids)
+  FROM unnest(p_user_ids, p_keys) AS c(user_id, idempotency_key)
+  JOIN generation_idempotency_keys k
+    ON k.user_id = c.user_id AND k.idempotency_key = c.idempotency_key
+  JOIN generation_logs g
+    ON g.id = k.generation_id AND g.user_id = k.user_id;
+END;
+$$;
+
+-- Fold old logs into generation_log_daily_stats and remove them.
+-- A log is compacted when it is older than p_max_age_days, or when it is
+-- finished and not among its user's newest p_keep_per_user logs.
+CREATE OR REPLACE FUNCTION compact_generation_logs(
+  p_max_age_days integer,
+  p_keep_per_user integer
+) RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  cutoff timestamp with time zone := now() - make_interval(days => p_max_age_days);
+  compacted integer;
+  dropped integer := 0;
+  created integer;
+  part record;
+BEGIN
+  DROP TABLE IF EXISTS pg_temp.compacted_generation_logs;
+  CREATE TEMP TABLE compacted_generation_logs ON COMMIT DROP AS
+  SELECT id, scheduled_at
+  FROM (
+    SELECT id, scheduled_at, status,
+           row_number() OVER (PARTITION BY user_id ORDER BY scheduled_at DESC, id DESC) AS rank
+    FROM generation_logs
+  ) ranked
+  WHERE scheduled_at < cutoff
+     OR (rank > p_keep_per_user AND status IN ('complete', 'failed'));
+
+  GET DIAGNOSTICS compacted = ROW_COUNT;
+
+  -- Additive, since each log is compacted once and then removed
+  INSERT INTO generation_log_daily_stats AS s (
+    user_id, day, generations, completed, failed, total_seconds, total_items
+  )
+  SELECT
+    g.user_id,
+    (g.scheduled_at AT TIME ZONE 'UTC')::date,
+    count(*),
+    count(*) FILTER (WHERE g.status = 'complete'),
+    count(*) FILTER (WHERE g.status = 'failed'),
+    coalesce(sum(extract(epoch FROM g.completed_at - g.started_at)), 0),
+    coalesce(sum((g.sources_used->>'total_items')::integer), 0)
+  FROM generation_logs g
+  JOIN compacted_generation_logs c ON c.id = g.id AND c.scheduled_at = g.scheduled_at
+  GROUP BY 1, 2
+  ON CONFLICT (user_id, day) DO UPDATE
+    SET generations = s.generations + excluded.generations,
+        completed = s.completed + excluded.completed,
+        failed = s.failed + excluded.failed,
+        total_seconds = s.total_seconds + excluded.total_seconds,
+        total_items = s.total_items + excluded.total_items;
+
+  DELETE FROM generation_idempotency_keys k
+  USING compacted_generation_logs c
+  WHERE k.generation_id = c.id;
+
+  -- Months entirely before the cutoff hold only compacted rows: drop them whole
+  FOR part IN
+    SELECT c.relname,
+           to_date(substring(c.relname FROM '(\d{4}_\d{2})$'), 'YYYY_MM') AS month_start
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'generation_logs'::regclass
+      AND c.relname ~ '^generation_logs_\d{4}_\d{2}$'
+  LOOP
+    IF (part.month_start + interval '1 month') AT TIME ZONE 'UTC' <= cutoff THEN
+      EXECUTE format('DROP TABLE %I', part.relname);
+      dropped := dropped + 1;
+    END IF;
+  END LOOP;
+
+  DELETE FROM generation_logs g
+  USING compacted_generation_logs c
+  WHERE g.id = c.id AND g.scheduled_at = c.scheduled_at;
+
+  created := ensure_generation_log_partitions(now(), 3);
+
+  RETURN jsonb_build_object(
+    'compacted', compacted,
+    'partitions_dropped', dropped,
+    'partitions_created', created,
+    'cutoff', cutoff
+  );
+END;
+$$;
+
+-- Attach the trigger and create the current and coming months' partitions.
+-- On a database still waiting for add_generation_log_retention.sql the
+-- table isn't partitioned yet; that migration does both itself.
+DO $$
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM pg_class
+    WHERE oid = to_regclass('generation_logs') AND relkind = 'p'
+  ) THEN
+    DROP TRIGGER IF EXISTS generation_logs_idempotency_key ON generation_logs;
+    CREATE TRIGGER generation_logs_idempotency_key
+      BEFORE INSERT ON generation_logs
+      FOR EACH ROW EXECUTE FUNCTION register_generation_idempotency_key();
+
+    PERFORM ensure_generation_log_partitions(now(), 3);
+  END IF;
+END;
+$$;
+
+COMMIT;
@@ -0,0 +1,139 @@
+-- Migration: Monthly partitioning, retention and compaction for generation_logs
+-- Run this in Supabase SQL editor after the earlier generation_logs migrations
+-- (idempotency, stage timings, keyset index, hot query indexes, batch updates)
+-- and after add_generation_log_functions.sql, which defines the functions
+-- used here. Upgrades only: a database created from supabase_schema.sql
+-- already has a partitioned generation_logs, and this migration refuses to
+-- run against it.
+--
+-- 1. generation_logs becomes a table partitioned by month on scheduled_at.
+--    Hot queries (latest generation, first history pages) filter on recent
+--    scheduled_at values and only touch the newest partitions.
+-- 2. A unique constraint on a partitioned table must include the partition
+--    key, so (user_id, idempotency_key) uniqueness moves to the
+--    generation_idempotency_keys side table, maintained by a trigger that
+--    raises unique_violation (23505) for a duplicate key exactly as the old
+--    constraint did.
+-- 3. compact_generation_logs(max_age_days, keep_per_user) folds logs older
+--    than the age limit, or beyond the newest N per user, into
+--    generation_log_daily_stats and removes them. Months entirely past the
+--    age limit are dropped as whole partitions rather than deleted row by row.
+--    It also creates the partitions for the months ahead. The backend calls it
+--    from POST /cron/retention. It and the other functions are defined in
+--    add_generation_log_functions.sql.
+
+BEGIN;
+
+DO $$
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM pg_class
+    WHERE oid = to_regclass('generation_logs') AND relkind = 'p'
+  ) THEN
+    RAISE EXCEPTION 'generation_logs is already partitioned; run add_generation_log_functions.sql instead';
+  END IF;
+END;
+$$;
+
+-- Daily per-user aggregates of compacted logs
+CREATE TABLE IF NOT EXISTS generation_log_daily_stats (
+  user_id uuid REFERENCES auth.users(id) ON DELETE CASCADE NOT NULL,
+  day date NOT NULL,
+  generations integer NOT NULL DEFAULT 0,
+  completed integer NOT NULL DEFAULT 0,
+  failed integer NOT NULL DEFAULT 0,
+  -- Sum of completed_at - started_at over runs that recorded both
+  total_seconds double precision NOT NULL DEFAULT 0,
+  total_items integer NOT NULL DEFAULT 0,
+  PRIMARY KEY (user_id, day)
+);
+
+ALTER TABLE generation_log_daily_stats ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Users can view own generation_log_daily_stats" ON generation_log_daily_stats;
+CREATE POLICY "Users can view own generation_log_daily_stats" ON generation_log_daily_stats
+  FOR SELECT USING (auth.uid() = user_id);
+
+-- Arbiter for idempotency keys
+CREATE TABLE IF NOT EXISTS generation_idempotency_keys (
+  user_id uuid NOT NULL,
+  idempotency_key text NOT NULL,
+  generation_id uuid NOT NULL,
+  PRIMARY KEY (user_id, idempotency_key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_generation_idempotency_keys_generation
+  ON generation_idempotency_keys (generation_id);
+
+ALTER TABLE generation_idempotency_keys ENABLE ROW LEVEL SECURITY;
+
+-- Move the existing table aside; its indexes and constraints are renamed
+-- so the partitioned table can reuse the names
+ALTER TABLE generation_logs RENAME TO generation_logs_unpartitioned;
+ALTER TABLE generation_logs_unpartitioned RENAME CONSTRAINT generation_logs_pkey TO generation_logs_unpartitioned_pkey;
+ALTER TABLE generation_logs_unpartitioned DROP CONSTRAINT IF EXISTS generation_logs_user_id_idempotency_key_key;
+DROP INDEX IF EXISTS idx_generation_logs_user_id;
+DROP INDEX IF EXISTS idx_generation_logs_status;
+DROP INDEX IF EXISTS idx_generation_logs_user_scheduled;
+DROP INDEX IF EXISTS idx_generation_logs_active;
+
+CREATE TABLE generation_logs (
+  id uuid DEFAULT uuid_generate_v4() NOT NULL,
+  user_id uuid REFERENCES auth.users(id) ON DELETE CASCADE NOT NULL,
+  scheduled_at timestamp with time zone NOT NULL,
+  started_at timestamp with time zone,
+  completed_at timestamp with time zone,
+  status text CHECK (status IN ('scheduled', 'fetching', 'generating', 'complete', 'failed')) DEFAULT 'scheduled',
+  notebook_id text,
+  sources_used jsonb,
+  error_message text,
+  stage_timings jsonb,
+  idempotency_key text,
+  created_at timestamp with time zone DEFAULT timezone('utc'::text, now()) NOT NULL,
+  updated_at timestamp with time zone DEFAULT timezone('utc'::text, now()),
+  PRIMARY KEY (id, scheduled_at)
+) PARTITION BY RANGE (scheduled_at);
+
+-- Catches rows outside every monthly partition; stays empty while the
+-- partitions ahead are kept created
+CREATE TABLE generation_logs_default PARTITION OF generation_logs DEFAULT;
+ALTER TABLE generation_logs_default ENABLE ROW LEVEL SECURITY;
+
+SELECT ensure_generation_log_partitions(
+  coalesce((SELECT min(scheduled_at) FROM generation_logs_unpartitioned), now()),
+  3
+);
+
+INSERT INTO generation_logs (
+  id, user_id, scheduled_at, started_at, completed_at, status, notebook_id,
+  sources_used, error_message, stage_timings, idempotency_key, created_at, updated_at
+)
+SELECT
+  id, user_id, scheduled_at, started_at, completed_at, status, notebook_id,
+  sources_used, error_message, stage_timings, idempotency_key, created_at, updated_at
+FROM generation_logs_unpartitioned;
+
+INSERT INTO generation_idempotency_keys (user_id, idempotency_key, generation_id)
+SELECT user_id, idempotency_key, id
+FROM generation_logs_unpartitioned
+WHERE idempotency_key IS NOT NULL
+ON CONFLICT DO NOTHING;
+
+DROP TABLE generation_logs_unpartitioned;
+
+-- Indexes (created on every partition)
+CREATE INDEX idx_generation_logs_user_scheduled ON generation_logs (user_id, scheduled_at DESC, id DESC);
+CREATE INDEX idx_generation_logs_idempotency_key ON generation_logs (user_id, idempotency_key)
+  WHERE idempotency_key IS NOT NULL;
+
+-- Row level security
+ALTER TABLE generation_logs ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Users can view own generation_logs" ON generation_logs FOR SELECT USING (auth.uid() = user_id);
+CREATE POLICY "Users can insert own generation_logs" ON generation_logs FOR INSERT WITH CHECK (auth.uid() = user_id);
+CREATE POLICY "Users can update own generation_logs" ON generation_logs FOR UPDATE USING (auth.uid() = user_id);
+
+DROP TRIGGER IF EXISTS generation_logs_idempotency_key ON generation_logs;
+CREATE TRIGGER generation_logs_idempotency_key
+  BEFORE INSERT ON generation_logs
+  FOR EACH ROW EXECUTE FUNCTION register_generation_idempotency_key();
+
+COMMIT;
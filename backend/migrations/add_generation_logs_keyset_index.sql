@@ -0,0 +1,13 @@
+-- Migration: Index for paging generation history
+-- Run this in Supabase SQL editor to update existing databases
+--
+-- GET /generations pages newest-first by keyset on (scheduled_at, id):
+--   WHERE user_id = $1
+--     AND (scheduled_at < $2 OR (scheduled_at = $2 AND id < $3))
+--   ORDER BY scheduled_at DESC, id DESC
+--   LIMIT $4
+-- This index serves both the filter and the order, so every page is an
+-- index range scan of `limit` rows no matter how far back it is.
+
+CREATE INDEX IF NOT EXISTS idx_generation_logs_user_scheduled
+  ON generation_logs (user_id, scheduled_at DESC, id DESC);
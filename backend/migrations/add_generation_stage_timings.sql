@@ -0,0 +1,21 @@
+-- Migration: Add per-stage timing instrumentation to generation_logs
+-- Run this in Supabase SQL editor to update existing tables
+--
+-- stage_timings holds monotonic durations per pipeline stage plus counters:
+-- {
+--   "stages": {"load_sources": 0.08, "rss": 3.1, "perplexity": 6.4,
+--              "format": 0.01, "notebook_create": 1.2, "source_upload": 9.8,
+--              "wait_for_sources": 41.0, "audio": 402.7},
+--   "counts": {"rss_feeds": 5, "rss_entries": 23, "news_topics": 3,
+--              "content_items": 26, "sources_added": 26, "bytes_uploaded": 181220},
+--   "total_seconds": 464.3
+-- }
+
+ALTER TABLE generation_logs
+  ADD COLUMN IF NOT EXISTS stage_timings jsonb;
+
+-- Example: average seconds per stage over the last week
+-- SELECT key AS stage, avg(value::numeric) AS avg_seconds
+-- FROM generation_logs, jsonb_each_text(stage_timings->'stages')
+-- WHERE completed_at > now() - interval '7 days'
+-- GROUP BY key ORDER BY avg_seconds DESC;
@@ -0,0 +1,56 @@
+-- Migration: Indexes matched to the hot queries in app/services/db.py
+-- Run this in Supabase SQL editor to update existing databases
+-- (scripts/bench_indexes.py shows the plans before and after)
+--
+-- Query                                              Index
+-- -------------------------------------------------  -----------------------------------
+-- user_preferences where daily_generation_enabled    idx_user_preferences_daily_enabled
+--   (get_users_with_daily_generation_enabled)
+-- rss_sources / news_topics where user_id in (...)   idx_rss_sources_enabled,
+--   and enabled (scheduler bulk loaders)              idx_news_topics_enabled
+-- user_credentials where user_id in (...) and        idx_user_credentials_has_session
+--   notebooklm_session is not null
+--
+-- Already covered, so nothing is added for them:
+-- - generation_logs by (id, user_id): the primary key on id finds the row
+-- - generation_logs history pages and the latest log per user
+--   (get_latest_generation_log): idx_generation_logs_user_scheduled
+-- - generation_logs by (user_id, idempotency_key): its unique constraint
+-- - per-user source, topic and preference reads: the user_id indexes
+--
+-- The enabled indexes are partial rather than (user_id, enabled): every
+-- query that filters on enabled wants enabled = true, and the partial index
+-- also serves "all enabled rows" scans that don't constrain user_id.
+--
+-- On a large live table, run each CREATE INDEX as CREATE INDEX CONCURRENTLY
+-- outside a transaction instead.
+
+CREATE INDEX IF NOT EXISTS idx_user_preferences_daily_enabled
+  ON user_preferences (user_id)
+  WHERE daily_generation_enabled;
+
+CREATE INDEX IF NOT EXISTS idx_rss_sources_enabled
+  ON rss_sources (user_id)
+  WHERE enabled;
+
+CREATE INDEX IF NOT EXISTS idx_news_topics_enabled
+  ON news_topics (user_id)
+  WHERE enabled;
+
+-- Lets the credential presence check find the users with a session without
+-- testing the (large) session jsonb of every row
+CREATE INDEX IF NOT EXISTS idx_user_credentials_has_session
+  ON user_credentials (user_id)
+  WHERE notebooklm_session IS NOT NULL;
+
+-- Superseded: user_id lookups use idx_generation_logs_user_scheduled, and
+-- nothing filters on status. idx_generation_logs_active served the old
+-- active-generation lookup, which get_latest_generation_log replaced, and
+-- nothing reads enabled substack_sources across users any more.
+DROP INDEX IF EXISTS idx_generation_logs_user_id;
+DROP INDEX IF EXISTS idx_generation_logs_status;
+DROP INDEX IF EXISTS idx_generation_logs_active;
+DROP INDEX IF EXISTS idx_substack_sources_enabled;
+
+ANALYZE user_preferences, rss_sources, news_topics, substack_sources,
+  user_credentials, generation_logs;
@@ -0,0 +1,57 @@
+-- Migration: Add scheduler sharding tables for multi-replica deployments
+-- Run this in Supabase SQL editor, then set SCHEDULER_SHARDING_ENABLED=true
+--
+-- scheduler_workers: live replicas, kept fresh by a heartbeat
+-- scheduler_runs:    cron-triggered runs; every replica executes its shard
+-- generation_leases: per-(user, slot) lease so only one replica generates
+--                    for a user, and a dead replica's users are picked up
+--                    once its leases expire
+
+CREATE TABLE IF NOT EXISTS scheduler_workers (
+  worker_id text PRIMARY KEY,
+  started_at timestamp with time zone DEFAULT timezone('utc'::text, now()) NOT NULL,
+  heartbeat_at timestamp with time zone DEFAULT timezone('utc'::text, now()) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS scheduler_runs (
+  id uuid DEFAULT uuid_generate_v4() PRIMARY KEY,
+  requested_by text,
+  created_at timestamp with time zone DEFAULT timezone('utc'::text, now()) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS generation_leases (
+  user_id uuid REFERENCES auth.users(id) ON DELETE CASCADE NOT NULL,
+  slot text NOT NULL,
+  worker_id text NOT NULL,
+  expires_at timestamp with time zone NOT NULL,
+  PRIMARY KEY (user_id, slot)
+);
+
+CREATE INDEX IF NOT EXISTS idx_scheduler_workers_heartbeat ON scheduler_workers(heartbeat_at);
+CREATE INDEX IF NOT EXISTS idx_scheduler_runs_created_at ON scheduler_runs(created_at);
+CREATE INDEX IF NOT EXISTS idx_generation_leases_worker ON generation_leases(worker_id);
+
+-- Only the service role touches these tables
+ALTER TABLE scheduler_workers ENABLE ROW LEVEL SECURITY;
+ALTER TABLE scheduler_runs ENABLE ROW LEVEL SECURITY;
+ALTER TABLE generation_leases ENABLE ROW LEVEL SECURITY;
+
+-- Leases are taken in batches (see add_batch_generation_leases.sql)
+DROP FUNCTION IF EXISTS acquire_generation_lease(uuid, text, text, integer);
+
+-- Extend every lease a worker still holds, including expired ones nobody
+-- has taken over yet. Returns the renewed leases, so the worker can tell
+-- which of its generations lost theirs.
+DROP FUNCTION IF EXISTS renew_generation_leases(text, integer);
+
+CREATE FUNCTION renew_generation_leases(
+  p_worker_id text,
+  p_ttl_seconds integer
+) RETURNS TABLE (user_id uuid, slot text)
+LANGUAGE sql
+AS $$
+  UPDATE generation_leases AS l
+  SET expires_at = now() + make_interval(secs => p_ttl_seconds)
+  WHERE l.worker_id = p_worker_id
+  RETURNING l.user_id, l.slot;
+$$;
@@ -0,0 +1,65 @@
+-- Migration: Single round-trip user profile
+-- Run this in Supabase SQL editor to update existing databases
+--
+-- get_user_profile returns a user's preferences, sources, topics and
+-- NotebookLM connection state as one JSON document, selecting only the
+-- columns the API uses:
+-- {
+--   "user_id": "...",
+--   "preferences": {"id": ..., "podcast_style": ..., ...} | null,
+--   "rss_sources": [{"id", "user_id", "url", "name", "enabled"}, ...],
+--   "news_topics": [{"id", "user_id", "topic", "enabled"}, ...],
+--   "substack_sources": [{"id", "user_id", "publication_id", "publication_name",
+--                         "subdomain", "priority", "enabled"}, ...],
+--   "notebooklm_connected": true
+-- }
+-- Each list is served by the existing (user_id) index on its table.
+
+CREATE OR REPLACE FUNCTION get_user_profile(p_user_id uuid)
+RETURNS jsonb
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT jsonb_build_object(
+    'user_id', p_user_id,
+    'preferences', (
+      SELECT to_jsonb(p)
+      FROM (
+        SELECT id, user_id, podcast_style, podcast_length, language, timezone,
+               daily_generation_enabled, generation_time
+        FROM user_preferences
+        WHERE user_id = p_user_id
+      ) p
+    ),
+    'rss_sources', coalesce((
+      SELECT jsonb_agg(to_jsonb(r) - 'created_at' ORDER BY r.created_at)
+      FROM (
+        SELECT id, user_id, url, name, enabled, created_at
+        FROM rss_sources
+        WHERE user_id = p_user_id
+      ) r
+    ), '[]'::jsonb),
+    'news_topics', coalesce((
+      SELECT jsonb_agg(to_jsonb(t) - 'created_at' ORDER BY t.created_at)
+      FROM (
+        SELECT id, user_id, topic, enabled, created_at
+        FROM news_topics
+        WHERE user_id = p_user_id
+      ) t
+    ), '[]'::jsonb),
+    'substack_sources', coalesce((
+      SELECT jsonb_agg(to_jsonb(s) ORDER BY s.priority NULLS LAST, s.publication_name)
+      FROM (
+        SELECT id, user_id, publication_id, publication_name, subdomain, priority, enabled
+        FROM substack_sources
+        WHERE user_id = p_user_id
+      ) s
+    ), '[]'::jsonb),
+    'notebooklm_connected', EXISTS (
+      SELECT 1
+      FROM user_credentials
+      WHERE user_id = p_user_id
+        AND notebooklm_session IS NOT NULL
+    )
+  );
+$$;
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+EXPLAIN the hot queries before and after the index migrations.
+
+Builds the DailyBrief tables in a scratch schema on a local Postgres, seeds
+them with synthetic users, and runs EXPLAIN (ANALYZE, BUFFERS) for each
+query in app/services/db.py that the migrations target: once with the
+original indexes from supabase_schema.sql, then again after applying
+migrations/add_generation_logs_keyset_index.sql and
+migrations/add_hot_query_indexes.sql. Prints the scan type, buffers touched
+and execution time of each plan.
+
+Talks to Postgres through psql, so only a psql binary and a database you
+can create a schema in are needed:
+    python scripts/bench_indexes.py --dsn postgresql://postgres@localhost/postgres
+    python scripts/bench_indexes.py --users 20000 --days 730
+
+The scratch schema (bench_indexes) is dropped at the end unless --keep.
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import uuid
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "..", "migrations")
+MIGRATIONS = ("add_generation_logs_keyset_index.sql", "add_hot_query_indexes.sql")
+SCHEMA = "bench_indexes"
+
+# Tables as in supabase_schema.sql, minus the auth.users foreign keys and RLS,
+# with the indexes that existed before the migrations
+BASE_SCHEMA = """
+DROP SCHEMA IF EXISTS {schema} CASCADE;
+CREATE SCHEMA {schema};
+SET search_path = {schema};
+
+CREATE TABLE substack_sources (
+  id uuid DEFAULT gen_random_uuid() PRIMARY KEY,
+  user_id uuid NOT NULL,
+  publication_id text NOT NULL,
+  publication_name text NOT NULL,
+  subdomain text,
+  priority integer,
+  enabled boolean DEFAULT true,
+  created_at timestamptz DEFAULT now() NOT NULL,
+  updated_at timestamptz DEFAULT now() NOT NULL,
+  UNIQUE (user_id, publication_id)
+);
+CREATE TABLE rss_sources (
+  id uuid DEFAULT gen_random_uuid() PRIMARY KEY,
+  user_id uuid NOT NULL,
+  url text NOT NULL,
+  name text NOT NULL,
+  enabled boolean DEFAULT true,
+  created_at timestamptz DEFAULT now() NOT NULL,
+  updated_at timestamptz DEFAULT now() NOT NULL
+);
+CREATE TABLE news_topics (
+  id uuid DEFAULT gen_random_uuid() PRIMARY KEY,
+  user_id uuid NOT NULL,
+  topic text NOT NULL,
+  enabled boolean DEFAULT true,
+  created_at timestamptz DEFAULT now() NOT NULL,
+  updated_at timestamptz DEFAULT now() NOT NULL
+);
+CREATE TABLE generation_logs (
+  id uuid DEFAULT gen_random_uuid() PRIMARY KEY,
+  user_id uuid NOT NULL,
+  scheduled_at timestamptz NOT NULL,
+  started_at timestamptz,
+  completed_at timestamptz,
+  status text DEFAULT 'scheduled',
+  notebook_id text,
+  sources_used jsonb,
+  error_message text,
+  stage_timings jsonb,
+  idempotency_key text,
+  created_at timestamptz DEFAULT now() NOT NULL,
+  updated_at timestamptz DEFAULT now(),
+  UNIQUE (user_id, idempotency_key)
+);
+CREATE TABLE user_credentials (
+  id uuid DEFAULT gen_random_uuid() PRIMARY KEY,
+  user_id uuid NOT NULL UNIQUE,
+  notebooklm_session jsonb,
+  created_at timestamptz DEFAULT now() NOT NULL,
+  updated_at timestamptz DEFAULT now() NOT NULL
+);
+CREATE TABLE user_preferences (
+  id uuid DEFAULT gen_random_uuid() PRIMARY KEY,
+  user_id uuid NOT NULL UNIQUE,
+  podcast_style text DEFAULT 'deep-dive',
+  podcast_length text DEFAULT 'medium',
+  language text DEFAULT 'en',
+  timezone text DEFAULT 'America/Los_Angeles',
+  daily_generation_enabled boolean DEFAULT false,
+  generation_time time DEFAULT '07:00:00',
+  created_at timestamptz DEFAULT now() NOT NULL,
+  updated_at timestamptz DEFAULT now() NOT NULL
+);
+
+CREATE INDEX idx_substack_sources_user_id ON substack_sources(user_id);
+CREATE INDEX idx_rss_sources_user_id ON rss_sources(user_id);
+CREATE INDEX idx_news_topics_user_id ON news_topics(user_id);
+CREATE INDEX idx_generation_logs_user_id ON generation_logs(user_id);
+CREATE INDEX idx_generation_logs_status ON generation_logs(status);
+"""
+
+# User i has ID md5('user' || i)::uuid, so queries can name users up front
+SEED = """
+SET search_path = {schema};
+
+CREATE TEMP TABLE bench_users AS
+  SELECT i, md5('user' || i)::uuid AS user_id FROM generate_series(1, {users}) AS i;
+
+INSERT INTO user_preferences (user_id, daily_generation_enabled, generation_time)
+  SELECT user_id, i % 10 = 0, make_time(i % 24, 0, 0) FROM bench_users;
+
+INSERT INTO rss_sources (user_id, url, name, enabled)
+  SELECT user_id, 'https://example.com/feed/' || i || '/' || n, 'Feed ' || n, n % 5 <> 0
+  FROM bench_users, generate_series(1, 5) AS n;
+
+INSERT INTO news_topics (user_id, topic, enabled)
+  SELECT user_id, 'Topic ' || n, n % 3 <> 0
+  FROM bench_users, generate_series(1, 3) AS n;
+
+INSERT INTO substack_sources (user_id, publication_id, publication_name, enabled)
+  SELECT user_id, 'pub' || n, 'Publication ' || n, n % 2 = 0
+  FROM bench_users, generate_series(1, 2) AS n;
+
+-- Session blobs are a few KB of cookies in practice
+INSERT INTO user_credentials (user_id, notebooklm_session)
+  SELECT user_id,
+         CASE WHEN i % 5 < 3
+              THEN jsonb_build_object('cookies', repeat('x', 2048), 'origins', '[]'::jsonb)
+         END
+  FROM bench_users;
+
+-- One log per user per day; the newest one per user is still in flight
+INSERT INTO generation_logs (user_id, scheduled_at, status, sources_used, idempotency_key)
+  SELECT user_id,
+         now() - make_interval(days => d) + make_interval(mins => i % 1440),
+         CASE WHEN d = 0 THEN 'generating' WHEN d % 17 = 0 THEN 'failed' ELSE 'complete' END,
+         jsonb_build_object('rss_feeds', 5, 'news_topics', 2, 'total_items', 30),
+         'scheduled:' || to_char(now() - make_interval(days => d), 'YYYY-MM-DD')
+  FROM bench_users, generate_series(0, {days} - 1) AS d;
+
+VACUUM ANALYZE user_preferences, rss_sources, news_topics, substack_sources,
+  user_credentials, generation_logs;
+"""
+
+
+def user_id(i: int) -> str:
+    return str(uuid.UUID(hashlib.md5(f"user{i}".encode()).hexdigest()))
+
+
+def queries(users: int, days: int):
+    """The db.py queries the migrations target, as PostgREST issues them."""
+    one = f"'{user_id(users // 2)}'"
+    batch = ", ".join(f"'{user_id(i)}'" for i in range(1, min(users, 200) + 1))
+    cursor = f"now() - interval '{days * 4 // 5} days'"
+    return [
+        ("daily generation users",
+         "SELECT * FROM user_preferences WHERE daily_generation_enabled = true"),
+        ("bulk enabled rss sources",
+         f"SELECT id, user_id, url, name, enabled FROM rss_sources "
+         f"WHERE user_id IN ({batch}) AND enabled = true"),
+        ("bulk enabled news topics",
+         f"SELECT id, user_id, topic, enabled FROM news_topics "
+         f"WHERE user_id IN ({batch}) AND enabled = true"),
+        ("bulk credential presence",
+         f"SELECT user_id FROM user_credentials "
+         f"WHERE user_id IN ({batch}) AND notebooklm_session IS NOT NULL"),
+        ("all enabled rss users",
+         "SELECT user_id FROM rss_sources WHERE enabled = true"),
+        ("latest generation",
+         f"SELECT * FROM generation_logs WHERE user_id = {one} "
+         f"ORDER BY scheduled_at DESC, id DESC LIMIT 1"),
+        ("history first page",
+         f"SELECT id, scheduled_at, status, notebook_id, error_message FROM generation_logs "
+         f"WHERE user_id = {one} ORDER BY scheduled_at DESC, id DESC LIMIT 10"),
+        ("history deep page",
+         f"SELECT id, scheduled_at, status, notebook_id, error_message FROM generation_logs "
+         f"WHERE user_id = {one} AND (scheduled_at < {cursor} OR "
+         f"(scheduled_at = {cursor} AND id < 'ffffffff-ffff-ffff-ffff-ffffffffffff')) "
+         f"ORDER BY scheduled_at DESC, id DESC LIMIT 10"),
+    ]
+
+
+def psql(dsn: str, sql: str, schema: str = SCHEMA) -> str:
+    env = {**os.environ, "PGOPTIONS": f"-c search_path={schema}"}
+    result = subprocess.run(
+        ["psql", dsn, "-X", "-q", "-A", "-t", "-v", "ON_ERROR_STOP=1", "-f", "-"],
+        input=sql, capture_output=True, text=True, env=env,
+    )
+    if result.returncode != 0:
+        raise SystemExit(result.stderr.strip())
+    return result.stdout
+
+
+def scans(node, found=None):
+    """Collect 'Node Type on relation (index)' for every scan in a plan."""
+    found = [] if found is None else found
+    if "Relation Name" in node:
+        label = node["Node Type"].replace(" Scan", "")
+        if "Index Name" in node:
+            label += f" {node['Index Name']}"
+        found.append(label)
+    for child in node.get("Plans", []):
+        scans(child, found)
+    return found
+
+
+def explain(dsn: str, sql: str):
+    out = psql(dsn, f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql};")
+    plan = json.loads(out)[0]
+    root = plan["Plan"]
+    buffers = root.get("Shared Hit Blocks", 0) + root.get("Shared Read Blocks", 0)
+    return {
+        "scan": ", ".join(scans(root)) or root["Node Type"],
+        "buffers": buffers,
+        "ms": plan["Execution Time"],
+    }
+
+
+def run_all(dsn: str, bench_queries, repeat: int):
+    results = {}
+    for name, sql in bench_queries:
+        # Best of N, after a warm-up run
+        explain(dsn, sql)
+        runs = [explain(dsn, sql) for _ in range(repeat)]
+        results[name] = min(runs, key=lambda r: r["ms"])
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL", "postgresql://postgres@localhost/postgres"))
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=365, help="Generation logs per user")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch schema")
+    args = parser.parse_args()
+
+    print(f"Seeding {args.users} users x {args.days} days of logs into schema {SCHEMA}...", file=sys.stderr)
+    psql(args.dsn, BASE_SCHEMA.format(schema=SCHEMA))
+    psql(args.dsn, SEED.format(schema=SCHEMA, users=args.users, days=args.days))
+
+    bench_queries = queries(args.users, args.days)
+    before = run_all(args.dsn, bench_queries, args.repeat)
+
+    for migration in MIGRATIONS:
+        with open(os.path.join(MIGRATIONS_DIR, migration), encoding="utf-8") as f:
+            psql(args.dsn, f.read())
+    after = run_all(args.dsn, bench_queries, args.repeat)
+
+    if not args.keep:
+        psql(args.dsn, f"DROP SCHEMA {SCHEMA} CASCADE;", schema="public")
+
+    for name, _ in bench_queries:
+        b, a = before[name], after[name]
+        print(f"{name}")
+        print(f"  before: {b['ms']:>9.3f} ms {b['buffers']:>8} buffers  {b['scan']}")
+        print(f"  after:  {a['ms']:>9.3f} ms {a['buffers']:>8} buffers  {a['scan']}")
+
+
+if __name__ == "__main__":
+    main()
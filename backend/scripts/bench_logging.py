@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Compare the caller-side latency of print() with the queue-backed logger.
+
+Stdout is pointed at a pipe whose reader stalls periodically, the way a
+busy log collector or a full container log buffer behaves. print() blocks
+the calling thread (the event loop, in the app) whenever the pipe is full;
+logger calls only enqueue a record and return, and the writer thread absorbs
+the stall.
+
+Run from the backend directory:
+    python scripts/bench_logging.py
+"""
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+N = 20_000
+
+
+def stalling_reader(fd: int) -> None:
+    """Drain the pipe in bursts with 100 ms pauses in between."""
+    with os.fdopen(fd, "rb", buffering=0) as pipe:
+        while pipe.read(65536):
+            time.sleep(0.1)
+
+
+def measure(fn):
+    """Return (mean us, max ms) per call."""
+    # Let the previous phase's backlog drain first
+    time.sleep(3)
+    worst = 0.0
+    started = time.perf_counter()
+    for i in range(N):
+        call_started = time.perf_counter()
+        fn(i)
+        worst = max(worst, time.perf_counter() - call_started)
+    total = time.perf_counter() - started
+    return total / N * 1e6, worst * 1e3
+
+
+if __name__ == "__main__":
+    read_fd, write_fd = os.pipe()
+    threading.Thread(target=stalling_reader, args=(read_fd,), daemon=True).start()
+
+    real_stdout = sys.stdout
+    sys.stdout = os.fdopen(write_fd, "w", buffering=1)
+
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+    from app.services.log import bind_context, get_logger, sample, setup_logging
+
+    setup_logging(SimpleNamespace(log_format="json", log_level="INFO", log_levels=""))
+    logger = get_logger("bench")
+    bind_context(generation_id="bench-generation", user_id="bench-user")
+
+    results = {
+        "print()": measure(lambda i: print(f"[AUTH] Authenticated user_id: {i}")),
+        "logger.info (queued)": measure(lambda i: logger.info("Authenticated user %s", i)),
+        "logger.debug (filtered)": measure(lambda i: logger.debug("Authenticated user %s", i)),
+        "logger.info sample(0.01)": measure(
+            lambda i: logger.info("Authenticated user %s", i, extra=sample(0.01))
+        ),
+    }
+
+    print(f"{'operation':<28}{'mean us/call':>14}{'worst ms':>10}", file=real_stdout)
+    for name, (mean_us, worst_ms) in results.items():
+        print(f"{name:<28}{mean_us:>14.2f}{worst_ms:>10.2f}", file=real_stdout)
+
+    # The writer thread may still be draining; don't wait for it
+    real_stdout.flush()
+    os._exit(0)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for metrics instrumentation overhead.
+
+Measures the per-call cost of the operations used on hot paths (histogram
+observe, counter inc, track_upstream around a call) against an empty
+baseline, so regressions in app/services/metrics.py show up as numbers.
+
+Run from the backend directory:
+    python scripts/bench_metrics.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.metrics import (  # noqa: E402
+    Counter,
+    Histogram,
+    track_upstream,
+)
+
+N = 200_000
+
+histogram = Histogram("bench_histogram_seconds", "bench", ("route",))
+counter = Counter("bench_total", "bench", ("cache", "result"))
+
+
+def noop():
+    pass
+
+
+def observe():
+    histogram.labels("/generations").observe(0.042)
+
+
+def inc():
+    counter.labels("preferences", "hit").inc()
+
+
+def tracked_call():
+    with track_upstream("supabase", "get_rss_sources"):
+        noop()
+
+
+def per_call_ns(fn) -> float:
+    """Best-of-5 nanoseconds per call."""
+    return min(timeit.repeat(fn, number=N, repeat=5)) / N * 1e9
+
+
+if __name__ == "__main__":
+    baseline = per_call_ns(noop)
+    print(f"{'operation':<28}{'ns/call':>10}{'overhead ns':>14}")
+    for name, fn in [
+        ("baseline (empty call)", noop),
+        ("histogram.observe", observe),
+        ("counter.inc", inc),
+        ("track_upstream context", tracked_call),
+    ]:
+        cost = per_call_ns(fn)
+        print(f"{name:<28}{cost:>10.0f}{cost - baseline:>14.0f}")
+
+    # A request records one histogram sample plus a few upstream calls;
+    # compare against the fastest realistic Supabase round trip (~5 ms)
+    per_request = per_call_ns(observe) + 3 * per_call_ns(tracked_call) - 4 * baseline
+    print(f"\nper request (1 observe + 3 tracked calls): {per_request / 1000:.1f} us"
+          f" = {per_request / 5e6 * 100:.3f}% of a 5 ms request")
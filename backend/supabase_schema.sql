@@ -39,9 +39,12 @@ create table news_topics (
   updated_at timestamp with time zone default timezone('utc'::text, now()) not null
 );
 
--- Generation Logs
+-- Generation Logs, partitioned by month on scheduled_at
+-- (then run migrations/add_generation_log_functions.sql for the monthly
+-- partitions and the idempotency key, batch claim and compaction functions;
+-- add_generation_log_retention.sql is only for upgrading older databases)
 create table generation_logs (
-  id uuid default uuid_generate_v4() primary key,
+  id uuid default uuid_generate_v4() not null,
   user_id uuid references auth.users(id) on delete cascade not null,
   scheduled_at timestamp with time zone not null,
   started_at timestamp with time zone,
@@ -50,7 +53,34 @@ create table generation_logs (
   notebook_id text,
   sources_used jsonb,
   error_message text,
-  created_at timestamp with time zone default timezone('utc'::text, now()) not null
+  stage_timings jsonb,
+  idempotency_key text,
+  created_at timestamp with time zone default timezone('utc'::text, now()) not null,
+  updated_at timestamp with time zone default timezone('utc'::text, now()),
+  primary key (id, scheduled_at)
+) partition by range (scheduled_at);
+
+create table generation_logs_default partition of generation_logs default;
+
+-- One generation per (user, idempotency key); maintained by a trigger on
+-- generation_logs since a partitioned table can't have that unique constraint
+create table generation_idempotency_keys (
+  user_id uuid not null,
+  idempotency_key text not null,
+  generation_id uuid not null,
+  primary key (user_id, idempotency_key)
+);
+
+-- Daily per-user aggregates of compacted generation logs
+create table generation_log_daily_stats (
+  user_id uuid references auth.users(id) on delete cascade not null,
+  day date not null,
+  generations integer not null default 0,
+  completed integer not null default 0,
+  failed integer not null default 0,
+  total_seconds double precision not null default 0,
+  total_items integer not null default 0,
+  primary key (user_id, day)
 );
 
 -- User Credentials (encrypted OAuth tokens)
@@ -60,6 +90,10 @@ create table user_credentials (
   substack_access_token text,
   substack_refresh_token text,
   notebooklm_session jsonb,
+  -- Set by the credential probe: null (unchecked), 'valid' or 'stale'
+  session_status text check (session_status in ('valid', 'stale')),
+  session_checked_at timestamp with time zone,
+  session_error text,
   created_at timestamp with time zone default timezone('utc'::text, now()) not null,
   updated_at timestamp with time zone default timezone('utc'::text, now()) not null
 );
@@ -78,13 +112,40 @@ create table user_preferences (
   updated_at timestamp with time zone default timezone('utc'::text, now()) not null
 );
 
+-- Scheduler sharding (see migrations/add_scheduler_sharding.sql for the lease functions)
+create table scheduler_workers (
+  worker_id text primary key,
+  started_at timestamp with time zone default timezone('utc'::text, now()) not null,
+  heartbeat_at timestamp with time zone default timezone('utc'::text, now()) not null
+);
+
+create table scheduler_runs (
+  id uuid default uuid_generate_v4() primary key,
+  requested_by text,
+  created_at timestamp with time zone default timezone('utc'::text, now()) not null
+);
+
+create table generation_leases (
+  user_id uuid references auth.users(id) on delete cascade not null,
+  slot text not null,
+  worker_id text not null,
+  expires_at timestamp with time zone not null,
+  primary key (user_id, slot)
+);
+
 -- Row Level Security (RLS) Policies
 alter table substack_sources enable row level security;
 alter table rss_sources enable row level security;
 alter table news_topics enable row level security;
 alter table generation_logs enable row level security;
+alter table generation_logs_default enable row level security;
+alter table generation_idempotency_keys enable row level security;
+alter table generation_log_daily_stats enable row level security;
 alter table user_credentials enable row level security;
 alter table user_preferences enable row level security;
+alter table scheduler_workers enable row level security;
+alter table scheduler_runs enable row level security;
+alter table generation_leases enable row level security;
 
 -- Users can only access their own data
 create policy "Users can view own substack_sources" on substack_sources for select using (auth.uid() = user_id);
@@ -106,6 +167,8 @@ create policy "Users can view own generation_logs" on generation_logs for select
 create policy "Users can insert own generation_logs" on generation_logs for insert with check (auth.uid() = user_id);
 create policy "Users can update own generation_logs" on generation_logs for update using (auth.uid() = user_id);
 
+create policy "Users can view own generation_log_daily_stats" on generation_log_daily_stats for select using (auth.uid() = user_id);
+
 create policy "Users can view own user_credentials" on user_credentials for select using (auth.uid() = user_id);
 create policy "Users can insert own user_credentials" on user_credentials for insert with check (auth.uid() = user_id);
 create policy "Users can update own user_credentials" on user_credentials for update using (auth.uid() = user_id);
@@ -119,5 +182,13 @@ create index idx_substack_sources_user_id on substack_sources(user_id);
 create index idx_substack_sources_priority on substack_sources(user_id, priority) where priority is not null;
 create index idx_rss_sources_user_id on rss_sources(user_id);
 create index idx_news_topics_user_id on news_topics(user_id);
-create index idx_generation_logs_user_id on generation_logs(user_id);
-create index idx_generation_logs_status on generation_logs(status);
+create index idx_generation_logs_user_scheduled on generation_logs(user_id, scheduled_at desc, id desc);
+create index idx_generation_logs_idempotency_key on generation_logs(user_id, idempotency_key) where idempotency_key is not null;
+create index idx_generation_idempotency_keys_generation on generation_idempotency_keys(generation_id);
+create index idx_rss_sources_enabled on rss_sources(user_id) where enabled;
+create index idx_news_topics_enabled on news_topics(user_id) where enabled;
+create index idx_user_preferences_daily_enabled on user_preferences(user_id) where daily_generation_enabled;
+create index idx_user_credentials_has_session on user_credentials(user_id) where notebooklm_session is not null;
+create index idx_scheduler_workers_heartbeat on scheduler_workers(heartbeat_at);
+create index idx_scheduler_runs_created_at on scheduler_runs(created_at);
+create index idx_generation_leases_worker on generation_leases(worker_id);
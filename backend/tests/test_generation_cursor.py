@@ -0,0 +1,40 @@
+"""Tests for the generation history keyset cursor."""
+
+import base64
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("supabase")
+
+from fastapi import HTTPException  # noqa: E402
+
+from app.routers.generation import _decode_cursor, _encode_cursor  # noqa: E402
+
+
+LOG = {
+    "id": "0b7f2a53-6c1e-4d8a-9a51-3f0c2e6d9b10",
+    "scheduled_at": "2026-10-19T07:00:00.123456+00:00",
+}
+
+
+def test_cursor_round_trips():
+    assert _decode_cursor(_encode_cursor(LOG)) == (LOG["scheduled_at"], LOG["id"])
+
+
+def test_cursor_is_url_safe():
+    cursor = _encode_cursor(LOG)
+    assert "=" not in cursor
+    assert "+" not in cursor and "/" not in cursor
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-base64!",
+    base64.urlsafe_b64encode(b"[1, 2, 3]").decode(),
+    base64.urlsafe_b64encode(b'["yesterday", "0b7f2a53-6c1e-4d8a-9a51-3f0c2e6d9b10"]').decode(),
+    base64.urlsafe_b64encode(b'["2026-10-19T07:00:00Z", "1 or 1=1"]').decode(),
+])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as rejected:
+        _decode_cursor(cursor)
+    assert rejected.value.status_code == 400
@@ -0,0 +1,90 @@
+"""Tests for OPML import and export."""
+
+import io
+
+import pytest
+
+pytest.importorskip("feedparser")
+
+from app.services.opml import OPMLError, parse_opml, render_opml  # noqa: E402
+
+
+def opml(*outlines: str) -> io.BytesIO:
+    body = "\n".join(outlines)
+    return io.BytesIO(
+        f'<?xml version="1.0"?><opml version="2.0"><head/><body>{body}</body></opml>'.encode("utf-8")
+    )
+
+
+def test_parses_feeds_and_flattens_folders():
+    feeds = parse_opml(opml(
+        '<outline text="Top" xmlUrl="https://example.com/top.xml"/>',
+        '<outline text="Tech">'
+        '<outline title="Nested" text="ignored" xmlUrl="https://example.com/nested.xml"/>'
+        '</outline>',
+    ), max_feeds=10)
+
+    assert feeds == [
+        ("https://example.com/top.xml", "Top"),
+        ("https://example.com/nested.xml", "Nested"),
+    ]
+
+
+def test_deduplicates_by_normalized_url():
+    feeds = parse_opml(opml(
+        '<outline text="First" xmlUrl="https://Example.com/feed/"/>',
+        '<outline text="Again" xmlUrl="https://example.com/feed"/>',
+    ), max_feeds=10)
+
+    assert feeds == [("https://Example.com/feed/", "First")]
+
+
+def test_skips_outlines_without_http_feed_url():
+    feeds = parse_opml(opml(
+        '<outline text="No URL"/>',
+        '<outline text="FTP" xmlUrl="ftp://example.com/feed"/>',
+    ), max_feeds=10)
+
+    assert feeds == []
+
+
+def test_rejects_more_than_max_feeds():
+    with pytest.raises(OPMLError):
+        parse_opml(opml(*(
+            f'<outline text="{i}" xmlUrl="https://example.com/{i}.xml"/>' for i in range(4)
+        )), max_feeds=3)
+
+
+def test_duplicates_do_not_count_towards_max_feeds():
+    feeds = parse_opml(opml(*(
+        '<outline text="Same" xmlUrl="https://example.com/feed.xml"/>' for _ in range(5)
+    )), max_feeds=1)
+
+    assert len(feeds) == 1
+
+
+def test_rejects_malformed_xml():
+    with pytest.raises(OPMLError):
+        parse_opml(io.BytesIO(b"<opml><body><outline"), max_feeds=10)
+
+
+def test_rejects_entity_declarations():
+    bomb = (
+        b'<?xml version="1.0"?>'
+        b'<!DOCTYPE opml [<!ENTITY a "aaaaaaaaaa"><!ENTITY b "&a;&a;&a;&a;&a;&a;&a;&a;&a;&a;">]>'
+        b'<opml version="2.0"><head/><body><outline text="&b;" xmlUrl="https://example.com/a.xml"/></body></opml>'
+    )
+    with pytest.raises(OPMLError):
+        parse_opml(io.BytesIO(bomb), max_feeds=10)
+
+
+def test_render_round_trips():
+    sources = [
+        {"name": 'Quotes "and" <tags>', "url": "https://example.com/a.xml?x=1&y=2"},
+        {"name": "Plain", "url": "https://example.com/b.xml"},
+    ]
+    document = "".join(render_opml(sources)).encode("utf-8")
+
+    assert parse_opml(io.BytesIO(document), max_feeds=10) == [
+        (source["url"], source["name"]) for source in sources
+    ]
@@ -0,0 +1,130 @@
+"""Tests for generation admission control."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import rate_limit
+from app.services.rate_limit import MemoryBuckets, Overloaded, RateLimited
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    settings = SimpleNamespace(
+        generate_user_burst=2,
+        generate_user_per_hour=3600,  # one a second
+        generate_global_burst=3,
+        generate_global_per_minute=60,  # one a second
+        generation_max_in_flight=4,
+        generation_reserved_for_scheduled=1,
+        generation_overload_retry_seconds=30,
+        rate_limit_backend="memory",
+    )
+    monkeypatch.setattr(rate_limit, "get_settings", lambda: settings)
+    monkeypatch.setattr(rate_limit, "_buckets", MemoryBuckets())
+    return settings
+
+
+def test_bucket_allows_burst_then_reports_wait(clock):
+    buckets = MemoryBuckets()
+    assert buckets.take("k", capacity=2, rate=0.5) == 0
+    assert buckets.take("k", capacity=2, rate=0.5) == 0
+    assert buckets.take("k", capacity=2, rate=0.5) == pytest.approx(2.0)
+
+
+def test_bucket_refills_over_time(clock):
+    buckets = MemoryBuckets()
+    buckets.take("k", capacity=1, rate=0.5)
+
+    clock.now += 1
+    assert buckets.take("k", capacity=1, rate=0.5) == pytest.approx(1.0)
+    clock.now += 1
+    assert buckets.take("k", capacity=1, rate=0.5) == 0
+
+
+def test_refund_restores_token_up_to_capacity(clock):
+    buckets = MemoryBuckets()
+    buckets.take("k", capacity=1, rate=0.001)
+    buckets.take("k", capacity=1, rate=0.001, amount=-1.0)
+    buckets.take("k", capacity=1, rate=0.001, amount=-1.0)
+
+    assert buckets.take("k", capacity=1, rate=0.001) == 0
+    assert buckets.take("k", capacity=1, rate=0.001) > 0
+
+
+def test_admit_until_user_bucket_is_empty(clock, settings):
+    rate_limit.admit_generation("user-1", in_flight=0)
+    rate_limit.admit_generation("user-1", in_flight=0)
+
+    with pytest.raises(RateLimited) as denied:
+        rate_limit.admit_generation("user-1", in_flight=0)
+    assert denied.value.status_code == 429
+    assert denied.value.retry_after == 1
+
+
+def test_global_denial_gives_back_user_token(clock, settings):
+    settings.generate_user_per_hour = 1
+    for user_id in ("user-1", "user-2", "user-3"):
+        rate_limit.admit_generation(user_id, in_flight=0)
+
+    with pytest.raises(RateLimited):
+        rate_limit.admit_generation("user-4", in_flight=0)
+
+    # user-4's token was refunded when the global bucket refused it
+    clock.now += 1
+    rate_limit.admit_generation("user-4", in_flight=0)
+    clock.now += 1
+    rate_limit.admit_generation("user-4", in_flight=0)
+
+
+def test_refund_generation_restores_both_buckets(clock, settings):
+    rate_limit.admit_generation("user-1", in_flight=0)
+    rate_limit.admit_generation("user-1", in_flight=0)
+    rate_limit.refund_generation("user-1")
+
+    rate_limit.admit_generation("user-1", in_flight=0)
+
+
+def test_overloaded_keeps_reserved_slots_free(clock, settings):
+    rate_limit.admit_generation("user-1", in_flight=2)
+
+    with pytest.raises(Overloaded) as denied:
+        rate_limit.admit_generation("user-2", in_flight=3)
+    assert denied.value.status_code == 503
+    assert denied.value.retry_after == 30
+
+
+def test_reserved_slots_count_as_in_flight(monkeypatch):
+    pytest.importorskip("supabase")
+    from app.services import podcast_generator
+
+    now = [0.0]
+    monkeypatch.setattr(podcast_generator.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(podcast_generator, "_reserved", {})
+    monkeypatch.setattr(podcast_generator, "_in_flight", {})
+
+    first = podcast_generator.reserve_slot()
+    podcast_generator.reserve_slot()
+    assert podcast_generator.in_flight_count() == 2
+
+    podcast_generator.release_slot(first)
+    assert podcast_generator.in_flight_count() == 1
+
+    # A reservation whose run never registered expires
+    now[0] += podcast_generator.RESERVATION_SECONDS
+    assert podcast_generator.in_flight_count() == 0
@@ -0,0 +1,104 @@
+"""Tests for the consistent hash ring and leases used to shard scheduled generation."""
+
+import asyncio
+import sys
+import types
+from types import SimpleNamespace
+
+import pytest
+
+import app.services
+from app.services import sharding
+from app.services.sharding import HashRing
+
+
+USERS = [f"user-{i}" for i in range(2000)]
+
+
+def test_empty_ring_owns_nothing():
+    assert HashRing([]).owner("user-1") is None
+
+
+def test_every_key_maps_to_a_node():
+    ring = HashRing(["a", "b", "c"])
+    assert {ring.owner(user) for user in USERS} == {"a", "b", "c"}
+
+
+def test_placement_is_independent_of_node_order():
+    first = HashRing(["a", "b", "c"])
+    second = HashRing(["c", "a", "b", "a"])
+    assert all(first.owner(user) == second.owner(user) for user in USERS)
+
+
+def test_load_is_spread_across_nodes():
+    ring = HashRing(["a", "b", "c", "d"])
+    counts = {}
+    for user in USERS:
+        owner = ring.owner(user)
+        counts[owner] = counts.get(owner, 0) + 1
+    assert min(counts.values()) > len(USERS) / 4 * 0.5
+
+
+def test_adding_a_node_only_moves_keys_to_it():
+    before = HashRing(["a", "b", "c"])
+    after = HashRing(["a", "b", "c", "d"])
+    moved = [user for user in USERS if before.owner(user) != after.owner(user)]
+
+    assert all(after.owner(user) == "d" for user in moved)
+    assert len(moved) < len(USERS) / 2
+
+
+class LeaseDB(types.ModuleType):
+    """Stands in for async_db; renews only the leases in `renewable`."""
+
+    def __init__(self, renewable):
+        super().__init__("app.services.async_db")
+        self.renewable = set(renewable)
+        self.released = []
+
+    async def heartbeat_scheduler_worker(self, worker_id):
+        pass
+
+    async def renew_generation_leases(self, worker_id, ttl_seconds):
+        return self.renewable
+
+    async def get_live_scheduler_workers(self, since):
+        return [sharding.WORKER_ID]
+
+    async def release_generation_lease(self, user_id, slot, worker_id):
+        self.released.append((user_id, slot))
+
+
+@pytest.fixture
+def lease_db(monkeypatch):
+    db = LeaseDB(renewable={("user-1", "slot")})
+    monkeypatch.setitem(sys.modules, "app.services.async_db", db)
+    monkeypatch.setattr(app.services, "async_db", db, raising=False)
+    monkeypatch.setattr(sharding, "get_settings", lambda: SimpleNamespace(
+        scheduler_sharding_enabled=True,
+        scheduler_lease_seconds=120,
+        scheduler_worker_ttl_seconds=60,
+    ))
+    monkeypatch.setattr(sharding, "_held_leases", {("user-1", "slot"), ("user-2", "slot")})
+    monkeypatch.setattr(sharding, "_on_lost", {})
+    return db
+
+
+def test_heartbeat_stops_generations_whose_lease_was_lost(lease_db):
+    stopped = []
+    sharding.watch_lease("user-1", "slot", on_lost=lambda: stopped.append("user-1"))
+    sharding.watch_lease("user-2", "slot", on_lost=lambda: stopped.append("user-2"))
+
+    asyncio.run(sharding.heartbeat())
+
+    assert stopped == ["user-2"]
+    assert sharding.holds_lease("user-1", "slot")
+    assert not sharding.holds_lease("user-2", "slot")
+
+
+def test_lost_lease_is_not_released(lease_db):
+    asyncio.run(sharding.heartbeat())
+    asyncio.run(sharding.release_lease("user-2", "slot"))
+    asyncio.run(sharding.release_lease("user-1", "slot"))
+
+    assert lease_db.released == [("user-1", "slot")]
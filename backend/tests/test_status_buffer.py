@@ -0,0 +1,73 @@
+"""Tests for the write-behind generation status buffer."""
+
+import asyncio
+import sys
+import types
+from types import SimpleNamespace
+
+import pytest
+
+import app.services
+from app.services import status_buffer as status_buffer_module
+from app.services.status_buffer import StatusBuffer
+
+
+class FlakyDB(types.ModuleType):
+    """Stands in for async_db; fails the first `failures` batch writes."""
+
+    def __init__(self, failures: int):
+        super().__init__("app.services.async_db")
+        self.failures = failures
+        self.written = []
+
+    async def apply_generation_log_updates(self, batch):
+        await asyncio.sleep(0)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database unavailable")
+        self.written.append(batch)
+
+
+@pytest.fixture
+def flaky_db(monkeypatch):
+    db = FlakyDB(failures=1)
+    monkeypatch.setitem(sys.modules, "app.services.async_db", db)
+    monkeypatch.setattr(app.services, "async_db", db, raising=False)
+    monkeypatch.setattr(
+        status_buffer_module,
+        "get_settings",
+        lambda: SimpleNamespace(status_flush_interval_seconds=0.01),
+    )
+    return db
+
+
+def test_failed_terminal_write_is_retried(flaky_db):
+    async def scenario():
+        buffer = StatusBuffer()
+        with pytest.raises(ConnectionError):
+            await buffer.update("gen-1", {"status": "complete"})
+        assert buffer.pending("gen-1") == {"status": "complete"}
+
+        await asyncio.wait_for(buffer._flush_task, timeout=1)
+        return buffer
+
+    buffer = asyncio.run(scenario())
+
+    assert flaky_db.written == [{"gen-1": {"status": "complete"}}]
+    assert buffer.pending("gen-1") is None
+
+
+def test_requeued_batch_does_not_override_newer_updates(flaky_db):
+    async def scenario():
+        buffer = StatusBuffer()
+        buffer._pending["gen-1"] = {"status": "fetching", "error_message": None}
+        flush = asyncio.ensure_future(buffer.flush())
+        await asyncio.sleep(0)
+        buffer._pending["gen-1"] = {"status": "generating"}
+        with pytest.raises(ConnectionError):
+            await flush
+        return buffer
+
+    buffer = asyncio.run(scenario())
+
+    assert buffer.pending("gen-1") == {"status": "generating", "error_message": None}
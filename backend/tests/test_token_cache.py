@@ -0,0 +1,97 @@
+"""Tests for the validated access token cache."""
+
+import pytest
+
+from app.services import token_cache
+from app.services.token_cache import MISSING, TokenCache
+
+
+class Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(token_cache.time, "time", clock)
+    return clock
+
+
+def test_get_returns_cached_result(clock):
+    cache = TokenCache(10)
+    cache.put("valid", "user-1", clock.now + 60)
+    cache.put("invalid", None, clock.now + 60)
+
+    assert cache.get("valid") == "user-1"
+    assert cache.get("invalid") is None
+    assert cache.get("unknown") is MISSING
+
+
+def test_entries_expire(clock):
+    cache = TokenCache(10)
+    cache.put("token", "user-1", clock.now + 60)
+
+    clock.now += 61
+    assert cache.get("token") is MISSING
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TokenCache(2)
+    cache.put("a", "user-a", clock.now + 60)
+    cache.put("b", "user-b", clock.now + 60)
+    cache.get("a")
+    cache.put("c", "user-c", clock.now + 60)
+
+    assert cache.get("a") == "user-a"
+    assert cache.get("b") is MISSING
+    assert cache.get("c") == "user-c"
+
+
+def test_revoked_token_survives_eviction_pressure(clock):
+    cache = TokenCache(2)
+    cache.put("logged-out", "user-1", clock.now + 60)
+    cache.revoke_token("logged-out", clock.now + 3600)
+
+    for i in range(10):
+        cache.put(f"other-{i}", f"user-{i}", clock.now + 60)
+
+    assert cache.get("logged-out") is None
+
+
+def test_put_does_not_override_revocation(clock):
+    cache = TokenCache(10)
+    cache.revoke_token("logged-out", clock.now + 3600)
+    cache.put("logged-out", "user-1", clock.now + 60)
+
+    assert cache.get("logged-out") is None
+
+
+def test_revocation_lapses_at_token_expiry(clock):
+    cache = TokenCache(10)
+    cache.revoke_token("old", clock.now + 60)
+
+    clock.now += 61
+    cache.revoke_token("new", clock.now + 60)
+
+    assert cache.get("old") is MISSING
+    assert len(cache._revoked) == 1
+
+
+def test_revoke_user_evicts_and_rejects_older_tokens(clock):
+    cache = TokenCache(10)
+    cache.put("token", "user-1", clock.now + 60)
+    cache.put("other", "user-2", clock.now + 60)
+    issued_at = clock.now - 10
+
+    cache.revoke_user("user-1")
+
+    assert cache.get("token") is MISSING
+    assert cache.get("other") == "user-2"
+    assert cache.is_revoked("user-1", issued_at)
+    assert cache.is_revoked("user-1", None)
+    assert not cache.is_revoked("user-1", clock.now + 1)
+    assert not cache.is_revoked("user-2", issued_at)
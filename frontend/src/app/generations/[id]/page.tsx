@@ -1,10 +1,10 @@
 "use client";
 
-import { useEffect } from "react";
-import { useQuery } from "@tanstack/react-query";
+import { useEffect, useState } from "react";
+import { useQuery, useQueryClient } from "@tanstack/react-query";
 import { useRouter } from "next/navigation";
 import Link from "next/link";
-import { getGeneration } from "@/lib/api";
+import { getGeneration, streamGeneration } from "@/lib/api";
 import { useAuth } from "@/lib/auth-context";
 
 interface Generation {
@@ -54,11 +54,30 @@ export default function GenerationDetailPage({
     }
   }, [user, loading, router]);
 
+  const queryClient = useQueryClient();
+  const [streaming, setStreaming] = useState(false);
+
+  // Progress is pushed over server-sent events; polling is only the fallback
+  useEffect(() => {
+    if (!user) return;
+    const controller = new AbortController();
+    setStreaming(true);
+    streamGeneration(
+      params.id,
+      (data) => queryClient.setQueryData(["generation", params.id], data),
+      controller.signal,
+    )
+      .catch(() => {})
+      .finally(() => setStreaming(false));
+    return () => controller.abort();
+  }, [user, params.id, queryClient]);
+
   const { data: generation, isLoading } = useQuery<Generation>({
     queryKey: ["generation", params.id],
     queryFn: () => getGeneration(params.id),
     refetchInterval: (query) => {
       const data = query.state.data;
+      if (streaming) return false;
       return data?.status === "complete" || data?.status === "failed" ? false : 3000;
     },
   });
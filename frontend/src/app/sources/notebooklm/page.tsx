@@ -12,6 +12,8 @@ interface NotebookLMStatus {
   credentials?: {
     user_id: string;
     authenticated_at: string;
+    session_status?: "valid" | "stale" | null;
+    session_checked_at?: string | null;
   };
 }
 
@@ -20,7 +22,13 @@ async function getNotebookLMStatus(): Promise<NotebookLMStatus> {
 }
 
 async function authenticateNotebookLM(): Promise<any> {
-  return apiRequest("/auth/notebooklm/authenticate", { method: "POST" });
+  // The login runs in the background on the server; poll until it settles
+  let login = await apiRequest("/auth/notebooklm/authenticate", { method: "POST" });
+  while (login.status === "queued" || login.status === "running") {
+    await new Promise((resolve) => setTimeout(resolve, 2000));
+    login = await apiRequest("/auth/notebooklm/authenticate", { method: "GET" });
+  }
+  return login;
 }
 
 async function revokeNotebookLM(): Promise<any> {
@@ -207,6 +215,15 @@ export default function NotebookLMPage() {
                   </div>
                 </div>
 
+                {status.credentials?.session_status === "stale" && (
+                  <div className="bg-yellow-50 border border-yellow-200 p-4 rounded-lg mb-6">
+                    <p className="text-sm text-yellow-800">
+                      Your NotebookLM session has expired. Scheduled podcasts
+                      are paused until you reconnect with the desktop app.
+                    </p>
+                  </div>
+                )}
+
                 {status.credentials && (
                   <div className="bg-gray-50 p-4 rounded-lg mb-6">
                     <h3 className="text-sm font-medium text-gray-900 mb-2">
@@ -215,7 +232,9 @@ export default function NotebookLMPage() {
                     <dl className="text-sm">
                       <div className="flex justify-between py-1">
                         <dt className="text-gray-700">Status:</dt>
-                        <dd className="text-gray-900 font-medium">Active</dd>
+                        <dd className="text-gray-900 font-medium">
+                          {status.credentials.session_status === "stale" ? "Expired" : "Active"}
+                        </dd>
                       </div>
                       <div className="flex justify-between py-1">
                         <dt className="text-gray-700">Connected:</dt>
@@ -76,13 +76,46 @@ export async function triggerGeneration() {
 }
 
 export async function getGenerations() {
-  return fetchWithAuth("/generations");
+  return fetchWithAuth("/generations?fields=id,scheduled_at,status,notebook_id,error_message");
 }
 
 export async function getGeneration(id: string) {
   return fetchWithAuth(`/generations/${id}`);
 }
 
+// Server-sent events with the generation's full state on every change.
+// Uses fetch rather than EventSource, which can't send the Authorization header.
+export async function streamGeneration(
+  id: string,
+  onUpdate: (generation: any) => void,
+  signal: AbortSignal,
+) {
+  const headers = await getAuthHeaders();
+  const response = await fetch(`${API_URL}/generations/${id}/events`, { headers, signal });
+  if (!response.ok || !response.body) {
+    throw new Error("Failed to open event stream");
+  }
+
+  const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) return;
+    buffer += value;
+    let end;
+    while ((end = buffer.indexOf("\n\n")) !== -1) {
+      const message = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+      const data = message
+        .split("\n")
+        .filter((line) => line.startsWith("data: "))
+        .map((line) => line.slice(6))
+        .join("\n");
+      if (data) onUpdate(JSON.parse(data));
+    }
+  }
+}
+
 // Schedule Preferences
 export async function getSchedulePreferences() {
   return fetchWithAuth("/user/schedule");
@@ -98,3 +131,10 @@ export async function updateSchedulePreferences(data: {
     body: JSON.stringify(data),
   });
 }
+
+// Auth
+export async function logout() {
+  // Best effort: the backend stops accepting this token before the session ends
+  const headers = await getAuthHeaders();
+  await fetch(`${API_URL}/auth/logout`, { method: "POST", headers }).catch(() => {});
+}
@@ -3,6 +3,7 @@
 import { createContext, useContext, useEffect, useState } from "react";
 import { User, Session } from "@supabase/supabase-js";
 import { supabase } from "./supabase";
+import { logout } from "./api";
 import { useRouter } from "next/navigation";
 
 interface AuthContextType {
@@ -56,6 +57,7 @@ export function AuthProvider({ children }: { children: React.ReactNode }) {
   };
 
   const signOut = async () => {
+    await logout();
     const { error } = await supabase.auth.signOut();
     if (error) {
       console.error("Error signing out:", error);